@@ -0,0 +1,29 @@
+from django.apps import AppConfig, apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+
+
+class AiServicesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ai_services'
+
+    def ready(self):
+        # Keep the corpus IDF index and stored titles up to date as blog
+        # posts change
+        from . import signals
+
+        if apps.is_installed('blog'):
+            post_model = apps.get_model('blog', 'BlogPost')
+            pre_save.connect(signals.remember_previous_content, sender=post_model)
+            post_save.connect(signals.index_saved_post, sender=post_model)
+            post_save.connect(signals.precompute_saved_post_titles, sender=post_model)
+            post_delete.connect(signals.unindex_deleted_post, sender=post_model)
+
+        # Record pipeline metrics, shared with the other processes through
+        # METRICS_DIR when it is set
+        from .services.metrics import REGISTRY
+        REGISTRY.configure(
+            enabled=getattr(settings, 'METRICS_ENABLED', True),
+            directory=getattr(settings, 'METRICS_DIR', None),
+            flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+        )
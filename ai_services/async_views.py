@@ -0,0 +1,202 @@
+"""
+Async versions of the AI endpoints for ASGI workers.
+
+Under an ASGI server one process serves many requests on a single event
+loop: OpenAI calls are awaited instead of holding a worker, so hundreds of
+them can be in flight at once. CPU-bound steps (tokenization, summaries,
+hashing uploads) run on a bounded thread pool so they can't starve the
+loop, and database work goes through ``sync_to_async``.
+
+Authentication, permissions, throttling, body parsing and error responses
+are the REST framework's own ``APIView.dispatch``, and the views return the
+same ``Response`` objects as the synchronous ones, so clients see the same
+behaviour whichever views are routed.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .services.metrics import stage
+from .titles import get_title_service, precomputed_titles
+from .uploads import StagedUpload, spill_uploads
+from .views import queue_transcription, title_options, transcription_options
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_cpu_executor():
+    """Return the thread pool running the CPU-bound steps of async views"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_CPU_WORKERS', None) or os.cpu_count(),
+                thread_name_prefix='async-cpu'
+            )
+        return _executor
+
+
+class _Parsed(HttpResponse):
+    """Returned by ``AsyncAPIView.post`` once the request passed every check"""
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose POST handler is a coroutine
+
+    ``prepare`` runs the REST framework's ``dispatch`` on a worker thread;
+    its ``post`` only parses the body, so multipart uploads are read and
+    spilled there rather than on the event loop. The coroutine handler then
+    runs on the loop and ``finish`` finalizes its response as ``dispatch``
+    would.
+    """
+
+    def post(self, request, *args, **kwargs):
+        request.data
+        return _Parsed()
+
+    def prepare(self, request, *args, **kwargs):
+        """
+        Run ``dispatch`` up to the handler
+
+        Returns:
+            The rendered error response when a check failed, otherwise a
+            ``_Parsed`` placeholder and ``self.request`` is ready
+        """
+        # Worker threads aren't covered by the request signals that retire
+        # old database connections
+        close_old_connections()
+        try:
+            response = self.dispatch(request, *args, **kwargs)
+            return response if isinstance(response, _Parsed) else response.render()
+        finally:
+            close_old_connections()
+
+    def finish(self, response, *args, **kwargs):
+        """Finalize and render the response of the coroutine handler"""
+        self.response = self.finalize_response(self.request, response, *args, **kwargs)
+        return self.response.render() if isinstance(self.response, Response) else self.response
+
+
+def async_api_view(permission_classes=None, throttle_classes=None):
+    """
+    Serve an async POST view behind the REST framework's request checks
+
+    The view receives a REST framework ``Request`` whose user, data and
+    files are already loaded, and returns a ``Response``. The checks and the
+    parsing run with ``thread_sensitive=False``, so concurrent uploads are
+    parsed in parallel instead of queueing for Django's one shared thread.
+
+    Args:
+        permission_classes: Like ``@permission_classes``; the configured
+            defaults when None
+        throttle_classes: Like ``@throttle_classes``; the configured defaults
+            when None
+    """
+    policies = {}
+    if permission_classes is not None:
+        policies['permission_classes'] = permission_classes
+    if throttle_classes is not None:
+        policies['throttle_classes'] = throttle_classes
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            api_view = AsyncAPIView(**policies)
+            response = await sync_to_async(api_view.prepare, thread_sensitive=False)(request, *args, **kwargs)
+            if not isinstance(response, _Parsed):
+                return response
+
+            try:
+                response = await view(api_view.request, *args, **kwargs)
+            except Exception as exc:
+                response = api_view.handle_exception(exc)
+            return await sync_to_async(api_view.finish, thread_sensitive=False)(response, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@spill_uploads
+@async_api_view(permission_classes=[IsAuthenticated])
+async def transcribe_audio(request):
+    """
+    Async version of ``views.transcribe_audio``
+
+    The upload is hashed on the CPU pool; the job is then created and queued
+    exactly as the synchronous view does
+    """
+    if 'audio_file' not in request.FILES:
+        return Response({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    options, error = transcription_options(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    loop = asyncio.get_running_loop()
+    try:
+        upload = await loop.run_in_executor(
+            get_cpu_executor(),
+            functools.partial(
+                StagedUpload, request.FILES['audio_file'],
+                spill_dir=getattr(settings, 'TRANSCRIPTION_SPILL_DIR', None)
+            )
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Transcription failed: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    data, status_code = await sync_to_async(queue_transcription)(request.user, options, upload)
+    return Response(data, status=status_code)
+
+
+@async_api_view(permission_classes=[IsAuthenticated])
+async def suggest_blog_titles(request):
+    """
+    Async version of ``views.suggest_blog_titles``
+
+    The OpenAI request is awaited, so a slow completion holds no thread
+    """
+    data = request.data
+    if 'content' not in data:
+        return Response({'error': 'Blog content is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    content = data['content']
+    options, error = title_options(data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    num_suggestions = options['num_suggestions']
+    try:
+        suggestions = await sync_to_async(precomputed_titles)(
+            content, num_suggestions, post_id=options['post_id']
+        )
+        if suggestions is None:
+            # Timed like the synchronous generate_title_suggestions
+            with stage('title', 'total'):
+                suggestions = await get_title_service().agenerate_title_suggestions(
+                    content, num_suggestions, executor=get_cpu_executor()
+                )
+    except Exception as e:
+        return Response(
+            {'error': f'Failed to generate title suggestions: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return Response({'suggestions': suggestions}, status=status.HTTP_200_OK)
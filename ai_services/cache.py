@@ -0,0 +1,94 @@
+"""
+Content-addressed result caches.
+
+Entries live in the configured database so that the web process (which sees
+the upload) and the background worker processes (which produce the results)
+share one cache without an external service.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import CachedResult
+from .services.metrics import CACHE_REQUESTS
+
+
+class ResultCache:
+    """Size-capped LRU cache with a TTL, keyed by content hashes"""
+
+    def __init__(self, namespace, max_entries=1000, ttl=7 * 24 * 3600):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def _entries(self):
+        return CachedResult.objects.filter(namespace=self.namespace)
+
+    def _expiry_cutoff(self):
+        return timezone.now() - timedelta(seconds=self.ttl)
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None on a miss"""
+        entry = self._entries().filter(key=key).first()
+        if entry is None:
+            CACHE_REQUESTS.inc(cache=self.namespace, result='miss')
+            return None
+
+        if entry.created_at < self._expiry_cutoff():
+            entry.delete()
+            CACHE_REQUESTS.inc(cache=self.namespace, result='miss')
+            return None
+
+        CACHE_REQUESTS.inc(cache=self.namespace, result='hit')
+
+        # Touch the entry so that eviction keeps recently used results
+        self._entries().filter(pk=entry.pk).update(accessed_at=timezone.now())
+        return entry.value
+
+    def set(self, key, value):
+        """Store ``value`` under ``key`` and evict entries beyond the size cap"""
+        now = timezone.now()
+        updated = self._entries().filter(key=key).update(
+            value=value, created_at=now, accessed_at=now
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    CachedResult.objects.create(namespace=self.namespace, key=key, value=value)
+            except IntegrityError:
+                # Another worker stored the same content concurrently
+                pass
+
+        self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones over the cap"""
+        self._entries().filter(created_at__lt=self._expiry_cutoff()).delete()
+
+        stale = list(
+            self._entries()
+            .order_by('-accessed_at')
+            .values_list('pk', flat=True)[self.max_entries:]
+        )
+        if stale:
+            CachedResult.objects.filter(pk__in=stale).delete()
+
+
+def get_transcription_cache():
+    """Cache of finished transcription results, keyed by upload hash and options"""
+    return ResultCache(
+        'transcription',
+        max_entries=getattr(settings, 'TRANSCRIPTION_CACHE_MAX_ENTRIES', 1000),
+        ttl=getattr(settings, 'TRANSCRIPTION_CACHE_TTL', 7 * 24 * 3600)
+    )
+
+
+def get_language_cache():
+    """Cache of identified languages, keyed by the upload hash alone"""
+    return ResultCache(
+        'language',
+        max_entries=getattr(settings, 'TRANSCRIPTION_CACHE_MAX_ENTRIES', 1000),
+        ttl=getattr(settings, 'TRANSCRIPTION_CACHE_TTL', 7 * 24 * 3600)
+    )
@@ -0,0 +1,393 @@
+"""
+Background execution of transcription jobs.
+
+Web processes only insert ``TranscriptionJob`` rows, carrying the audio or
+the path of its spill file, and return. A dedicated worker (``python
+manage.py run_transcription_worker``) claims pending rows with ``SELECT ...
+FOR UPDATE SKIP LOCKED`` and runs them on its own pool of
+``TRANSCRIPTION_JOB_WORKERS`` processes, so the number of concurrent
+transcriptions doesn't grow with the number of web workers, and no external
+broker is needed.
+
+A claimed job holds a lease that the worker renews while the job runs. When
+a worker dies, its leases run out and any worker queues the jobs again, or
+marks them failed once they have used up ``TRANSCRIPTION_JOB_MAX_ATTEMPTS``.
+Setting ``TRANSCRIPTION_JOBS_EAGER`` runs jobs inline instead, which is
+convenient for development and tests.
+"""
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .services.metrics import REGISTRY, stage
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def recognizer_options(backend):
+    """Constructor options for a recognition backend, taken from the settings"""
+    if backend == 'whisper':
+        pool_size = getattr(settings, 'TRANSCRIPTION_MODEL_POOL_SIZE', 1) or 1
+        # Every job process holds pool_size instances: share the cores
+        # between all of them instead of giving each instance every core
+        processes = getattr(settings, 'TRANSCRIPTION_JOB_WORKERS', 2)
+        return {
+            'model_name': getattr(settings, 'TRANSCRIPTION_WHISPER_MODEL', 'openai/whisper-base'),
+            'pool_size': pool_size,
+            'num_threads': getattr(settings, 'TRANSCRIPTION_MODEL_THREADS', None)
+                or max(1, (os.cpu_count() or 1) // (processes * pool_size)),
+        }
+    return {}
+
+
+def get_transcription_service(backend):
+    """
+    Return the transcription service of this process for a recognition backend
+
+    Services hold no per-request state, so one instance per backend is
+    configured from the settings and shared by every job.
+    """
+    from .services.audio_service import AudioTranscriptionService
+
+    with _services_lock:
+        if backend not in _services:
+            _services[backend] = AudioTranscriptionService(
+                huggingface_token=getattr(settings, 'HUGGINGFACE_API_KEY', ''),
+                max_workers=getattr(settings, 'TRANSCRIPTION_MAX_WORKERS', 4),
+                max_chunk_seconds=getattr(settings, 'TRANSCRIPTION_CHUNK_SECONDS', 30.0),
+                spill_dir=getattr(settings, 'TRANSCRIPTION_SPILL_DIR', None),
+                use_vad=getattr(settings, 'TRANSCRIPTION_VAD', True),
+                diarization_engine=getattr(settings, 'TRANSCRIPTION_DIARIZATION_ENGINE', 'auto'),
+                recognizer_backend=backend,
+                recognizer_options=recognizer_options(backend),
+                default_language=getattr(settings, 'TRANSCRIPTION_DEFAULT_LANGUAGE', 'en-US'),
+                candidate_languages=getattr(settings, 'TRANSCRIPTION_CANDIDATE_LANGUAGES', None),
+                language_sample_seconds=getattr(settings, 'TRANSCRIPTION_LANGUAGE_SAMPLE_SECONDS', 10.0)
+            )
+        return _services[backend]
+
+
+def _init_worker():
+    """Set up Django inside a freshly spawned worker process"""
+    import django
+    django.setup()
+
+    # Load the default recognizer and the diarization pipeline now so the
+    # first job doesn't pay for them
+    backend = getattr(settings, 'TRANSCRIPTION_BACKEND', 'google')
+    get_transcription_service(backend).recognizer.warm()
+
+    if getattr(settings, 'TRANSCRIPTION_DIARIZE', True):
+        from .services.diarization import get_diarizer
+        get_diarizer(
+            getattr(settings, 'HUGGINGFACE_API_KEY', ''),
+            getattr(settings, 'TRANSCRIPTION_DIARIZATION_ENGINE', 'auto')
+        )
+
+
+def _job_audio(job):
+    """The audio of a job as ``transcribe_audio`` takes it: bytes or a file path"""
+    if job.audio is not None:
+        return bytes(job.audio)
+    return job.audio_path
+
+
+def _discard_audio(audio_path):
+    # A spilled upload is only needed for the duration of the job
+    if audio_path and os.path.exists(audio_path):
+        with stage('transcription', 'cleanup'):
+            os.remove(audio_path)
+
+
+def run_transcription_job(job_id):
+    """Execute one transcription job and record its outcome on the job row"""
+    from .cache import get_language_cache, get_transcription_cache
+    from .models import TranscriptionJob
+
+    # Pool processes outlive many jobs, and CONN_MAX_AGE is only enforced
+    # around HTTP requests: drop connections the server may have closed
+    close_old_connections()
+    jobs = TranscriptionJob.objects.filter(id=job_id)
+    job = jobs.get()
+
+    def update_job(**fields):
+        # QuerySet.update() bypasses auto_now, so stamp the row explicitly
+        jobs.update(updated_at=timezone.now(), **fields)
+
+    def report_progress(progress):
+        update_job(progress=progress)
+
+    update_job(status=TranscriptionJob.STATUS_RUNNING)
+
+    backend = job.options.get('backend', getattr(settings, 'TRANSCRIPTION_BACKEND', 'google'))
+
+    try:
+        service = get_transcription_service(backend)
+
+        # A language given by the client, or identified for this exact
+        # recording before, skips language identification
+        language = job.options.get('language')
+        if language is None and job.content_hash:
+            known = get_language_cache().get(job.content_hash)
+            language = known['language'] if known else None
+
+        with stage('transcription', 'total', backend=backend):
+            result = service.transcribe_audio(
+                _job_audio(job),
+                chunked=job.options.get('mode') == 'chunked',
+                progress_callback=report_progress,
+                diarize=job.options.get('diarize', False),
+                language=language
+            )
+        update_job(status=TranscriptionJob.STATUS_COMPLETED, progress=1.0, result=result,
+                   audio=None, audio_path='', lease_expires_at=None)
+
+        if job.content_hash:
+            # A transcript missing failed chunks isn't reused; a new upload may do better
+            if not any('error' in segment for segment in result['segments']):
+                get_transcription_cache().set(job.cache_key, result)
+            if language is None:
+                get_language_cache().set(job.content_hash, {'language': result['language']})
+
+    except Exception as e:
+        update_job(status=TranscriptionJob.STATUS_FAILED, error=str(e),
+                   audio=None, audio_path='', lease_expires_at=None)
+
+    finally:
+        _discard_audio(job.audio_path)
+
+        # Publish this job's timings now rather than at the next periodic write
+        try:
+            REGISTRY.flush()
+        except OSError:
+            pass
+        close_old_connections()
+
+
+def submit_transcription_job(owner, options, content_hash, audio_source):
+    """
+    Queue a transcription by inserting its job row; a worker picks it up
+
+    Args:
+        owner: User the job belongs to
+        options: Validated transcription options
+        content_hash: SHA-256 of the upload
+        audio_source: Encoded audio bytes, or the path of a spill file that
+            the job takes ownership of
+
+    Returns:
+        TranscriptionJob: The new job
+    """
+    from .models import TranscriptionJob
+
+    if isinstance(audio_source, str):
+        audio_fields = {'audio_path': audio_source}
+    else:
+        audio_fields = {'audio': audio_source}
+    try:
+        job = TranscriptionJob.objects.create(
+            owner=owner, options=options, content_hash=content_hash, **audio_fields
+        )
+    except Exception:
+        _discard_audio(audio_fields.get('audio_path'))
+        raise
+
+    if getattr(settings, 'TRANSCRIPTION_JOBS_EAGER', False):
+        run_transcription_job(str(job.id))
+    return job
+
+
+def claim_next_job(worker, lease_seconds):
+    """
+    Claim the oldest pending job for ``worker``
+
+    Returns:
+        str: Id of the claimed job, or None when nothing is pending
+    """
+    from .models import TranscriptionJob
+
+    with transaction.atomic():
+        # Concurrent workers skip each other's locked rows instead of waiting
+        job_id = (
+            TranscriptionJob.objects.select_for_update(skip_locked=True)
+            .filter(status=TranscriptionJob.STATUS_PENDING)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        # Conditional, so claims stay exclusive on databases without row
+        # locks (SQLite)
+        now = timezone.now()
+        claimed = TranscriptionJob.objects.filter(
+            id=job_id, status=TranscriptionJob.STATUS_PENDING
+        ).update(
+            status=TranscriptionJob.STATUS_RUNNING,
+            worker=worker,
+            attempts=F('attempts') + 1,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            updated_at=now
+        )
+    return str(job_id) if claimed else None
+
+
+def renew_leases(worker, job_ids, lease_seconds):
+    """Extend the claim of ``worker`` on jobs it is still running"""
+    from .models import TranscriptionJob
+
+    TranscriptionJob.objects.filter(
+        id__in=job_ids, worker=worker, status=TranscriptionJob.STATUS_RUNNING
+    ).update(lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds))
+
+
+def release_jobs(jobs, max_attempts, error):
+    """
+    Queue interrupted jobs again, or fail those that have used up their attempts
+
+    Args:
+        jobs: QuerySet of running jobs whose worker or worker process is gone
+        max_attempts: Number of claims after which a job fails for good
+        error: Message recorded on the failed jobs
+
+    Returns:
+        tuple: (number requeued, number failed)
+    """
+    from .models import TranscriptionJob
+
+    now = timezone.now()
+    requeued = jobs.filter(attempts__lt=max_attempts).update(
+        status=TranscriptionJob.STATUS_PENDING, worker='', lease_expires_at=None,
+        progress=0.0, updated_at=now
+    )
+
+    exhausted = jobs.filter(attempts__gte=max_attempts)
+    audio_paths = list(exhausted.values_list('audio_path', flat=True))
+    failed = exhausted.update(
+        status=TranscriptionJob.STATUS_FAILED, error=error, audio=None, audio_path='',
+        lease_expires_at=None, updated_at=now
+    )
+    for audio_path in audio_paths:
+        _discard_audio(audio_path)
+    return requeued, failed
+
+
+def recover_abandoned_jobs(max_attempts):
+    """Release running jobs whose lease ran out, i.e. whose worker is gone"""
+    from .models import TranscriptionJob
+
+    abandoned = TranscriptionJob.objects.filter(
+        status=TranscriptionJob.STATUS_RUNNING, lease_expires_at__lt=timezone.now()
+    )
+    return release_jobs(abandoned, max_attempts, 'The transcription worker stopped before the job finished')
+
+
+class TranscriptionWorker:
+    """
+    Claims pending jobs and runs them on a pool of worker processes
+
+    Args:
+        processes: Size of the process pool, i.e. jobs run at once
+        lease_seconds: How long a claim holds without being renewed
+        poll_interval: Seconds between two looks for new jobs while idle
+        max_attempts: Claims of one job before an interrupted run fails it
+    """
+
+    def __init__(self, processes=2, lease_seconds=60, poll_interval=1.0, max_attempts=2):
+        # Unique even when a restarted container reuses the PID
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.processes = processes
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.running = {}
+        self._pool = None
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Stop claiming jobs; ``run`` returns once the running ones have finished"""
+        self._stopping.set()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            # Spawned workers open their own database connections instead
+            # of inheriting the parent's sockets
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    def _collect_finished(self):
+        """Forget finished jobs; release those whose worker process died"""
+        from .models import TranscriptionJob
+
+        broken = False
+        for future in [future for future in self.running if future.done()]:
+            job_id = self.running.pop(future)
+            error = future.exception()
+            # run_transcription_job records its own failures, so an error
+            # here means the process running it died (BrokenProcessPool)
+            if error is not None:
+                broken = True
+                release_jobs(
+                    TranscriptionJob.objects.filter(id=job_id, worker=self.name),
+                    self.max_attempts, f'The transcription process stopped: {error}'
+                )
+
+        if broken:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+
+    def run(self, max_jobs=None):
+        """
+        Process jobs until ``stop()`` is called
+
+        Args:
+            max_jobs: Return after claiming this many jobs and finishing them
+        """
+        self._pool = self._new_pool()
+        claimed = 0
+        next_recovery = next_renewal = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_recovery:
+                    recover_abandoned_jobs(self.max_attempts)
+                    next_recovery = now + self.lease_seconds / 2
+
+                self._collect_finished()
+                if self.running and now >= next_renewal:
+                    renew_leases(self.name, list(self.running.values()), self.lease_seconds)
+                    next_renewal = now + self.lease_seconds / 3
+
+                done_claiming = self._stopping.is_set() or (max_jobs is not None and claimed >= max_jobs)
+                while not done_claiming and len(self.running) < self.processes:
+                    job_id = claim_next_job(self.name, self.lease_seconds)
+                    if job_id is None:
+                        break
+                    self.running[self._pool.submit(run_transcription_job, job_id)] = job_id
+                    claimed += 1
+                    done_claiming = max_jobs is not None and claimed >= max_jobs
+
+                if done_claiming and not self.running:
+                    return
+                if self.running:
+                    wait(list(self.running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self._stopping.wait(self.poll_interval)
+        finally:
+            # Jobs still running are recovered by the next worker once
+            # their lease has run out
+            self._pool.shutdown(wait=False, cancel_futures=True)
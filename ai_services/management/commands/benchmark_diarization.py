@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_services.services.audio_decoder import DecodedAudio
+from ai_services.services.diarization import get_diarizer
+from ai_services.services.vad import detect_speech_regions
+
+
+class Command(BaseCommand):
+    help = "Measure the real-time factor of the diarization engines on an audio file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('audio_file', help="Recording to diarize")
+        parser.add_argument(
+            '--engine', default=getattr(settings, 'TRANSCRIPTION_DIARIZATION_ENGINE', 'auto'),
+            choices=['auto', 'pyannote', 'mfcc'],
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Number of timed runs")
+
+    def handle(self, *args, **options):
+        audio = DecodedAudio.from_source(options['audio_file'])
+        regions = detect_speech_regions(audio)
+        diarizer = get_diarizer(getattr(settings, 'HUGGINGFACE_API_KEY', ''), options['engine'])
+
+        # The first run includes warm-up costs; report it separately
+        self.stdout.write(f"Engine: {diarizer.name}, audio: {audio.duration:.1f}s")
+        for run in range(options['repeat'] + 1):
+            result = diarizer.diarize(audio, regions)
+            label = 'warm-up' if run == 0 else f'run {run}'
+            self.stdout.write(
+                f"{label}: {result.elapsed:.3f}s, RTF {result.real_time_factor:.4f}, "
+                f"{result.to_dict()['num_speakers']} speakers"
+            )
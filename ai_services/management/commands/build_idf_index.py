@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_services.services.idf_index import rebuild_idf_index
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = "Recount the corpus IDF index used for title suggestions from all blog posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=getattr(settings, 'TITLE_IDF_INDEX_PATH', None),
+            help="Index file to write (defaults to TITLE_IDF_INDEX_PATH)"
+        )
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            raise CommandError("No index path given and TITLE_IDF_INDEX_PATH is not set")
+
+        contents = BlogPost.objects.values_list('content', flat=True).iterator(chunk_size=500)
+        index = rebuild_idf_index(options['path'], contents)
+        self.stdout.write(
+            f"Indexed {index.num_documents} posts, {len(index.vocabulary)} terms -> {options['path']}"
+        )
@@ -0,0 +1,39 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_services.jobs import TranscriptionWorker
+
+
+class Command(BaseCommand):
+    help = "Claim queued transcription jobs from the database and run them on a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=getattr(settings, 'TRANSCRIPTION_JOB_WORKERS', 2),
+            help="Jobs run at once (defaults to TRANSCRIPTION_JOB_WORKERS)"
+        )
+        parser.add_argument(
+            '--max-jobs', type=int, default=None,
+            help="Exit after this many jobs (default: run until stopped)"
+        )
+
+    def handle(self, *args, **options):
+        worker = TranscriptionWorker(
+            processes=options['processes'],
+            lease_seconds=getattr(settings, 'TRANSCRIPTION_JOB_LEASE_SECONDS', 60),
+            poll_interval=getattr(settings, 'TRANSCRIPTION_JOB_POLL_INTERVAL', 1.0),
+            max_attempts=getattr(settings, 'TRANSCRIPTION_JOB_MAX_ATTEMPTS', 2)
+        )
+
+        # Finish the running jobs on shutdown instead of abandoning them
+        def stop(signum, frame):
+            self.stdout.write("Stopping after the running jobs...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"Transcription worker {worker.name} running {worker.processes} processes")
+        worker.run(max_jobs=options['max_jobs'])
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0002_result_cache'),
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTitleSuggestions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('num_suggestions', models.PositiveSmallIntegerField()),
+                ('titles', models.JSONField(default=list)),
+                ('topics', models.JSONField(default=list)),
+                ('key_sentences', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='title_suggestions', to='blog.blogpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_hash'], name='post_titles_content_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_interrupted_jobs(apps, schema_editor):
+    """Jobs running on the former in-process pools died with them"""
+    TranscriptionJob = apps.get_model('ai_services', 'TranscriptionJob')
+    TranscriptionJob.objects.filter(status__in=['pending', 'running']).update(
+        status='failed', error='Interrupted by an upgrade; please upload the recording again'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0003_post_title_suggestions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcriptionjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transcriptionjob',
+            name='audio',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcriptionjob',
+            name='audio_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='transcriptionjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcriptionjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='transcriptionjob',
+            index=models.Index(fields=['status', 'created_at'], name='transcription_job_queue_idx'),
+        ),
+        migrations.RunPython(fail_interrupted_jobs, migrations.RunPython.noop),
+    ]
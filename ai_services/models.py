@@ -0,0 +1,119 @@
+import hashlib
+import json
+import uuid
+
+from django.db import models
+from django.contrib.auth.models import User
+
+def result_cache_key(content_hash, options):
+    """Build a cache key from the content hash and the options that shape the result"""
+    encoded_options = json.dumps(options, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{encoded_options}".encode()).hexdigest()
+
+
+def content_digest(content):
+    """Hash of a post's text, insensitive to line-ending and edge whitespace differences"""
+    normalized = content.replace('\r\n', '\n').strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class CachedResult(models.Model):
+    """Entry of a database-backed LRU cache shared by all worker processes"""
+    namespace = models.CharField(max_length=32)
+    key = models.CharField(max_length=64)
+    value = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    accessed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.namespace}:{self.key}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'key'], name='unique_cached_result_key'),
+        ]
+        indexes = [
+            models.Index(fields=['namespace', 'accessed_at'], name='cached_result_lru_idx'),
+        ]
+
+
+class TranscriptionJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transcription_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.FloatField(default=0.0)
+    options = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # The upload waiting for the worker: its bytes, or the path of its spill
+    # file. Both are cleared once the job has finished
+    audio = models.BinaryField(null=True, blank=True)
+    audio_path = models.CharField(max_length=500, blank=True)
+    # Transcription worker running the job, and until when its claim holds
+    # without being renewed
+    worker = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    @property
+    def cache_key(self):
+        """Key of this job's result in the transcription cache"""
+        return result_cache_key(self.content_hash, self.options)
+
+    def to_dict(self):
+        """Serialize the job for the polling endpoint"""
+        data = {
+            'job_id': str(self.id),
+            'status': self.status,
+            'progress': round(self.progress, 3),
+        }
+        if self.status == self.STATUS_COMPLETED:
+            data['result'] = self.result
+        elif self.status == self.STATUS_FAILED:
+            data['error'] = self.error
+        return data
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest pending job
+            models.Index(fields=['status', 'created_at'], name='transcription_job_queue_idx'),
+        ]
+
+
+class PostTitleSuggestions(models.Model):
+    """Titles, topics and key sentences precomputed for the saved content of a blog post"""
+    post = models.OneToOneField(
+        'blog.BlogPost', on_delete=models.CASCADE, related_name='title_suggestions'
+    )
+    content_hash = models.CharField(max_length=64)
+    num_suggestions = models.PositiveSmallIntegerField()
+    titles = models.JSONField(default=list)
+    topics = models.JSONField(default=list)
+    key_sentences = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Titles for post {self.post_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_hash'], name='post_titles_content_idx'),
+        ]
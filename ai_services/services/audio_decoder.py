@@ -0,0 +1,276 @@
+import io
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+
+class AudioDecodingError(Exception):
+    """Raised when an upload cannot be decoded into PCM"""
+
+
+class FFmpegNotFoundError(AudioDecodingError):
+    """Raised when a format needs ffmpeg and it isn't installed"""
+
+
+class DecodedAudio:
+    """Mono 16-bit PCM buffer decoded once and shared by every pipeline stage"""
+
+    SAMPLE_WIDTH = 2
+    TARGET_SAMPLE_RATE = 16000
+    # Bytes of a file object written to ffmpeg at a time
+    PIPE_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_source(cls, source, spill_dir=None):
+        """
+        Decode audio from a path, raw bytes or a file object
+
+        PCM WAV is parsed in-process. Everything else is piped through
+        ffmpeg's stdin/stdout, so no intermediate files are written; file
+        objects are streamed to ffmpeg in chunks rather than read into
+        memory first. Only containers that ffmpeg cannot read from a pipe
+        (e.g. MP4 with the index at the end) are spilled to a unique file in
+        ``spill_dir``.
+
+        Args:
+            source: Path to an audio file, the encoded bytes, or a file object
+            spill_dir: Directory for the rare spill file, ideally on tmpfs
+
+        Returns:
+            DecodedAudio: The decoded audio
+        """
+        if hasattr(source, 'read'):
+            seekable = getattr(source, 'seekable', lambda: False)()
+            if not seekable:
+                # Can't look at the header and rewind: decode from memory
+                source = source.read()
+            else:
+                return cls._from_file_object(source, spill_dir)
+
+        if isinstance(source, (bytes, bytearray)):
+            header = bytes(source[:12])
+        else:
+            with open(source, 'rb') as audio_file:
+                header = audio_file.read(12)
+
+        if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+            try:
+                return cls._from_wav(source)
+            except (wave.Error, EOFError):
+                # Compressed or float WAV: let ffmpeg handle it
+                pass
+
+        return cls._from_ffmpeg(source, spill_dir)
+
+    @classmethod
+    def _from_file_object(cls, file_obj, spill_dir=None):
+        """Decode a seekable file object without reading it into memory"""
+        start = file_obj.tell()
+        header = file_obj.read(12)
+        file_obj.seek(start)
+
+        if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+            try:
+                return cls._from_wav(file_obj)
+            except (wave.Error, EOFError):
+                file_obj.seek(start)
+
+        output_args = cls._ffmpeg_output_args()
+        try:
+            return cls._run_ffmpeg(['-i', 'pipe:0'] + output_args, stdin=file_obj)
+        except FFmpegNotFoundError:
+            raise
+        except AudioDecodingError:
+            file_obj.seek(start)
+            with tempfile.NamedTemporaryFile(dir=spill_dir, prefix='audio-') as spill:
+                shutil.copyfileobj(file_obj, spill, cls.PIPE_CHUNK_SIZE)
+                spill.flush()
+                return cls._run_ffmpeg(['-i', spill.name] + output_args)
+
+    @classmethod
+    def _from_wav(cls, source):
+        """Parse PCM WAV directly, downmixing to mono"""
+        wav_file = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+        with wave.open(wav_file, 'rb') as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+
+        if sample_width == 1:
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+        elif sample_width == 2:
+            samples = np.frombuffer(frames, dtype='<i2')
+        elif sample_width == 3:
+            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+            samples = (raw[:, 2].astype(np.int8).astype(np.int16) << 8) | raw[:, 1]
+        elif sample_width == 4:
+            samples = (np.frombuffer(frames, dtype='<i4') >> 16).astype(np.int16)
+        else:
+            raise wave.Error(f"unsupported sample width: {sample_width}")
+
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+
+        return cls(samples.astype(np.int16), sample_rate)
+
+    @classmethod
+    def _ffmpeg_output_args(cls):
+        return [
+            '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ac', '1', '-ar', str(cls.TARGET_SAMPLE_RATE), 'pipe:1'
+        ]
+
+    @classmethod
+    def _from_ffmpeg(cls, source, spill_dir=None):
+        """Decode any ffmpeg-supported format over pipes"""
+        output_args = cls._ffmpeg_output_args()
+
+        if not isinstance(source, (bytes, bytearray)):
+            return cls._run_ffmpeg(['-i', source] + output_args)
+
+        try:
+            return cls._run_ffmpeg(['-i', 'pipe:0'] + output_args, stdin=bytes(source))
+        except FFmpegNotFoundError:
+            # A spill file wouldn't help
+            raise
+        except AudioDecodingError:
+            # Some containers need a seekable input; spill to a private file
+            with tempfile.NamedTemporaryFile(dir=spill_dir, prefix='audio-') as spill:
+                spill.write(source)
+                spill.flush()
+                return cls._run_ffmpeg(['-i', spill.name] + output_args)
+
+    @classmethod
+    def _run_ffmpeg(cls, args, stdin=None):
+        """
+        Run ffmpeg and read the PCM it writes to stdout
+
+        Args:
+            args: ffmpeg arguments
+            stdin: Bytes or a file object to feed to ``pipe:0``, if any
+        """
+        command = ['ffmpeg', '-hide_banner', '-loglevel', 'error'] + args
+        try:
+            if stdin is None or isinstance(stdin, (bytes, bytearray)):
+                process = subprocess.run(
+                    command,
+                    input=stdin,
+                    stdin=subprocess.DEVNULL if stdin is None else None,
+                    capture_output=True
+                )
+                returncode, output, errors = process.returncode, process.stdout, process.stderr
+            else:
+                returncode, output, errors = cls._pipe_file_object(command, stdin)
+        except FileNotFoundError:
+            raise FFmpegNotFoundError("ffmpeg is required to decode this audio format")
+
+        if returncode != 0 or not output:
+            message = errors.decode(errors='replace').strip()
+            raise AudioDecodingError(f"ffmpeg could not decode the audio: {message}")
+
+        return cls(np.frombuffer(output, dtype='<i2'), cls.TARGET_SAMPLE_RATE)
+
+    @classmethod
+    def _pipe_file_object(cls, command, file_obj):
+        """Run a command, writing a file object to its stdin chunk by chunk"""
+        # stderr goes to a file so neither pipe can fill up while stdout is read
+        with tempfile.TemporaryFile() as errors:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errors)
+            read_errors = []
+
+            def feed():
+                try:
+                    for chunk in iter(lambda: file_obj.read(cls.PIPE_CHUNK_SIZE), b''):
+                        process.stdin.write(chunk)
+                except BrokenPipeError:
+                    pass  # ffmpeg stopped reading; its exit status tells why
+                except Exception as e:
+                    read_errors.append(e)
+                finally:
+                    try:
+                        process.stdin.close()
+                    except BrokenPipeError:
+                        pass
+
+            writer = threading.Thread(target=feed, name='ffmpeg-stdin', daemon=True)
+            writer.start()
+            output = process.stdout.read()
+            process.stdout.close()
+            returncode = process.wait()
+            writer.join()
+            if read_errors:
+                raise AudioDecodingError(f"could not read the audio: {read_errors[0]}")
+
+            errors.seek(0)
+            return returncode, output, errors.read()
+
+    @property
+    def duration(self):
+        """Length of the audio in seconds"""
+        return len(self.samples) / float(self.sample_rate)
+
+    def frame_energy(self, frame_seconds=0.02):
+        """
+        Compute the RMS energy of consecutive fixed-size frames
+
+        Args:
+            frame_seconds: Frame length in seconds
+
+        Returns:
+            tuple: (energies as a float32 array, frame length in samples)
+        """
+        frame_length = max(1, int(frame_seconds * self.sample_rate))
+        num_frames = len(self.samples) // frame_length
+        if num_frames == 0:
+            return np.zeros(0, dtype=np.float32), frame_length
+
+        frames = self.samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+        frames = frames.astype(np.float32)
+        return np.sqrt(np.mean(frames * frames, axis=1)), frame_length
+
+    def to_audio_data(self, start=0.0, end=None):
+        """
+        Wrap a slice of the PCM buffer for the speech_recognition API
+
+        Args:
+            start: Slice start in seconds
+            end: Slice end in seconds (defaults to the end of the audio)
+
+        Returns:
+            sr.AudioData: Audio data ready to be passed to a recognizer
+        """
+        first = int(start * self.sample_rate)
+        last = len(self.samples) if end is None else int(end * self.sample_rate)
+        return sr.AudioData(
+            self.samples[first:last].astype('<i2', copy=False).tobytes(),
+            self.sample_rate,
+            self.SAMPLE_WIDTH
+        )
+
+    def spans_to_audio_data(self, spans):
+        """
+        Concatenate several (start, end) spans into one recognizer payload
+
+        Used to send only the voiced parts of a recording; the caller keeps
+        the span list to map results back to original timestamps.
+        """
+        pieces = [
+            self.samples[int(start * self.sample_rate):int(end * self.sample_rate)]
+            for start, end in spans
+        ]
+        samples = np.concatenate(pieces) if pieces else self.samples[:0]
+        return sr.AudioData(
+            samples.astype('<i2', copy=False).tobytes(),
+            self.sample_rate,
+            self.SAMPLE_WIDTH
+        )
@@ -1,82 +1,305 @@
-import os
-import json
-import speech_recognition as sr
-from pydub import AudioSegment
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from .audio_decoder import DecodedAudio
+from .diarization import get_diarizer
+from .metrics import FALLBACKS, record_payload, stage
+from .recognizers import get_recognizer
+from .vad import detect_speech_regions
 
 class AudioTranscriptionService:
-    """Service for transcribing audio files with basic speaker segmentation"""
-    
-    def __init__(self, huggingface_token=None):
+    """Service for transcribing audio files with speaker diarization"""
+
+    def __init__(self, huggingface_token=None, max_workers=4, max_chunk_seconds=30.0,
+                 min_chunk_seconds=5.0, spill_dir=None, use_vad=True,
+                 diarization_engine='auto', recognizer_backend='google', recognizer_options=None,
+                 default_language='en-US', candidate_languages=None, language_sample_seconds=10.0):
         self.huggingface_token = huggingface_token
-        
-    def _convert_audio_to_wav(self, audio_path):
-        """Convert audio file to wav format for processing"""
-        audio = AudioSegment.from_file(audio_path)
-        temp_wav = os.path.join(os.path.dirname(audio_path), 'temp.wav')
-        audio.export(temp_wav, format='wav')
-        return temp_wav
-    
-    def _detect_language(self, audio_path):
-        """Detect the language of the audio"""
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(audio_path) as source:
-            audio = recognizer.record(source)
-            
-        try:
-            # Using Google's service to detect language
-            language = recognizer.recognize_google(audio, show_all=True)
-            if language and 'alternative' in language:
-                return language.get('language', 'en-US')
-        except:
-            pass
-        
-        return 'en-US'  # Default to English if detection fails
-    
-    def transcribe_audio(self, audio_path):
+        self.default_language = default_language
+        self.candidate_languages = candidate_languages or [default_language]
+        self.language_sample_seconds = language_sample_seconds
+        self.recognizer = get_recognizer(recognizer_backend, **(recognizer_options or {}))
+        self.diarization_engine = diarization_engine
+        self.spill_dir = spill_dir
+        self.use_vad = use_vad
+        self.max_workers = max_workers
+        self.max_chunk_seconds = max_chunk_seconds
+        self.min_chunk_seconds = min(min_chunk_seconds, max_chunk_seconds)
+
+    def _decode_audio(self, audio_source):
+        """Decode the audio once into a PCM buffer shared by all stages"""
+        with stage('transcription', 'decode'):
+            return DecodedAudio.from_source(audio_source, spill_dir=self.spill_dir)
+
+    def _language_sample(self, regions, sample_seconds):
+        """The first ``sample_seconds`` of speech, as (start, end) spans"""
+        spans = []
+        remaining = sample_seconds
+        for start, end in regions:
+            if remaining <= 0:
+                break
+            end = min(end, start + remaining)
+            spans.append((start, end))
+            remaining -= end - start
+        return spans
+
+    def _detect_language(self, audio, regions=None):
+        """Identify the language from a short sample of the speech"""
+        if regions is None:
+            regions = [(0.0, audio.duration)]
+
+        sample = self._language_sample(regions, self.language_sample_seconds)
+        if sample:
+            try:
+                with stage('transcription', 'language', backend=self.recognizer.name):
+                    language = self.recognizer.identify_language(
+                        audio.spans_to_audio_data(sample),
+                        self.candidate_languages
+                    )
+                if language:
+                    return language
+            except Exception:
+                pass
+
+        FALLBACKS.inc(pipeline='transcription', reason='default_language')
+        return self.default_language  # Fall back when identification fails
+
+    def _split_span(self, audio, energy, frame_length, start, end):
+        """
+        Split one span into bounded windows, cutting at the quietest frame
+
+        Each window is at most ``max_chunk_seconds`` long. When a window has
+        to be cut, the cut is placed on the lowest-energy frame between
+        ``min_chunk_seconds`` and ``max_chunk_seconds`` so that words are not
+        split across chunks.
+        """
+        max_frames = max(1, int(self.max_chunk_seconds * audio.sample_rate) // frame_length)
+        min_frames = max(1, int(self.min_chunk_seconds * audio.sample_rate) // frame_length)
+        cursor = int(start * audio.sample_rate) // frame_length
+        last = int(end * audio.sample_rate) // frame_length
+
+        windows = []
+        cursor_time = start
+        while cursor + max_frames < last:
+            window = energy[cursor + min_frames:cursor + max_frames + 1]
+            cursor = cursor + min_frames + int(np.argmin(window))
+            cut_time = cursor * frame_length / audio.sample_rate
+            windows.append((cursor_time, cut_time))
+            cursor_time = cut_time
+
+        windows.append((cursor_time, end))
+        return windows
+
+    def _plan_chunks(self, audio, regions=None):
+        """
+        Group the audio into recognition chunks of bounded length
+
+        Args:
+            audio: DecodedAudio to plan
+            regions: Speech regions from the VAD pre-pass; the whole
+                recording is used when omitted
+
+        Returns:
+            list: One list of (start, end) spans per chunk. Each chunk holds at
+            most ``max_chunk_seconds`` of audio and is sent as one request.
+        """
+        energy, frame_length = audio.frame_energy()
+        if regions is None:
+            regions = [(0.0, audio.duration)]
+
+        pieces = []
+        for start, end in regions:
+            pieces.extend(self._split_span(audio, energy, frame_length, start, end))
+
+        # Pack consecutive speech pieces into as few chunks as fit the limit
+        chunks = []
+        current = []
+        current_seconds = 0.0
+        for start, end in pieces:
+            if current and current_seconds + (end - start) > self.max_chunk_seconds:
+                chunks.append(current)
+                current = []
+                current_seconds = 0.0
+            current.append((start, end))
+            current_seconds += end - start
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _plan_speaker_chunks(self, audio, turns):
+        """
+        Turn diarized speaker turns into recognition chunks
+
+        Chunks never mix speakers: every turn is split into bounded windows
+        on its own.
+
+        Returns:
+            list: (speaker, spans) tuples in time order
+        """
+        energy, frame_length = audio.frame_energy()
+        return [
+            (speaker, [window])
+            for start, end, speaker in turns
+            for window in self._split_span(audio, energy, frame_length, start, end)
+        ]
+
+    def _recognize_chunk(self, audio, spans, language):
+        """Transcribe the spans of a single chunk of the decoded audio"""
+        audio_data = audio.spans_to_audio_data(spans)
+        record_payload('recognizer_audio', audio_data.frame_data)
+        with stage('transcription', 'recognize', backend=self.recognizer.name):
+            return self.recognizer.recognize(audio_data, language)
+
+    def _transcribe_chunked(self, audio, language, chunks, progress_callback=None,
+                            progress_start=0.2):
+        """
+        Transcribe chunks concurrently and stitch the results into segments
+
+        Args:
+            chunks: (speaker, spans) tuples as planned for this recording
+
+        Returns:
+            list: Segments in time order; chunks without speech are dropped.
+            A chunk the recognizer failed on keeps an empty segment with an
+            ``error``, so one bad chunk doesn't lose the whole recording.
+
+        Raises:
+            Exception: The first error, when every chunk failed
+        """
+        texts = [''] * len(chunks)
+        errors = [None] * len(chunks)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._recognize_chunk, audio, spans, language): index
+                for index, (_, spans) in enumerate(chunks)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    texts[index] = future.result()
+                except Exception as e:
+                    FALLBACKS.inc(pipeline='transcription', reason='chunk_error')
+                    errors[index] = e
+                progress = progress_start + (1.0 - progress_start) * done / len(chunks)
+                self._report_progress(progress_callback, progress)
+
+        if chunks and all(error is not None for error in errors):
+            raise errors[0]
+
+        # Timestamps come from the spans, i.e. the original recording
+        segments = []
+        for (speaker, spans), text, error in zip(chunks, texts, errors):
+            if not text and error is None:
+                continue
+            segment = {
+                'speaker': speaker,
+                'start': round(spans[0][0], 3),
+                'end': round(spans[-1][1], 3),
+                'text': text
+            }
+            if error is not None:
+                segment['error'] = str(error)
+            segments.append(segment)
+        return segments
+
+    def _report_progress(self, progress_callback, progress):
+        """Forward pipeline progress (0.0 - 1.0) to the caller, if it asked for it"""
+        if progress_callback is not None:
+            progress_callback(min(progress, 1.0))
+
+    def _diarize(self, audio, regions):
+        """Assign speaker turns with the process-wide diarization engine"""
+        diarizer = get_diarizer(self.huggingface_token, self.diarization_engine)
+        with stage('transcription', 'diarize', backend=diarizer.name):
+            return diarizer.diarize(audio, regions)
+
+    def transcribe_audio(self, audio_source, chunked=False, progress_callback=None, use_vad=None,
+                         diarize=False, language=None):
         """
         Transcribe audio file with basic segmentation
-        
+
         Args:
-            audio_path: Path to the audio file
-            
+            audio_source: Path to the audio file, its encoded bytes, or a
+                file object
+            chunked: Split the audio at silence boundaries and transcribe the
+                windows in parallel instead of sending it as a single request
+            progress_callback: Optional callable receiving the fraction of
+                work completed
+            use_vad: Send only the speech regions found by voice activity
+                detection to the recognizer (defaults to the service setting)
+            diarize: Split the transcript into per-speaker segments
+            language: Language code of the recording; identified from a
+                short speech sample when omitted
+
         Returns:
             dict: JSON-serializable dictionary with transcription results
         """
-        # Convert audio to WAV format (if needed)
-        wav_path = self._convert_audio_to_wav(audio_path)
-        
+        if use_vad is None:
+            use_vad = self.use_vad
+
         try:
-            # Detect language
-            language = self._detect_language(wav_path)
-            
-            # Transcribe using Google Speech Recognition
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(wav_path) as source:
-                audio = recognizer.record(source)
-                
-            text = recognizer.recognize_google(audio)
-            
-            # Create a simple segment
-            result = {
-                'language': language,
-                'segments': [
+            # Decode once; every later stage reads from this buffer
+            audio = self._decode_audio(audio_source)
+            self._report_progress(progress_callback, 0.1)
+
+            # Skip silence and hold music before recognition
+            if use_vad:
+                with stage('transcription', 'vad'):
+                    regions = detect_speech_regions(audio)
+            else:
+                regions = [(0.0, audio.duration)]
+
+            # Identify the language once, on the first seconds of speech
+            if language is None:
+                language = self._detect_language(audio, regions)
+            self._report_progress(progress_callback, 0.2)
+
+            diarization = None
+            if diarize and regions:
+                diarization = self._diarize(audio, regions)
+                self._report_progress(progress_callback, 0.4)
+                chunks = self._plan_speaker_chunks(audio, diarization.turns)
+                segments = self._transcribe_chunked(
+                    audio, language, chunks, progress_callback, progress_start=0.4
+                )
+                text = ' '.join(segment['text'] for segment in segments if segment['text'])
+            elif chunked:
+                chunks = [('SPEAKER_00', spans) for spans in self._plan_chunks(audio, regions)]
+                segments = self._transcribe_chunked(audio, language, chunks, progress_callback)
+                text = ' '.join(segment['text'] for segment in segments if segment['text'])
+            elif regions:
+                # Transcribe all speech in one request to the backend
+                text = self._recognize_chunk(audio, regions, language)
+
+                # Create a simple segment
+                segments = [
                     {
                         'speaker': 'SPEAKER_00',
-                        'start': 0.0,
-                        'end': len(AudioSegment.from_wav(wav_path)) / 1000.0,
+                        'start': round(regions[0][0], 3),
+                        'end': round(regions[-1][1], 3),
                         'text': text
                     }
-                ],
+                ]
+            else:
+                # No speech at all: nothing to send to the recognizer
+                text = ''
+                segments = []
+
+            self._report_progress(progress_callback, 1.0)
+            record_payload('transcript', text)
+
+            result = {
+                'language': language,
+                'segments': segments,
                 'complete_transcript': text
             }
-            
-            # Clean up temporary WAV file
-            os.remove(wav_path)
-            
+            if diarization is not None:
+                result['diarization'] = diarization.to_dict()
+
             return result
-        
+
         except Exception as e:
-            # Clean up and raise error
-            if os.path.exists(wav_path):
-                os.remove(wav_path)
-            raise Exception(f"Transcription failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Transcription failed: {str(e)}")
@@ -0,0 +1,395 @@
+"""
+Speaker diarization engines.
+
+``PyannoteDiarizer`` wraps the pretrained pyannote.audio pipeline, which is
+loaded once per process and kept warm. ``MFCCDiarizer`` is a lightweight CPU
+fallback for when pyannote, its model weights or a HuggingFace token are not
+available: it embeds short windows of speech with MFCC statistics and
+clusters them.
+
+Both engines return speaker turns as (start, end, speaker) tuples in seconds
+and report their real-time factor (processing time / audio duration).
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+import scipy.fft
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import pdist, squareform
+from sklearn.metrics import silhouette_score
+
+logger = logging.getLogger(__name__)
+
+PYANNOTE_MODEL = 'pyannote/speaker-diarization-3.1'
+
+_pipeline = None
+_pipeline_unavailable = False
+_pipeline_lock = threading.Lock()
+
+
+class DiarizationResult:
+    """Speaker turns plus the cost of computing them"""
+
+    def __init__(self, turns, engine, elapsed, duration):
+        self.turns = turns
+        self.engine = engine
+        self.elapsed = elapsed
+        self.real_time_factor = elapsed / duration if duration else 0.0
+
+    def to_dict(self):
+        return {
+            'engine': self.engine,
+            'num_speakers': len({speaker for _, _, speaker in self.turns}),
+            'real_time_factor': round(self.real_time_factor, 4),
+        }
+
+
+class BaseDiarizer:
+    """Common timing wrapper around an engine's ``_diarize`` implementation"""
+
+    name = None
+
+    def diarize(self, audio, regions=None):
+        """
+        Assign speakers to time regions of the audio
+
+        Args:
+            audio: DecodedAudio to diarize
+            regions: Optional speech regions from the VAD pre-pass
+
+        Returns:
+            DiarizationResult: Turns sorted by start time
+        """
+        started = time.perf_counter()
+        turns = self._diarize(audio, regions)
+        elapsed = time.perf_counter() - started
+
+        result = DiarizationResult(turns, self.name, elapsed, audio.duration)
+        logger.info(
+            "Diarized %.1fs of audio with %s in %.2fs (RTF %.3f)",
+            audio.duration, self.name, elapsed, result.real_time_factor
+        )
+        return result
+
+    def _diarize(self, audio, regions):
+        raise NotImplementedError
+
+
+class PyannoteDiarizer(BaseDiarizer):
+    """Diarization with the pretrained pyannote.audio pipeline on CPU"""
+
+    name = 'pyannote'
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    @staticmethod
+    def _crop(audio, regions):
+        """
+        The samples of the speech regions, back to back
+
+        Returns:
+            tuple: (int16 samples, offsets) where each offset is the start and
+            end of a region in the cropped audio and its start in the
+            original recording, all in seconds
+        """
+        pieces, offsets, position = [], [], 0.0
+        for start, end in regions:
+            first, last = int(start * audio.sample_rate), int(end * audio.sample_rate)
+            if last <= first:
+                continue
+            pieces.append(audio.samples[first:last])
+            length = (last - first) / audio.sample_rate
+            offsets.append((position, position + length, first / audio.sample_rate))
+            position += length
+        samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int16)
+        return samples, offsets
+
+    @staticmethod
+    def _uncrop(turns, offsets):
+        """Split turns of the cropped audio at region boundaries and move them to the original times"""
+        restored = []
+        for turn_start, turn_end, speaker in turns:
+            for piece_start, piece_end, original_start in offsets:
+                start, end = max(turn_start, piece_start), min(turn_end, piece_end)
+                if start < end:
+                    shift = original_start - piece_start
+                    restored.append((start + shift, end + shift, speaker))
+        return sorted(restored)
+
+    def _diarize(self, audio, regions):
+        import torch
+
+        if regions is None:
+            regions = [(0.0, audio.duration)]
+
+        # Only the speech regions go through the pipeline
+        samples, offsets = self._crop(audio, regions)
+        if not len(samples):
+            return []
+
+        waveform = torch.from_numpy(samples.astype(np.float32) / 32768.0)[None, :]
+        annotation = self.pipeline({'waveform': waveform, 'sample_rate': audio.sample_rate})
+        return self._uncrop(
+            [
+                (float(turn.start), float(turn.end), speaker)
+                for turn, _, speaker in annotation.itertracks(yield_label=True)
+            ],
+            offsets
+        )
+
+
+def load_pyannote_pipeline(huggingface_token):
+    """
+    Load the pyannote pipeline once per process
+
+    Returns:
+        The pipeline, or None when pyannote or its weights are unavailable
+    """
+    global _pipeline, _pipeline_unavailable
+    with _pipeline_lock:
+        if _pipeline is None and huggingface_token and not _pipeline_unavailable:
+            try:
+                import torch
+                from pyannote.audio import Pipeline
+
+                pipeline = Pipeline.from_pretrained(PYANNOTE_MODEL, use_auth_token=huggingface_token)
+                if pipeline is not None:
+                    _pipeline = pipeline.to(torch.device('cpu'))
+            except Exception as e:
+                # Don't retry the import/download on every request
+                _pipeline_unavailable = True
+                logger.warning("pyannote pipeline unavailable, using MFCC fallback: %s", e)
+        return _pipeline
+
+
+class MFCCDiarizer(BaseDiarizer):
+    """Cluster MFCC statistics of short speech windows into speakers"""
+
+    name = 'mfcc'
+    # Frames transformed at a time (about 40s of audio), which bounds the
+    # memory of the spectra however long the recording is
+    FRAME_BLOCK = 4096
+
+    def __init__(self, window_seconds=1.5, hop_seconds=0.75, max_speakers=6,
+                 min_silhouette=0.1, min_separation=1.5, num_mfcc=13, num_filters=26,
+                 silhouette_sample=1000):
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.max_speakers = max_speakers
+        self.min_silhouette = min_silhouette
+        self.min_separation = min_separation
+        self.num_mfcc = num_mfcc
+        self.num_filters = num_filters
+        self.silhouette_sample = silhouette_sample
+
+    def _mel_filterbank(self, sample_rate, n_fft):
+        """Triangular filters spaced evenly on the mel scale"""
+        def hz_to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+        def mel_to_hz(mel):
+            return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+        mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), self.num_filters + 2)
+        bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+
+        filters = np.zeros((self.num_filters, n_fft // 2 + 1), dtype=np.float32)
+        for i in range(1, self.num_filters + 1):
+            left, center, right = bins[i - 1], bins[i], bins[i + 1]
+            if center > left:
+                filters[i - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                filters[i - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        return filters
+
+    def _mfcc(self, audio):
+        """
+        Compute MFCCs for 25ms frames with a 10ms hop over the whole recording
+
+        Frames are transformed ``FRAME_BLOCK`` at a time in float32, so only
+        the MFCC matrix itself grows with the length of the recording.
+
+        Returns:
+            tuple: (MFCC matrix of shape (frames, num_mfcc), hop in seconds)
+        """
+        sample_rate = audio.sample_rate
+        frame_length = int(0.025 * sample_rate)
+        hop_length = int(0.010 * sample_rate)
+        n_fft = 1 << (frame_length - 1).bit_length()
+
+        samples = audio.samples
+        if len(samples) < frame_length:
+            return np.zeros((0, self.num_mfcc), dtype=np.float32), hop_length / sample_rate
+
+        window = np.hamming(frame_length).astype(np.float32)
+        filterbank = self._mel_filterbank(sample_rate, n_fft).T
+        # DCT-II as a matrix product, dropping c0 (overall loudness)
+        n = np.arange(self.num_filters)
+        k = np.arange(1, self.num_mfcc + 1)[:, None]
+        dct = np.cos(np.pi * k * (2 * n + 1) / (2 * self.num_filters)).T.astype(np.float32)
+
+        num_frames = 1 + (len(samples) - frame_length) // hop_length
+        mfcc = np.empty((num_frames, self.num_mfcc), dtype=np.float32)
+        for first in range(0, num_frames, self.FRAME_BLOCK):
+            last = min(first + self.FRAME_BLOCK, num_frames)
+            start = first * hop_length
+            end = (last - 1) * hop_length + frame_length
+
+            # Pre-emphasis needs the sample before the block
+            block = samples[max(start - 1, 0):end].astype(np.float32) / 32768.0
+            emphasized = block[1:] - 0.97 * block[:-1]
+            if not start:
+                emphasized = np.append(block[0], emphasized)
+
+            frames = np.lib.stride_tricks.sliding_window_view(emphasized, frame_length)[::hop_length]
+            spectrum = np.abs(scipy.fft.rfft(frames * window, n_fft)) ** 2 / n_fft
+            mfcc[first:last] = np.log(spectrum @ filterbank + 1e-10) @ dct
+        return mfcc, hop_length / sample_rate
+
+    def _windows(self, regions):
+        """Fixed-size analysis windows laid over the speech regions"""
+        windows = []
+        for start, end in regions:
+            cursor = start
+            while cursor < end:
+                windows.append((cursor, min(cursor + self.window_seconds, end)))
+                if cursor + self.window_seconds >= end:
+                    break
+                cursor += self.hop_seconds
+        return windows
+
+    def _cluster(self, embeddings):
+        """
+        Pick the number of speakers by silhouette score and label the windows
+
+        The Ward tree is built once and cut at every candidate number of
+        speakers, and silhouettes are scored on a fixed sample of at most
+        ``silhouette_sample`` windows, so long recordings don't repeat the
+        quadratic work per candidate. A split is only accepted when every
+        pair of cluster centroids is at least ``min_separation`` apart, so a
+        single voice is not carved up into several speakers by ordinary
+        variation between windows.
+        """
+        if len(embeddings) < 3:
+            return np.zeros(len(embeddings), dtype=int)
+
+        tree = linkage(embeddings, method='ward')
+        sample = np.arange(len(embeddings))
+        if len(sample) > self.silhouette_sample:
+            sample = np.sort(np.random.default_rng(0).choice(sample, self.silhouette_sample, replace=False))
+        sample_distances = squareform(pdist(embeddings[sample]))
+
+        best_labels = np.zeros(len(embeddings), dtype=int)
+        best_score = self.min_silhouette
+        for num_speakers in range(2, min(self.max_speakers, len(embeddings) - 1) + 1):
+            labels = fcluster(tree, num_speakers, criterion='maxclust') - 1
+            # Tied merge heights can leave fewer clusters than asked for
+            if labels.max() + 1 != num_speakers:
+                continue
+            centroids = np.array([embeddings[labels == label].mean(axis=0) for label in range(num_speakers)])
+            gaps = np.linalg.norm(centroids[:, None] - centroids[None, :], axis=-1)
+            if gaps[np.triu_indices(num_speakers, 1)].min() < self.min_separation:
+                continue
+
+            if len(np.unique(labels[sample])) < 2:
+                continue
+            score = silhouette_score(sample_distances, labels[sample], metric='precomputed')
+            if score > best_score:
+                best_labels, best_score = labels, score
+        return self._absorb_transition_clusters(best_labels, embeddings)
+
+    def _absorb_transition_clusters(self, labels, embeddings):
+        """
+        Fold clusters made only of windows straddling a speaker change
+
+        A window that overlaps two speakers embeds somewhere between them and
+        can form a cluster of its own. Real speakers hold the floor for at
+        least two consecutive windows, so a cluster that never does is
+        relabelled window by window to the closer of its neighbours.
+        """
+        labels = labels.copy()
+        for label in np.unique(labels):
+            members = np.flatnonzero(labels == label)
+            others = np.unique(labels[labels != label])
+            if len(others) == 0 or np.any(np.diff(members) == 1):
+                continue
+
+            centroids = {
+                other: embeddings[labels == other].mean(axis=0) for other in others
+            }
+            for index in members:
+                neighbours = {
+                    labels[i] for i in (index - 1, index + 1)
+                    if 0 <= i < len(labels) and labels[i] != label
+                } or set(others)
+                labels[index] = min(
+                    neighbours,
+                    key=lambda other: np.linalg.norm(embeddings[index] - centroids[other])
+                )
+
+        return labels
+
+    def _diarize(self, audio, regions):
+        if regions is None:
+            regions = [(0.0, audio.duration)]
+
+        windows = self._windows(regions)
+        if not windows:
+            return []
+
+        mfcc, frame_hop = self._mfcc(audio)
+        if len(mfcc) == 0:
+            return [(start, end, 'SPEAKER_00') for start, end in regions]
+
+        # Mean MFCC vector of every window, measured in units of the
+        # frame-to-frame spread so that thresholds don't depend on loudness
+        speech_frames = np.zeros(len(mfcc), dtype=bool)
+        for start, end in regions:
+            speech_frames[int(start / frame_hop):int(end / frame_hop)] = True
+        scale = mfcc[speech_frames].std(axis=0) + 1e-6
+
+        bounds = np.array(windows)
+        first = np.clip((bounds[:, 0] / frame_hop).astype(int), 0, len(mfcc) - 1)
+        last = np.clip((bounds[:, 1] / frame_hop).astype(int), first + 1, len(mfcc))
+        # Summed in float64: a long recording has hundreds of thousands of frames
+        cumsum = np.vstack([np.zeros((1, mfcc.shape[1])), np.cumsum(mfcc, axis=0, dtype=np.float64)])
+        embeddings = (cumsum[last] - cumsum[first]) / (last - first)[:, None] / scale
+        labels = self._cluster(embeddings)
+
+        # Name speakers in order of first appearance
+        names = {}
+        for label in labels:
+            names.setdefault(label, f'SPEAKER_{len(names):02d}')
+
+        # Overlapping windows hand over half-way through the overlap; turns
+        # never extend past the speech region a window belongs to
+        turns = []
+        for index, (start, end) in enumerate(windows):
+            speaker = names[labels[index]]
+            if index + 1 < len(windows) and windows[index + 1][0] < end:
+                end = (windows[index + 1][0] + end) / 2.0
+            if turns and turns[-1][2] == speaker and turns[-1][1] >= start:
+                turns[-1] = (turns[-1][0], end, speaker)
+            else:
+                if turns and turns[-1][1] > start:
+                    start = turns[-1][1]
+                turns.append((start, end, speaker))
+        return turns
+
+
+def get_diarizer(huggingface_token=None, engine='auto'):
+    """
+    Return the diarization engine for this process
+
+    Args:
+        huggingface_token: Token used to fetch the pyannote weights
+        engine: 'pyannote', 'mfcc' or 'auto' (pyannote when available)
+    """
+    if engine in ('auto', 'pyannote'):
+        pipeline = load_pyannote_pipeline(huggingface_token)
+        if pipeline is not None:
+            return PyannoteDiarizer(pipeline)
+    return MFCCDiarizer()
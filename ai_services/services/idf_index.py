@@ -0,0 +1,338 @@
+"""
+Corpus-level inverse document frequencies for topic extraction.
+
+Document frequencies of every term in the blog corpus are kept in a small
+``.npz`` file: a vocabulary array, an int32 document frequency array and the
+number of documents. Each process loads the file once (and again only after
+another process rewrote it, checked at most once a second) and ranks topics
+with a vectorized lookup against the precomputed float32 IDF weights.
+
+Changes can be collected for a few seconds and written together, so a burst
+of saves rewrites the file once instead of once per post.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from scipy import sparse
+
+from .text_analysis import AnalyzedDocument
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks whether another process replaced the file
+STALENESS_CHECK_INTERVAL = 1.0
+
+_index = None
+_index_path = None
+_index_mtime = None
+_index_checked = None
+_index_lock = threading.Lock()
+
+_pending = {}
+_flush_timer = None
+_exit_hook_registered = False
+_pending_lock = threading.Lock()
+
+
+def document_terms(content):
+    """The distinct terms of a document that count towards document frequencies"""
+    return {term for term in AnalyzedDocument.of(content).terms if len(term) > 1}
+
+
+class IDFIndex:
+    """Document frequencies of a corpus and the IDF weights derived from them"""
+
+    def __init__(self, vocabulary=None, document_frequencies=None, num_documents=0):
+        self.vocabulary = list(vocabulary if vocabulary is not None else [])
+        self.document_frequencies = np.asarray(
+            document_frequencies if document_frequencies is not None else [], dtype=np.int32
+        )
+        self.num_documents = int(num_documents)
+        self._positions = {term: position for position, term in enumerate(self.vocabulary)}
+        # IDF weights followed by the weight of unseen terms, at position -1
+        self._weight_table = None
+
+    @classmethod
+    def build(cls, documents):
+        """
+        Count document frequencies over a corpus
+
+        Args:
+            documents: Iterable of term sets, one per document
+        """
+        index = cls()
+        for terms in documents:
+            index.add_document(terms)
+        return index
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['vocabulary'].tolist(),
+                data['document_frequencies'],
+                int(data['num_documents'])
+            )
+
+    def save(self, path):
+        """Write the index atomically, dropping terms no document contains any more"""
+        keep = self.document_frequencies > 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.npz', delete=False) as output:
+            np.savez(
+                output,
+                vocabulary=np.array(self.vocabulary, dtype=str)[keep],
+                document_frequencies=self.document_frequencies[keep],
+                num_documents=np.int64(self.num_documents)
+            )
+        os.replace(output.name, path)
+
+    @property
+    def idf(self):
+        """Smoothed IDF of every vocabulary term, ``ln((1 + n) / (1 + df)) + 1``"""
+        return self._weights()[:-1]
+
+    def _weights(self):
+        if self._weight_table is None:
+            table = np.empty(len(self.document_frequencies) + 1, dtype=np.float32)
+            table[:-1] = np.log((1.0 + self.num_documents) / (1.0 + self.document_frequencies)) + 1.0
+            table[-1] = self.unseen_idf
+            self._weight_table = table
+        return self._weight_table
+
+    @property
+    def unseen_idf(self):
+        """IDF of a term that no document in the corpus contains"""
+        return np.float32(np.log(1.0 + self.num_documents) + 1.0)
+
+    def add_document(self, terms):
+        self._update(terms, 1)
+
+    def remove_document(self, terms):
+        self._update(terms, -1)
+
+    def _update(self, terms, delta):
+        terms = set(terms)
+        new_terms = sorted(term for term in terms if term not in self._positions) if delta > 0 else []
+        if new_terms:
+            self._positions.update(
+                (term, len(self.vocabulary) + offset) for offset, term in enumerate(new_terms)
+            )
+            self.vocabulary.extend(new_terms)
+            self.document_frequencies = np.concatenate(
+                (self.document_frequencies, np.zeros(len(new_terms), dtype=np.int32))
+            )
+
+        positions = [self._positions[term] for term in terms if term in self._positions]
+        self.document_frequencies[positions] += delta
+        np.maximum(self.document_frequencies, 0, out=self.document_frequencies)
+        self.num_documents = max(0, self.num_documents + delta)
+        self._weight_table = None
+
+    def weights(self, terms):
+        """IDF weights for an array of terms, unseen terms getting the highest weight"""
+        positions = np.fromiter(
+            (self._positions.get(term, -1) for term in terms), dtype=np.int64, count=len(terms)
+        )
+        return self._weights()[positions]
+
+    def rank_terms(self, terms):
+        """
+        Rank the terms of one document by TF-IDF
+
+        Args:
+            terms: The document's terms in order, repeats included
+
+        Returns:
+            list: Distinct terms, highest TF-IDF first (ties alphabetically)
+        """
+        if not terms:
+            return []
+
+        vocabulary, inverse = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+        scores = np.bincount(inverse.ravel()) * self.weights(vocabulary.tolist())
+        return vocabulary[np.argsort(-scores, kind='stable')].tolist()
+
+    def transform(self, documents):
+        """
+        Build the sparse TF-IDF matrix of several documents at once
+
+        Args:
+            documents: List of term lists, one per document
+
+        Returns:
+            tuple: (CSR matrix of shape (documents, terms), sorted term array)
+        """
+        lengths = np.fromiter((len(terms) for terms in documents), dtype=np.int64, count=len(documents))
+        all_terms = np.asarray([term for terms in documents for term in terms], dtype=str)
+        vocabulary, columns = np.unique(all_terms, return_inverse=True)
+        rows = np.repeat(np.arange(len(documents)), lengths)
+
+        # Duplicate (row, column) pairs are summed into term counts
+        counts = sparse.csr_matrix(
+            (np.ones(len(all_terms), dtype=np.float32), (rows, columns.ravel())),
+            shape=(len(documents), len(vocabulary))
+        )
+        counts.sum_duplicates()
+        weights = self.weights(vocabulary.tolist()) if len(vocabulary) else np.zeros(0, dtype=np.float32)
+        return counts @ sparse.diags(weights.astype(np.float32)), vocabulary
+
+    def rank_terms_batch(self, documents):
+        """
+        Rank the terms of many documents with one sparse transform
+
+        Args:
+            documents: List of term lists, one per document
+
+        Returns:
+            list: One ranking per document, as returned by ``rank_terms``
+        """
+        if not documents:
+            return []
+
+        matrix, vocabulary = self.transform(documents)
+        matrix = matrix.tocsr()
+        matrix.sort_indices()
+        rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+        # One sort for the whole batch: by document, then score, then term
+        order = np.lexsort((matrix.indices, -matrix.data, rows))
+        ranked = vocabulary[matrix.indices[order]].tolist()
+        return [ranked[start:end] for start, end in zip(matrix.indptr[:-1], matrix.indptr[1:])]
+
+
+@contextmanager
+def _locked(path):
+    """Serialize read-modify-write cycles on the index file across processes"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def get_idf_index(path):
+    """
+    Return this process's copy of the index stored at ``path``
+
+    The file is loaded once and reloaded only when another process has
+    replaced it, which is checked at most every ``STALENESS_CHECK_INTERVAL``
+    seconds. Without an index file every term weighs the same, which ranks
+    topics by plain term frequency.
+    """
+    global _index, _index_path, _index_mtime, _index_checked
+    now = time.monotonic()
+    with _index_lock:
+        if (_index is not None and _index_path == path and _index_checked is not None
+                and now - _index_checked < STALENESS_CHECK_INTERVAL):
+            return _index
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _index_lock:
+        if _index is None or _index_path != path or mtime != _index_mtime:
+            _index = IDFIndex.load(path) if mtime is not None else IDFIndex()
+            _index_path = path
+            _index_mtime = mtime
+        _index_checked = now
+        return _index
+
+
+def _forget_loaded_index():
+    """Make the next ``get_idf_index`` look at the file again"""
+    global _index_checked
+    with _index_lock:
+        _index_checked = None
+
+
+def _apply_updates(path, updates):
+    """Apply (added, removed) document changes to the stored index in one write"""
+    with _locked(path):
+        index = IDFIndex.load(path) if os.path.exists(path) else IDFIndex()
+        for added, removed in updates:
+            if removed is not None:
+                index.remove_document(removed)
+            if added is not None:
+                index.add_document(added)
+        index.save(path)
+    # This process sees its own changes right away
+    _forget_loaded_index()
+
+
+def update_idf_index(path, added=None, removed=None, delay=0):
+    """
+    Apply one document change to the stored index
+
+    Args:
+        path: Location of the index file
+        added: Terms of the document's new content, if any
+        removed: Terms of the document's previous content, if any
+        delay: Seconds to collect further changes before writing them all
+            at once; 0 writes this change now
+    """
+    global _flush_timer, _exit_hook_registered
+    if not delay:
+        _apply_updates(path, [(added, removed)])
+        return
+
+    with _pending_lock:
+        _pending.setdefault(path, []).append((added, removed))
+        if _flush_timer is None:
+            if not _exit_hook_registered:
+                atexit.register(flush_idf_updates)
+                _exit_hook_registered = True
+            _flush_timer = threading.Timer(delay, flush_idf_updates)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def flush_idf_updates():
+    """Write every collected change now"""
+    global _flush_timer
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+
+    for path, updates in pending.items():
+        try:
+            _apply_updates(path, updates)
+        except Exception as e:
+            # A rebuild catches up later
+            logger.warning("Could not update the IDF index: %s", e)
+
+
+def rebuild_idf_index(path, contents):
+    """
+    Recount the stored index from scratch
+
+    Args:
+        path: Location of the index file
+        contents: Iterable of document texts
+
+    Returns:
+        IDFIndex: The new index
+    """
+    index = IDFIndex.build(document_terms(content) for content in contents)
+    with _locked(path):
+        index.save(path)
+    _forget_loaded_index()
+    return index
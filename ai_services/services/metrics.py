@@ -0,0 +1,388 @@
+"""
+Lightweight metrics in the Prometheus text exposition format.
+
+Stages of the transcription and title pipelines are timed into one
+histogram with ``stage()``, labelled by pipeline, stage and backend.
+Counters record cache lookups and fallbacks, and a second histogram records
+payload sizes. Recording a value costs a ``perf_counter`` call, a bisect and
+an uncontended lock (one or two microseconds), far below 1% of any stage it
+measures.
+
+Every process records into its own registry. When a directory is
+configured, each process also writes its totals there every few seconds and
+``render()`` adds up the files of all processes, so a scrape of any web
+worker reports the web workers and the transcription worker processes
+together. A process removes its file when it exits, and files nobody has
+rewritten for a few intervals (left by a killed process) are ignored and
+removed, so the totals only cover running processes.
+"""
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+# 64 bytes to 256 MiB in steps of 4x
+SIZE_BUCKETS = tuple(float(64 * 4 ** i) for i in range(12))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    """Label set of a sample; empty values are left out, as Prometheus treats them"""
+    pairs = [(name, value) for name, value in zip(names, values) if value != ''] + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """A named family of labelled series"""
+
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        """JSON-serializable copy of every series"""
+        with self._lock:
+            return [[list(key), self._copy(state)] for key, state in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    @staticmethod
+    def _copy(state):
+        return state
+
+    def _merge(self, total, state):
+        if not isinstance(state, (int, float)):
+            return total
+        return (total or 0) + state
+
+    def _samples(self, key, state):
+        yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(state)}'
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key, value):
+        if not self.registry.enabled:
+            return
+        # Bucket counts are stored per bucket and accumulated when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """Context manager observing the wall time of its block"""
+        return Timer(self, self._key(labels))
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._series.get(self._key(labels))
+            return sum(state[0]) if state else 0
+
+    @staticmethod
+    def _copy(state):
+        return [list(state[0]), state[1]]
+
+    def _merge(self, total, state):
+        counts, value_sum = state
+        # Written by a process with other buckets configured
+        if len(counts) != len(self.buckets) + 1:
+            return total
+        if total is None:
+            return [list(counts), value_sum]
+        for index, count in enumerate(counts):
+            total[0][index] += count
+        total[1] += value_sum
+        return total
+
+    def _samples(self, key, state):
+        counts, value_sum = state
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = [('le', _format_number(bound))]
+            yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+        labels = _format_labels(self.labelnames, key)
+        yield f'{self.name}_sum{labels} {_format_number(value_sum)}'
+        yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Timer:
+    """Times a block into a histogram, whether or not it raises"""
+
+    __slots__ = ('histogram', 'key', 'started')
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram._observe(self.key, time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """
+    The metrics of one process
+
+    Args:
+        enabled: Record values; a disabled registry ignores every update
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.directory = None
+        self.flush_interval = 5.0
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        # Unique per process, even when a PID is reused after a restart
+        self._file_token = None
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def configure(self, enabled=True, directory=None, flush_interval=5.0):
+        """
+        Enable or disable recording and set up sharing between processes
+
+        Args:
+            enabled: Record values
+            directory: Directory shared by all processes of the deployment;
+                None keeps the metrics of this process to itself
+            flush_interval: Seconds between two writes of this process' totals
+        """
+        self.enabled = enabled
+        self.directory = directory if enabled else None
+        self.flush_interval = flush_interval
+        if self.directory and self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            self._file_token = f'{os.getpid()}-{time.time_ns()}'
+            threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+            atexit.register(self._remove_own_file)
+
+    def snapshot(self):
+        """Totals of this process, by metric name"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def _own_file(self):
+        return os.path.join(self.directory, f'metrics-{self._file_token}.json')
+
+    def flush(self):
+        """Write the totals of this process to the shared directory, if there is one"""
+        if not self.directory or self._file_token is None:
+            return
+        snapshot = self.snapshot()
+        # Processes that never record anything leave no file behind
+        if not any(snapshot.values()):
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        try:
+            with os.fdopen(descriptor, 'w') as temporary_file:
+                json.dump(snapshot, temporary_file)
+            # Readers only ever see complete files
+            os.replace(temporary_path, self._own_file())
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def _remove_own_file(self):
+        """Take the totals of this process out of the shared directory when it exits"""
+        if not self.directory or self._file_token is None:
+            return
+        own_file = self._own_file()
+        # The periodic writer must not recreate the file
+        self._file_token = None
+        try:
+            os.unlink(own_file)
+        except FileNotFoundError:
+            pass
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", self.directory, e)
+
+    def _snapshots(self):
+        """Snapshots of every process: this one taken live, the others from their files"""
+        snapshots = [self.snapshot()]
+        if not self.directory or not os.path.isdir(self.directory):
+            return snapshots
+
+        own_file = self._own_file() if self._file_token else None
+        # Running processes rewrite their file every interval
+        stale_before = time.time() - 3 * self.flush_interval
+        for entry in os.scandir(self.directory):
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.json')):
+                continue
+            if entry.path == own_file:
+                continue
+            try:
+                if entry.stat().st_mtime < stale_before:
+                    os.unlink(entry.path)
+                    continue
+                with open(entry.path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshots = self._snapshots()
+
+        lines = []
+        for metric in metrics:
+            totals = {}
+            for snapshot in snapshots:
+                for key, state in snapshot.get(metric.name, ()):
+                    key = tuple(key)
+                    if len(key) != len(metric.labelnames):
+                        continue
+                    merged = metric._merge(totals.get(key), state)
+                    if merged is not None:
+                        totals[key] = merged
+
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for key in sorted(totals):
+                lines.extend(metric._samples(key, totals[key]))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'darwix_stage_duration_seconds',
+    'Wall time of each stage of the transcription and title pipelines',
+    ('pipeline', 'stage', 'backend')
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'darwix_cache_requests_total',
+    'Cache lookups by cache and result',
+    ('cache', 'result')
+)
+FALLBACKS = REGISTRY.counter(
+    'darwix_fallbacks_total',
+    'Requests answered by a fallback path, by pipeline and reason',
+    ('pipeline', 'reason')
+)
+PAYLOAD_BYTES = REGISTRY.histogram(
+    'darwix_payload_size_bytes',
+    'Size of uploads, prompts, completions and results',
+    ('kind',),
+    buckets=SIZE_BUCKETS
+)
+
+
+def stage(pipeline, name, backend=''):
+    """
+    Time a block as one stage of a pipeline
+
+    Example: ``with stage('transcription', 'recognize', backend='google'): ...``
+    """
+    return Timer(STAGE_SECONDS, (pipeline, name, backend))
+
+
+def record_payload(kind, payload):
+    """Record the size of a payload given as bytes, text or a byte count"""
+    if not REGISTRY.enabled:
+        return
+    if isinstance(payload, str):
+        size = len(payload.encode('utf-8'))
+    elif isinstance(payload, int):
+        size = payload
+    else:
+        size = len(payload)
+    PAYLOAD_BYTES.observe(size, kind=kind)
@@ -1,87 +1,179 @@
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
 import nltk
-import openai
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
 from collections import Counter
 
+from blog.tokenizer import english_stop_words
+
+from .idf_index import IDFIndex, get_idf_index
+from .metrics import FALLBACKS, record_payload, stage
+from .openai_client import ChatCompletionClient
+from .summarizer import summarize
+from .title_cache import TitleCache, simhash, summary_key
+from .title_templates import TitleTemplateEngine
+from .text_analysis import AnalyzedDocument
+
+logger = logging.getLogger(__name__)
+
+# NLTK data is installed at build time (see the Dockerfile), never downloaded
+# while serving a request
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+}
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def missing_nltk_resources():
+    """Return the names of the required NLTK resources that are not installed"""
+    missing = []
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+
+class TitleListParser:
+    """
+    Incremental parser for the numbered list of titles in a completion
+
+    The completion can be fed in arbitrary pieces; each title is returned as
+    soon as the line holding it is complete.
+    """
+
+    def __init__(self, num_suggestions):
+        self.num_suggestions = num_suggestions
+        self.titles = []
+        self._line = ''
+
+    def feed(self, text):
+        """Add the next piece of the completion and return the titles it completed"""
+        *lines, self._line = (self._line + text).split('\n')
+        return self._take(lines)
+
+    def close(self):
+        """Parse the last line and pad to ``num_suggestions``, returning the new titles"""
+        completed = self._take([self._line])
+        self._line = ''
+
+        # Ensure we have the expected number of titles
+        while len(self.titles) < self.num_suggestions:
+            title = f"Suggested Title #{len(self.titles)+1}"
+            self.titles.append(title)
+            completed.append(title)
+        return completed
+
+    def _take(self, lines):
+        completed = []
+        for line in lines:
+            line = line.strip()
+            if len(self.titles) >= self.num_suggestions:
+                break
+            if line and any(line.startswith(f"{i}.") for i in range(1, self.num_suggestions+1)):
+                # Remove number prefix and whitespace
+                title = line.split('.', 1)[1].strip()
+                self.titles.append(title)
+                completed.append(title)
+        return completed
+
+
 class BlogTitleSuggestionService:
     """Service for generating blog post title suggestions using NLP"""
     
-    def __init__(self, openai_api_key=None):
+    def __init__(self, openai_api_key=None, idf_index_path=None, openai_options=None,
+                 cache_options=None, summary_token_budget=120):
         self.openai_api_key = openai_api_key
-        self._setup_nltk()
-        
-    def _setup_nltk(self):
-        """Download required NLTK data"""
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
-            
-        try:
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            nltk.download('stopwords')
+        self.idf_index_path = idf_index_path
+        self.summary_token_budget = summary_token_budget
+        self.openai_options = openai_options or {}
+        # Generated titles are cached per process, in front of the API
+        self.cache = TitleCache(**(cache_options or {}))
+        self.template_engine = TitleTemplateEngine()
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Pooled OpenAI client shared by every request, so connections are reused"""
+        if not self.openai_api_key:
+            raise ValueError("OpenAI API key is required for this feature")
+
+        with self._client_lock:
+            if self._client is None:
+                self._client = ChatCompletionClient(self.openai_api_key, **self.openai_options)
+        return self._client
+
+    def warm(self):
+        """Load the tokenizer models, stop words and API client ahead of the first request"""
+        missing = missing_nltk_resources()
+        if missing:
+            logger.warning(
+                "NLTK data missing (%s); install it with: python -m nltk.downloader %s",
+                ', '.join(missing), ' '.join(missing)
+            )
+        else:
+            with stage('title', 'nltk_setup'):
+                english_stop_words()
+                AnalyzedDocument("Warm up the tokenizers.")
+
+        self.idf_index
+
+        if self.openai_api_key:
+            self.client
+
+    @property
+    def idf_index(self):
+        """Corpus IDF weights; without an index every term weighs the same"""
+        if not self.idf_index_path:
+            return IDFIndex()
+        return get_idf_index(self.idf_index_path)
     
+    def _analyze(self, content):
+        """Tokenize a post once for every step of the pipeline, recording its size and the time taken"""
+        with stage('title', 'tokenize'):
+            document = AnalyzedDocument(content)
+        record_payload('blog_content', content)
+        return document
+
     def _extract_key_topics(self, content, num_topics=5):
-        """Extract key topics from blog post content using TF-IDF"""
-        # Tokenize and preprocess
-        stop_words = set(stopwords.words('english'))
-        tokens = word_tokenize(content.lower())
-        filtered_tokens = [w for w in tokens if w.isalnum() and w not in stop_words]
-        
-        # Create TF-IDF vectorizer
-        vectorizer = TfidfVectorizer(max_features=100)
-        tfidf_matrix = vectorizer.fit_transform([' '.join(filtered_tokens)])
-        
-        # Get feature names and scores
-        feature_names = vectorizer.get_feature_names_out()
-        scores = tfidf_matrix.toarray()[0]
-        
-        # Get top scoring words
-        word_scores = list(zip(feature_names, scores))
-        word_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        return [word for word, score in word_scores[:num_topics]]
+        """Extract key topics from blog post content (text or AnalyzedDocument) using TF-IDF"""
+        document = AnalyzedDocument.of(content)
+
+        # The ranking is computed once per document against the corpus IDF
+        # weights; callers asking for a different number of topics get a
+        # prefix of it. Only words of two or more characters count as topics
+        if document.topic_ranking is None:
+            with stage('title', 'topics'):
+                document.topic_ranking = self.idf_index.rank_terms(
+                    [w for w in document.terms if len(w) > 1]
+                )
+
+        return document.topic_ranking[:num_topics]
     
     def _extract_key_sentences(self, content, num_sentences=2):
-        """Extract key sentences from the content"""
-        sentences = sent_tokenize(content)
-        
-        # If there are very few sentences, return the first one
-        if len(sentences) <= num_sentences:
-            return sentences
-            
-        # For longer content, extract the most representative sentences
-        # (first sentence + sentences with key topics)
-        key_topics = set(self._extract_key_topics(content))
-        
-        # Score sentences based on presence of key topics
-        sentence_scores = []
-        for sentence in sentences:
-            sentence_tokens = set(word_tokenize(sentence.lower()))
-            score = sum(1 for word in sentence_tokens if word in key_topics)
-            sentence_scores.append((sentence, score))
-        
-        # Sort by score and get top sentences
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        top_sentences = [s[0] for s in sentence_scores[:num_sentences-1]]
-        
-        # Always include the first sentence as it often sets the topic
-        if sentences[0] not in top_sentences:
-            top_sentences = [sentences[0]] + top_sentences[:num_sentences-1]
-            
-        return top_sentences
+        """
+        Extract key sentences from the content (text or AnalyzedDocument)
+
+        The most central sentences are picked within ``summary_token_budget``
+        words, so the OpenAI prompt stays bounded for long posts
+        """
+        document = AnalyzedDocument.of(content)
+        with stage('title', 'summary'):
+            return summarize(
+                document, self.idf_index, max_sentences=num_sentences, token_budget=self.summary_token_budget
+            )
     
-    def _generate_title_with_openai(self, content, num_suggestions=3):
-        """Generate title suggestions using OpenAI's API"""
-        if not self.openai_api_key:
-            raise ValueError("OpenAI API key is required for this feature")
-        
-        # Initialize OpenAI client
-        client = openai.OpenAI(api_key=self.openai_api_key)
-        
+    def _title_messages(self, content, num_suggestions):
+        """Chat messages asking for titles of a post (text or AnalyzedDocument)"""
         # Extract key sentences for summarization
         key_sentences = self._extract_key_sentences(content)
         summary = " ".join(key_sentences)
@@ -100,81 +192,55 @@ Guidelines:
 
 Generate {num_suggestions} titles:"""
 
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional blog title generator."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=150
+        return [
+            {"role": "system", "content": "You are a professional blog title generator."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _parse_titles(self, titles_text, num_suggestions):
+        """Extract individual titles from the numbered list in a completion"""
+        parser = TitleListParser(num_suggestions)
+        parser.feed(titles_text)
+        parser.close()
+        return parser.titles
+
+    def _generate_title_with_openai(self, content, num_suggestions=3):
+        """Generate title suggestions using OpenAI's API from text or an AnalyzedDocument"""
+        messages = self._title_messages(content, num_suggestions)
+        record_payload('openai_prompt', messages[-1]['content'])
+        with stage('title', 'generate', backend='openai'):
+            titles_text = self.client.complete(
+                messages,
+                temperature=0.7,
+                max_tokens=150
+            )
+        record_payload('openai_completion', titles_text)
+        return self._parse_titles(titles_text, num_suggestions)
+
+    async def _agenerate_title_with_openai(self, content, num_suggestions=3, executor=None):
+        """Asynchronous version of ``_generate_title_with_openai``; the prompt is built on ``executor``"""
+        messages = await asyncio.get_running_loop().run_in_executor(
+            executor, self._title_messages, content, num_suggestions
         )
-        
-        # Parse the response to extract titles
-        titles_text = response.choices[0].message.content.strip()
-        
-        # Extract individual titles from the numbered list
-        titles = []
-        for line in titles_text.split('\n'):
-            if line.strip() and any(line.strip().startswith(f"{i}.") for i in range(1, num_suggestions+1)):
-                # Remove number prefix and whitespace
-                title = line.strip().split('.', 1)[1].strip()
-                titles.append(title)
-        
-        # Ensure we have the expected number of titles
-        while len(titles) < num_suggestions:
-            titles.append(f"Suggested Title #{len(titles)+1}")
-            
-        return titles
+        record_payload('openai_prompt', messages[-1]['content'])
+        with stage('title', 'generate', backend='openai'):
+            titles_text = await self.client.acomplete(
+                messages,
+                temperature=0.7,
+                max_tokens=150
+            )
+        record_payload('openai_completion', titles_text)
+        return self._parse_titles(titles_text, num_suggestions)
     
     def _generate_title_without_api(self, content, num_suggestions=3):
         """Generate title suggestions without external API (fallback method)"""
-        # Extract key topics and sentences
-        key_topics = self._extract_key_topics(content, num_topics=7)
-        key_sentences = self._extract_key_sentences(content, num_sentences=2)
-        
-        # Templates for title generation
-        templates = [
-            "How to {topic1} and {topic2} in {current_year}",
-            "The Ultimate Guide to {topic1}: {topic2} and Beyond",
-            "{num} Ways to Improve Your {topic1} with {topic2}",
-            "{topic1} 101: Everything You Need to Know About {topic2}",
-            "Why {topic1} Matters: The Importance of {topic2}",
-            "Understanding {topic1}: A Comprehensive Guide to {topic2}",
-            "The Future of {topic1}: Trends in {topic2} for {current_year}",
-        ]
-        
-        import random
-        from datetime import datetime
-        
-        suggestions = []
-        used_templates = set()
-        
-        for _ in range(num_suggestions):
-            # Select random topics
-            topic1 = random.choice(key_topics)
-            topic2 = random.choice([t for t in key_topics if t != topic1])
-            
-            # Select template avoiding duplicates if possible
-            available_templates = [t for t in templates if t not in used_templates]
-            if not available_templates:
-                available_templates = templates
-                
-            template = random.choice(available_templates)
-            used_templates.add(template)
-            
-            # Fill template
-            title = template.format(
-                topic1=topic1.capitalize(),
-                topic2=topic2.capitalize(),
-                num=random.choice([3, 5, 7, 10]),
-                current_year=datetime.now().year
-            )
-            
-            suggestions.append(title)
-            
-        return suggestions
+        document = AnalyzedDocument.of(content)
+        key_topics = self._extract_key_topics(document, num_topics=7)
+        with stage('title', 'generate', backend='local'):
+            titles = self.template_engine.generate(key_topics, num_suggestions)
+
+        # Too few topics for distinct titles: pad with numbered placeholders
+        return titles + self._placeholder_titles(num_suggestions)[len(titles):]
     
     def generate_title_suggestions(self, content, num_suggestions=3):
         """
@@ -187,17 +253,274 @@ Generate {num_suggestions} titles:"""
         Returns:
             list: List of suggested titles
         """
+        with stage('title', 'total'):
+            try:
+                # Sentence-split and tokenize once for every extraction step
+                document = self._analyze(content)
+            except Exception:
+                FALLBACKS.inc(pipeline='title', reason='tokenize_error')
+                return self._placeholder_titles(num_suggestions)
+            return self._suggest_for_document(document, num_suggestions)
+
+    def stream_title_suggestions(self, content, num_suggestions=3):
+        """
+        Generate title suggestions for a blog post one at a time
+
+        With an API key the completion is streamed and every title is yielded
+        as soon as the model has finished its line. Cached and locally
+        generated titles are yielded all at once.
+
+        Args:
+            content: Blog post content
+            num_suggestions: Number of title suggestions to generate
+
+        Yields:
+            str: Suggested titles, ``num_suggestions`` in total
+        """
+        try:
+            document = self._analyze(content)
+        except Exception:
+            FALLBACKS.inc(pipeline='title', reason='tokenize_error')
+            yield from self._placeholder_titles(num_suggestions)
+            return
+
+        titles = []
+        if self.openai_api_key:
+            try:
+                key, signature = self._cache_keys(document, num_suggestions)
+                cached = self.cache.get(key, signature, num_suggestions)
+                if cached is not None:
+                    yield from cached
+                    return
+
+                parser = TitleListParser(num_suggestions)
+                messages = self._title_messages(document, num_suggestions)
+                record_payload('openai_prompt', messages[-1]['content'])
+                pieces = self.client.stream(
+                    messages,
+                    temperature=0.7,
+                    max_tokens=150
+                )
+                # Includes the time the client takes to read the titles sent
+                with stage('title', 'generate', backend='openai_stream'), closing(pieces):
+                    for piece in pieces:
+                        for title in parser.feed(piece):
+                            titles.append(title)
+                            yield title
+                for title in parser.close():
+                    titles.append(title)
+                    yield title
+
+                self.cache.set(key, signature, num_suggestions, titles)
+                return
+            except Exception as e:
+                FALLBACKS.inc(pipeline='title', reason='openai_error')
+                logger.warning("Streaming OpenAI title generation failed, using fallback: %s", e)
+
+        # Complete the list locally after any titles already sent
+        yield from self._suggest_without_api(document, num_suggestions)[len(titles):]
+
+    def _cache_keys(self, document, num_suggestions):
+        """Exact key (from the summary sent to the model) and SimHash signature"""
+        summary = " ".join(self._extract_key_sentences(document))
+        return summary_key(summary, num_suggestions), simhash(document.terms)
+
+    def _suggest_for_document(self, document, num_suggestions):
+        """Generate titles for an analyzed document, never raising"""
+        return self._suggest_with_source(document, num_suggestions)[0]
+
+    def _suggest_with_source(self, document, num_suggestions):
+        """
+        Generate titles for an analyzed document, never raising
+
+        Returns:
+            tuple: (titles, source) where source is 'openai', 'cache', 'local'
+            or 'placeholder'
+        """
+        # Try using OpenAI API first, unless the same or a near-identical
+        # draft was answered recently
+        if self.openai_api_key:
+            try:
+                key, signature = self._cache_keys(document, num_suggestions)
+                cached = self.cache.get(key, signature, num_suggestions)
+                if cached is not None:
+                    return cached, 'cache'
+
+                titles = self._generate_title_with_openai(document, num_suggestions)
+                self.cache.set(key, signature, num_suggestions, titles)
+                return titles, 'openai'
+            except Exception as e:
+                # Over the latency budget or failed: answer from the content
+                FALLBACKS.inc(pipeline='title', reason='openai_error')
+                logger.warning("OpenAI title generation failed, using fallback: %s", e)
+
+        try:
+            return self._generate_title_without_api(document, num_suggestions), 'local'
+        except Exception:
+            # Emergency fallback if everything fails
+            FALLBACKS.inc(pipeline='title', reason='local_error')
+            return self._placeholder_titles(num_suggestions), 'placeholder'
+
+    def _suggest_without_api(self, document, num_suggestions):
         try:
-            # Try using OpenAI API first
-            if self.openai_api_key:
-                return self._generate_title_with_openai(content, num_suggestions)
-            else:
-                # Fall back to simpler method if no API key
-                return self._generate_title_without_api(content, num_suggestions)
-                
+            return self._generate_title_without_api(document, num_suggestions)
         except Exception as e:
             # Emergency fallback if everything fails
-            return [
-                f"Blog Post Title Suggestion #{i+1}" 
-                for i in range(num_suggestions)
-            ]
\ No newline at end of file
+            FALLBACKS.inc(pipeline='title', reason='local_error')
+            return self._placeholder_titles(num_suggestions)
+
+    def analyze_and_suggest(self, content, num_suggestions=3):
+        """
+        Compute everything the title pipeline derives from a post, for storage
+
+        Args:
+            content: Blog post content
+            num_suggestions: Number of title suggestions to generate
+
+        Returns:
+            dict: topics, key_sentences, titles and the titles' source
+        """
+        document = self._analyze(content)
+        titles, source = self._suggest_with_source(document, num_suggestions)
+        return {
+            'topics': self._extract_key_topics(document, num_topics=7),
+            'key_sentences': self._extract_key_sentences(document),
+            'titles': titles,
+            'source': source,
+        }
+
+    async def agenerate_title_suggestions(self, content, num_suggestions=3, executor=None):
+        """
+        Asynchronous version of ``generate_title_suggestions`` for ASGI views
+
+        The OpenAI round trip is awaited instead of holding a thread.
+        Tokenization, summarizing and local generation run on ``executor``
+        (the event loop's default executor if None).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            document = await loop.run_in_executor(executor, self._analyze, content)
+        except Exception:
+            FALLBACKS.inc(pipeline='title', reason='tokenize_error')
+            return self._placeholder_titles(num_suggestions)
+
+        if self.openai_api_key:
+            try:
+                key, signature = await loop.run_in_executor(
+                    executor, self._cache_keys, document, num_suggestions
+                )
+                cached = self.cache.get(key, signature, num_suggestions)
+                if cached is not None:
+                    return cached
+
+                titles = await self._agenerate_title_with_openai(document, num_suggestions, executor)
+                self.cache.set(key, signature, num_suggestions, titles)
+                return titles
+            except Exception as e:
+                FALLBACKS.inc(pipeline='title', reason='openai_error')
+                logger.warning("OpenAI title generation failed, using fallback: %s", e)
+
+        return await loop.run_in_executor(executor, self._suggest_without_api, document, num_suggestions)
+
+    def _placeholder_titles(self, num_suggestions):
+        return [
+            f"Blog Post Title Suggestion #{i+1}" 
+            for i in range(num_suggestions)
+        ]
+
+    def generate_title_suggestions_batch(self, contents, num_suggestions=3, batch_size=256,
+                                         max_concurrency=8):
+        """
+        Generate title suggestions for many blog posts
+
+        Posts are processed in slices of ``batch_size``: the posts of a slice
+        are tokenized one by one (NLTK has no batch tokenizer) and their
+        topics are ranked together with a single sparse TF-IDF transform. OpenAI requests are sent from at most
+        ``max_concurrency`` threads. Results are produced lazily, so callers
+        can stream them while later posts are still being processed.
+
+        Args:
+            contents: Iterable of blog post contents
+            num_suggestions: Number of title suggestions per post
+            batch_size: Number of posts analyzed together
+            max_concurrency: Maximum number of concurrent OpenAI requests
+
+        Returns:
+            generator: One list of titles per post, in input order
+        """
+        contents = iter(contents)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        try:
+            while True:
+                batch = [content for _, content in zip(range(batch_size), contents)]
+                if not batch:
+                    return
+
+                documents = []
+                for content in batch:
+                    try:
+                        documents.append(self._analyze(content))
+                    except Exception:
+                        FALLBACKS.inc(pipeline='title', reason='tokenize_error')
+                        documents.append(None)
+
+                analyzed = [document for document in documents if document is not None]
+                try:
+                    with stage('title', 'topics_batch'):
+                        rankings = self.idf_index.rank_terms_batch(
+                            [[w for w in document.terms if len(w) > 1] for document in analyzed]
+                        )
+                    for document, ranking in zip(analyzed, rankings):
+                        document.topic_ranking = ranking
+                except Exception as e:
+                    # Documents rank themselves one by one instead
+                    logger.warning("Batch topic ranking failed: %s", e)
+
+                if self.openai_api_key:
+                    results = [
+                        executor.submit(self._suggest_for_document, document, num_suggestions)
+                        if document is not None else None
+                        for document in documents
+                    ]
+                    for result in results:
+                        yield result.result() if result is not None else self._placeholder_titles(num_suggestions)
+                else:
+                    for document in documents:
+                        if document is None:
+                            yield self._placeholder_titles(num_suggestions)
+                        else:
+                            yield self._suggest_for_document(document, num_suggestions)
+        finally:
+            # A client that stops reading must not keep OpenAI requests queued
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_title_suggestion_service(openai_api_key=None, idf_index_path=None, openai_options=None,
+                                 cache_options=None, summary_token_budget=120):
+    """
+    Return the process-wide title suggestion service
+
+    Args:
+        openai_api_key: API key used when the service is first created
+        idf_index_path: Location of the corpus IDF index file
+        openai_options: ChatCompletionClient options (base URL, budget, rate limit)
+        cache_options: TitleCache options (size, TTL, near-duplicate distance)
+        summary_token_budget: Maximum words of the summary sent to OpenAI
+    """
+    key = (
+        openai_api_key,
+        idf_index_path,
+        json.dumps(openai_options or {}, sort_keys=True),
+        json.dumps(cache_options or {}, sort_keys=True),
+        summary_token_budget,
+    )
+    with _services_lock:
+        if key not in _services:
+            _services[key] = BlogTitleSuggestionService(
+                openai_api_key=openai_api_key,
+                idf_index_path=idf_index_path,
+                openai_options=openai_options,
+                cache_options=cache_options,
+                summary_token_budget=summary_token_budget
+            )
+        return _services[key]
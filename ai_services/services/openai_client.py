@@ -0,0 +1,259 @@
+"""
+Shared OpenAI chat-completion client for title generation.
+
+One client per process keeps its HTTP connections open between requests.
+Every completion runs against a hard latency budget: retries with backoff
+only happen while budget remains, and a client-side token bucket keeps the
+process under the account's request rate instead of collecting 429s.
+
+The SDK timeout only bounds each network operation, so a response that
+trickles in could outlast it many times over. Completions are therefore
+awaited with the remaining budget as a deadline, and streams check the
+deadline between chunks.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import closing
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt; anything else (bad request, auth) is final
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LatencyBudgetExceeded(Exception):
+    """Raised when a completion cannot finish within its latency budget"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the request rate of one process
+
+    Up to ``capacity`` requests can be made in a burst; after that tokens
+    are refilled at ``rate`` per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, timeout):
+        """
+        Take a token now or reserve the next one
+
+        Returns:
+            float: Seconds to wait for the reserved token, or None when it
+            would not arrive within ``timeout`` (nothing is reserved then)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > timeout:
+                return None
+            self._tokens -= 1.0
+            return wait
+
+    def acquire(self, timeout):
+        """Block until a token is available; False if that takes over ``timeout`` seconds"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, timeout):
+        """Asynchronous version of ``acquire``"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+class ChatCompletionClient:
+    """
+    Pooled sync and async chat-completion client with a latency budget
+
+    Args:
+        api_key: OpenAI API key
+        base_url: Alternative API endpoint, e.g. a local fake server
+        model: Chat model to use
+        latency_budget: Seconds a completion may take in total, retries included
+        max_retries: Retries after the first attempt, while budget remains
+        requests_per_second: Client-side rate limit (0 disables it)
+        burst: Number of requests allowed in a burst above the rate
+    """
+
+    def __init__(self, api_key, base_url=None, model='gpt-3.5-turbo', latency_budget=4.0,
+                 max_retries=2, requests_per_second=0, burst=10):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.latency_budget = latency_budget
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+
+        # Retries are handled here, within the budget, not by the SDK
+        self._sync_client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        # Synchronous calls run here so the caller can stop waiting at the
+        # deadline; an abandoned call ends with its SDK timeout
+        self._calls = ThreadPoolExecutor(thread_name_prefix='openai-call')
+        # Async HTTP connections belong to the event loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+                self._async_clients[loop] = client
+            return client
+
+    def _backoff(self, attempt, remaining):
+        """Exponential backoff with jitter, never sleeping past the budget"""
+        return min(remaining, 0.1 * (2 ** attempt) * (0.5 + random.random()))
+
+    def complete(self, messages, **params):
+        """
+        Run a chat completion within the latency budget
+
+        Args:
+            messages: Chat messages
+            params: Extra completion parameters such as temperature
+
+        Returns:
+            str: The content of the first choice
+
+        Raises:
+            LatencyBudgetExceeded: When no attempt succeeded within the budget
+        """
+        deadline = time.monotonic() + self.latency_budget
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if self.rate_limiter and not self.rate_limiter.acquire(remaining):
+                raise LatencyBudgetExceeded("rate limit leaves no room within the latency budget")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                call = self._calls.submit(
+                    self._sync_client.chat.completions.create,
+                    model=self.model, messages=messages, timeout=remaining, **params
+                )
+                response = call.result(timeout=remaining)
+                return response.choices[0].message.content
+            except FutureTimeoutError:
+                logger.info("OpenAI attempt %d still running at the deadline", attempt + 1)
+                break
+            except RETRYABLE_ERRORS as e:
+                logger.info("OpenAI attempt %d failed: %s", attempt + 1, e)
+                remaining = deadline - time.monotonic()
+                if attempt < self.max_retries and remaining > 0:
+                    time.sleep(self._backoff(attempt, remaining))
+
+        raise LatencyBudgetExceeded(f"no completion within {self.latency_budget}s")
+
+    def stream(self, messages, **params):
+        """
+        Run a streaming chat completion, yielding its content as it is generated
+
+        The whole response, retries included, has to arrive within the
+        latency budget. Once the response has started it can't be retried;
+        the deadline is checked between chunks, and a single chunk may take
+        at most the budget left when the response started.
+
+        Args:
+            messages: Chat messages
+            params: Extra completion parameters such as temperature
+
+        Yields:
+            str: Consecutive pieces of the first choice's content
+
+        Raises:
+            LatencyBudgetExceeded: When the response didn't start or finish
+                within the budget
+        """
+        deadline = time.monotonic() + self.latency_budget
+        response = None
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if self.rate_limiter and not self.rate_limiter.acquire(remaining):
+                raise LatencyBudgetExceeded("rate limit leaves no room within the latency budget")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                response = self._sync_client.chat.completions.create(
+                    model=self.model, messages=messages, timeout=remaining, stream=True, **params
+                )
+                break
+            except RETRYABLE_ERRORS as e:
+                logger.info("OpenAI attempt %d failed: %s", attempt + 1, e)
+                remaining = deadline - time.monotonic()
+                if attempt < self.max_retries and remaining > 0:
+                    time.sleep(self._backoff(attempt, remaining))
+
+        if response is None:
+            raise LatencyBudgetExceeded(f"no response within {self.latency_budget}s")
+
+        # Closing the response releases the connection if the caller stops early
+        with closing(response):
+            for chunk in response:
+                if time.monotonic() > deadline:
+                    raise LatencyBudgetExceeded(f"response not finished within {self.latency_budget}s")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def acomplete(self, messages, **params):
+        """Asynchronous version of ``complete``"""
+        deadline = time.monotonic() + self.latency_budget
+        client = self._async_client()
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if self.rate_limiter and not await self.rate_limiter.acquire_async(remaining):
+                raise LatencyBudgetExceeded("rate limit leaves no room within the latency budget")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # The SDK timeout covers the connection; wait_for enforces the
+                # budget on the whole call
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=self.model, messages=messages, timeout=remaining, **params
+                    ),
+                    timeout=remaining
+                )
+                return response.choices[0].message.content
+            except (asyncio.TimeoutError,) + RETRYABLE_ERRORS as e:
+                logger.info("OpenAI attempt %d failed: %s", attempt + 1, e)
+                remaining = deadline - time.monotonic()
+                if attempt < self.max_retries and remaining > 0:
+                    await asyncio.sleep(self._backoff(attempt, remaining))
+
+        raise LatencyBudgetExceeded(f"no completion within {self.latency_budget}s")
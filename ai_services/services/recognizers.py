@@ -0,0 +1,244 @@
+"""
+Speech recognition backends.
+
+Every backend turns an ``sr.AudioData`` payload into text. Backends are
+created once per process through ``get_recognizer`` and shared by all
+requests and threads, so local models stay loaded between jobs.
+"""
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionError(Exception):
+    """Raised when a backend cannot be loaded or fails to recognize audio"""
+
+
+class ModelPool:
+    """
+    A small pool of model instances shared by the threads of one process
+
+    Instances are created lazily up to ``size``; further callers wait until
+    an instance is returned to the pool.
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._created
+
+    @contextmanager
+    def acquire(self):
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    instance = self.factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                instance = self._idle.get()
+
+        try:
+            yield instance
+        finally:
+            self._idle.put(instance)
+
+
+class RecognizerBackend:
+    """Interface shared by all recognition backends"""
+
+    name = None
+
+    def warm(self):
+        """Load whatever the backend needs before the first request"""
+
+    def recognize(self, audio_data, language):
+        """
+        Transcribe one payload
+
+        Args:
+            audio_data: sr.AudioData to transcribe
+            language: BCP-47 language code such as 'en-US'
+
+        Returns:
+            str: The transcript, or '' when nothing intelligible was heard
+        """
+        raise NotImplementedError
+
+    def identify_language(self, audio_data, candidates):
+        """
+        Identify the spoken language of a short speech sample
+
+        Args:
+            audio_data: sr.AudioData holding a few seconds of speech
+            candidates: Language codes the deployment expects, most likely first
+
+        Returns:
+            str: The identified language code, or None if it can't be told
+        """
+        return candidates[0] if len(candidates) == 1 else None
+
+
+class GoogleRecognizer(RecognizerBackend):
+    """Google Web Speech API (network round trip per request)"""
+
+    name = 'google'
+
+    def recognize(self, audio_data, language):
+        try:
+            return sr.Recognizer().recognize_google(audio_data, language=language)
+        except sr.UnknownValueError:
+            return ''
+
+    def identify_language(self, audio_data, candidates):
+        # The Web Speech API has no language identification; with several
+        # candidates, keep the one it recognizes with the highest confidence
+        if len(candidates) <= 1:
+            return super().identify_language(audio_data, candidates)
+
+        best_language, best_confidence = None, 0.0
+        for language in candidates:
+            try:
+                response = sr.Recognizer().recognize_google(
+                    audio_data, language=language, show_all=True
+                )
+            except sr.UnknownValueError:
+                continue
+            alternatives = response.get('alternative', []) if isinstance(response, dict) else []
+            confidence = max((alt.get('confidence', 0.0) for alt in alternatives), default=0.0)
+            if confidence > best_confidence:
+                best_language, best_confidence = language, confidence
+        return best_language
+
+
+class WhisperRecognizer(RecognizerBackend):
+    """
+    Local CPU transcription with a Whisper model from ``transformers``
+
+    Every process using the backend loads its own instances, so memory grows
+    with processes x ``pool_size``. Parallelism normally comes from running
+    several processes with one instance each.
+
+    Args:
+        model_name: Hugging Face model id
+        pool_size: Model instances kept by this process
+        num_threads: Torch threads per instance (default: the cores divided
+            between the instances)
+    """
+
+    name = 'whisper'
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_name='openai/whisper-base', pool_size=1, num_threads=None):
+        self.model_name = model_name
+        self.pool = ModelPool(self._load_model, pool_size or 1)
+        self._threads_per_model = num_threads or max(1, (os.cpu_count() or 1) // self.pool.size)
+
+    def _load_model(self):
+        try:
+            import torch
+            from transformers import pipeline
+        except ImportError as e:
+            raise RecognitionError(f"Whisper backend requires torch and transformers: {e}")
+
+        # Split the cores between the pooled instances instead of letting
+        # every instance spin up one thread per core
+        torch.set_num_threads(self._threads_per_model)
+        logger.info("Loading %s for local speech recognition", self.model_name)
+        return pipeline('automatic-speech-recognition', model=self.model_name, device='cpu')
+
+    def warm(self):
+        with self.pool.acquire():
+            pass
+
+    def recognize(self, audio_data, language):
+        raw = audio_data.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+        if len(samples) == 0:
+            return ''
+
+        generate_kwargs = {'task': 'transcribe'}
+        if language:
+            generate_kwargs['language'] = language.split('-')[0].lower()
+
+        with self.pool.acquire() as model:
+            output = model(
+                {'raw': samples, 'sampling_rate': self.SAMPLE_RATE},
+                generate_kwargs=generate_kwargs,
+                # Long-form audio is transcribed in 30s windows
+                chunk_length_s=30,
+            )
+        return output['text'].strip()
+
+    def identify_language(self, audio_data, candidates):
+        from transformers.models.whisper.tokenization_whisper import TO_LANGUAGE_CODE
+
+        raw = audio_data.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+        if len(samples) == 0:
+            return None
+
+        with self.pool.acquire() as model:
+            output = model(
+                {'raw': samples, 'sampling_rate': self.SAMPLE_RATE},
+                return_timestamps=True,
+                return_language=True,
+            )
+
+        chunks = output.get('chunks') or [{}]
+        code = TO_LANGUAGE_CODE.get(chunks[0].get('language'))
+        if code is None:
+            return None
+
+        # Prefer the deployment's regional variant, e.g. 'en' -> 'en-US'
+        for candidate in candidates:
+            if candidate.split('-')[0].lower() == code:
+                return candidate
+        return code
+
+
+RECOGNIZER_BACKENDS = {
+    GoogleRecognizer.name: GoogleRecognizer,
+    WhisperRecognizer.name: WhisperRecognizer,
+}
+
+_recognizers = {}
+_recognizers_lock = threading.Lock()
+
+
+def get_recognizer(name='google', **options):
+    """
+    Return the process-wide instance of a recognition backend
+
+    Args:
+        name: Key of the backend in ``RECOGNIZER_BACKENDS``
+        options: Constructor arguments, used when the backend is first created
+    """
+    if name not in RECOGNIZER_BACKENDS:
+        raise RecognitionError(f"Unknown recognizer backend: {name}")
+
+    with _recognizers_lock:
+        if name not in _recognizers:
+            _recognizers[name] = RECOGNIZER_BACKENDS[name](**options)
+        return _recognizers[name]
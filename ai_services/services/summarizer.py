@@ -0,0 +1,121 @@
+"""
+Extractive summaries of blog posts, used as the title prompt.
+
+A post is turned into one sparse sentence-by-term TF-IDF matrix. Sentences
+are scored by TextRank-style centrality: the stationary distribution of a
+random walk over the cosine-similarity graph of the sentences, computed with
+a few sparse power iterations. The walk restarts preferably at early
+sentences, which usually state the topic. The best sentences that fit in a
+token budget are returned in document order, so the prompt stays bounded
+however long the post is.
+"""
+import numpy as np
+from scipy import sparse
+
+
+def sentence_term_matrix(document, idf_index):
+    """
+    TF-IDF matrix of an analyzed document with one L2-normalized row per sentence
+
+    Returns:
+        scipy.sparse.csr_matrix: Shape (sentences, distinct terms)
+    """
+    rows, terms = [], []
+    for row, sentence_terms in enumerate(document.sentence_terms):
+        for term in sentence_terms:
+            if len(term) > 1:
+                rows.append(row)
+                terms.append(term)
+
+    num_sentences = len(document.sentence_tokens)
+    if not terms:
+        return sparse.csr_matrix((num_sentences, 0), dtype=np.float32)
+
+    vocabulary, columns = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+    counts = sparse.csr_matrix(
+        (np.ones(len(terms), dtype=np.float32), (np.asarray(rows), columns.ravel())),
+        shape=(num_sentences, len(vocabulary))
+    )
+    counts.sum_duplicates()
+    matrix = counts @ sparse.diags(idf_index.weights(vocabulary.tolist()).astype(np.float32))
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return (sparse.diags(inverse_norms) @ matrix).tocsr()
+
+
+def sentence_centrality(document, idf_index, damping=0.85, iterations=50, tolerance=1e-6):
+    """
+    Score every sentence by its centrality in the sentence similarity graph
+
+    Returns:
+        numpy.ndarray: One score per sentence, summing to 1
+    """
+    num_sentences = len(document.sentences)
+    teleport = 1.0 / np.sqrt(np.arange(1, num_sentences + 1))
+    teleport /= teleport.sum()
+
+    matrix = sentence_term_matrix(document, idf_index)
+    if num_sentences < 2 or matrix.nnz == 0:
+        return teleport
+
+    similarity = (matrix @ matrix.T).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    out_weights = np.asarray(similarity.sum(axis=1)).ravel()
+    dangling = out_weights == 0
+    transition = (
+        sparse.diags(np.divide(1.0, out_weights, out=np.zeros_like(out_weights), where=~dangling))
+        @ similarity
+    ).T.tocsr()
+
+    scores = teleport.copy()
+    for _ in range(iterations):
+        # Sentences without neighbours hand their weight to the teleport vector
+        updated = (
+            damping * (transition @ scores + scores[dangling].sum() * teleport)
+            + (1.0 - damping) * teleport
+        )
+        converged = np.abs(updated - scores).sum() < tolerance
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def summarize(document, idf_index, max_sentences=3, token_budget=120):
+    """
+    Pick the most central sentences of a document that fit in a token budget
+
+    Args:
+        document: AnalyzedDocument to summarize
+        idf_index: IDFIndex weighting the terms
+        max_sentences: Maximum number of sentences
+        token_budget: Maximum number of words in the summary, counted like
+            ``str.split`` counts them
+
+    Returns:
+        list: Selected sentences in document order
+    """
+    sentences = document.sentences
+    if not sentences:
+        return []
+
+    scores = sentence_centrality(document, idf_index)
+    # Counted the same way as the cut below, so a cut sentence fits exactly
+    lengths = np.array([len(sentence.split()) for sentence in sentences], dtype=np.int64)
+
+    chosen, used = [], 0
+    for index in np.argsort(-scores, kind='stable').tolist():
+        if lengths[index] <= token_budget - used:
+            chosen.append(index)
+            used += lengths[index]
+            if len(chosen) == max_sentences:
+                break
+
+    if not chosen:
+        # Not even one sentence fits: cut the best one down to the budget
+        best = sentences[int(np.argmax(scores))]
+        return [' '.join(best.split()[:token_budget])]
+    return [sentences[index] for index in sorted(chosen)]
@@ -0,0 +1,37 @@
+"""
+Shared text analysis for the NLP services.
+
+A document is sentence-split and tokenized exactly once; every extraction
+step then works on the resulting ``AnalyzedDocument``. Tokenization itself
+comes from ``blog.tokenizer``, which blog search uses too, so title topics
+and search terms agree.
+"""
+from blog.tokenizer import filter_terms, split_sentences, tokenize_sentence
+
+
+class AnalyzedDocument:
+    """
+    Sentences and tokens of one document
+
+    Attributes:
+        content: The original text
+        sentences: Sentences in document order
+        sentence_tokens: Lowercased word tokens of every sentence
+        sentence_terms: Alphanumeric, non-stop-word tokens of every sentence
+        terms: The sentence terms of the whole document, in order
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.sentences = split_sentences(content)
+        self.sentence_tokens = [tokenize_sentence(sentence) for sentence in self.sentences]
+        self.sentence_terms = [filter_terms(tokens) for tokens in self.sentence_tokens]
+        self.terms = [term for terms in self.sentence_terms for term in terms]
+
+        # Filled in lazily by the services that rank the document's terms
+        self.topic_ranking = None
+
+    @classmethod
+    def of(cls, content):
+        """Return ``content`` if it is already analyzed, otherwise analyze it"""
+        return content if isinstance(content, cls) else cls(content)
@@ -0,0 +1,163 @@
+"""
+In-process cache of generated titles.
+
+Lookups happen at two levels:
+
+1. Exact: a hash of the normalized summary that would be sent to the model,
+   plus the number of suggestions. Edits outside the key sentences still hit.
+2. Near-duplicate: a 64-bit SimHash of the document's terms. Drafts whose
+   signatures differ in at most ``max_distance`` bits share their titles.
+   Signatures are split into bands so candidates are found with a few dict
+   lookups instead of a scan.
+
+Entries are evicted least recently used first and expire after ``ttl``.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import CACHE_REQUESTS
+
+SIGNATURE_BITS = 64
+
+
+def summary_key(summary, num_suggestions):
+    """Exact cache key of a summary, ignoring case and whitespace differences"""
+    normalized = re.sub(r'\s+', ' ', summary).strip().lower()
+    return hashlib.sha256(f'{num_suggestions}:{normalized}'.encode('utf-8')).hexdigest()
+
+
+def simhash(terms):
+    """
+    64-bit SimHash of a bag of terms, each weighted by its count
+
+    Returns:
+        int: The signature, 0 for an empty document
+    """
+    if not terms:
+        return 0
+
+    unique, counts = np.unique(np.asarray(terms, dtype=str), return_counts=True)
+    digests = b''.join(
+        hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest() for term in unique.tolist()
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = counts @ (bits.astype(np.int64) * 2 - 1)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), 'big')
+
+
+class TitleCache:
+    """Thread-safe LRU cache with a TTL and near-duplicate lookup"""
+
+    def __init__(self, max_entries=1024, ttl=3600, max_distance=3):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # With at most max_distance differing bits, at least one of
+        # max_distance + 1 bands is identical (pigeonhole)
+        self.num_bands = max_distance + 1
+        self.band_bits = SIGNATURE_BITS // self.num_bands
+
+        self._entries = OrderedDict()
+        self._bands = {}
+        self._lock = threading.Lock()
+        self.counters = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _band_keys(self, signature, num_suggestions):
+        mask = (1 << self.band_bits) - 1
+        return [
+            (band, num_suggestions, (signature >> (band * self.band_bits)) & mask)
+            for band in range(self.num_bands)
+        ]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for band_key in self._band_keys(entry['signature'], entry['num_suggestions']):
+            keys = self._bands.get(band_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band_key]
+
+    def _live(self, key, now):
+        """Return the entry for ``key`` unless it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is not None and now - entry['created_at'] > self.ttl:
+            self._remove(key)
+            entry = None
+        return entry
+
+    def _nearest(self, signature, num_suggestions, now):
+        candidates = set()
+        for band_key in self._band_keys(signature, num_suggestions):
+            candidates.update(self._bands.get(band_key, ()))
+
+        best_key, best_distance = None, self.max_distance + 1
+        for key in candidates:
+            entry = self._live(key, now)
+            if entry is None:
+                continue
+            distance = bin(entry['signature'] ^ signature).count('1')
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get(self, key, signature, num_suggestions):
+        """
+        Look up titles by exact key, then by a near-duplicate signature
+
+        Returns:
+            list: Cached titles, or None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                self.counters['exact_hits'] += 1
+                CACHE_REQUESTS.inc(cache='title', result='exact_hit')
+            elif self.max_distance > 0:
+                near_key = self._nearest(signature, num_suggestions, now)
+                if near_key is not None:
+                    key, entry = near_key, self._entries[near_key]
+                    self.counters['near_hits'] += 1
+                    CACHE_REQUESTS.inc(cache='title', result='near_hit')
+
+            if entry is None:
+                self.counters['misses'] += 1
+                CACHE_REQUESTS.inc(cache='title', result='miss')
+                return None
+
+            self._entries.move_to_end(key)
+            return list(entry['titles'])
+
+    def set(self, key, signature, num_suggestions, titles):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'titles': list(titles),
+                'signature': signature,
+                'num_suggestions': num_suggestions,
+                'created_at': time.monotonic(),
+            }
+            for band_key in self._band_keys(signature, num_suggestions):
+                self._bands.setdefault(band_key, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def stats(self):
+        """Hit/miss counters and the current size"""
+        with self._lock:
+            lookups = sum(self.counters[name] for name in ('exact_hits', 'near_hits', 'misses'))
+            hits = self.counters['exact_hits'] + self.counters['near_hits']
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                hit_rate=round(hits / lookups, 4) if lookups else 0.0
+            )
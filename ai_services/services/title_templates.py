@@ -0,0 +1,156 @@
+"""
+Offline title generation from a post's key topics.
+
+Every template is parsed once, so the length of any title it can produce is
+known without rendering it. For one post, all (template, topic, topic)
+combinations are scored in a single NumPy pass:
+
+- topic weight: better-ranked topics score higher
+- length: titles between 40 and 60 characters are preferred
+- diversity: each pick penalizes candidates reusing its template or topics
+
+The best candidates are picked greedily, and only those are rendered.
+Randomness (the number in list titles, tie-breaking) is seeded from the
+topics, so the same post always gets the same titles.
+"""
+import hashlib
+import string
+from datetime import datetime
+
+import numpy as np
+
+TEMPLATES = [
+    "How to {topic1} and {topic2} in {current_year}",
+    "The Ultimate Guide to {topic1}: {topic2} and Beyond",
+    "{num} Ways to Improve Your {topic1} with {topic2}",
+    "{topic1} 101: Everything You Need to Know About {topic2}",
+    "Why {topic1} Matters: The Importance of {topic2}",
+    "Understanding {topic1}: A Comprehensive Guide to {topic2}",
+    "The Future of {topic1}: Trends in {topic2} for {current_year}",
+    # Single-topic templates keep posts with only one topic covered
+    "The Ultimate Guide to {topic1}",
+    "{topic1} 101: Everything You Need to Know",
+    "{num} Things Every Beginner Should Know About {topic1}",
+    "Why {topic1} Matters More Than You Think",
+    "A Practical Introduction to {topic1} in {current_year}",
+]
+
+LIST_SIZES = (3, 5, 7, 10)
+
+
+class TitleTemplateEngine:
+    """
+    Deterministic title generator over a fixed set of templates
+
+    Args:
+        templates: Format strings using ``topic1``, ``topic2``, ``num`` and
+            ``current_year``
+        target_length: Preferred (minimum, maximum) title length in characters
+        seed: Base seed; the same seed and topics always give the same titles
+    """
+
+    FIELDS = ('topic1', 'topic2', 'num', 'current_year')
+
+    def __init__(self, templates=TEMPLATES, target_length=(40, 60), seed=0):
+        self.templates = list(templates)
+        self.target_length = target_length
+        self.seed = seed
+
+        # Literal characters and field counts of every template, shape (T,)
+        # and (T, fields)
+        parsed = [list(string.Formatter().parse(template)) for template in self.templates]
+        self.literal_lengths = np.array(
+            [sum(len(literal) for literal, _, _, _ in parts) for parts in parsed], dtype=np.int64
+        )
+        self.field_counts = np.array(
+            [[sum(1 for _, name, _, _ in parts if name == field) for field in self.FIELDS]
+             for parts in parsed],
+            dtype=np.int64
+        )
+        self.two_topic = self.field_counts[:, 1] > 0
+
+    def _rng(self, topics):
+        digest = hashlib.blake2b('\x1f'.join(topics).encode('utf-8'), digest_size=8).digest()
+        return np.random.default_rng([self.seed, int.from_bytes(digest, 'big')])
+
+    def _score(self, topics, num, year, rng):
+        """Score every (template, topic1, topic2) candidate; invalid ones get -inf"""
+        k = len(topics)
+        weights = 1.0 / np.arange(1, k + 1)
+        topic_lengths = np.array([len(topic) for topic in topics], dtype=np.int64)
+
+        counts = self.field_counts
+        lengths = (
+            self.literal_lengths[:, None, None]
+            + counts[:, 0, None, None] * topic_lengths[None, :, None]
+            + counts[:, 1, None, None] * topic_lengths[None, None, :]
+            + counts[:, 2, None, None] * len(str(num))
+            + counts[:, 3, None, None] * len(str(year))
+        )
+        low, high = self.target_length
+        length_penalty = (np.maximum(low - lengths, 0) + np.maximum(lengths - high, 0)) / 20.0
+
+        scores = (
+            weights[None, :, None]
+            + 0.5 * weights[None, None, :] * self.two_topic[:, None, None]
+            - length_penalty
+            + rng.uniform(0, 1e-3, size=lengths.shape)
+        )
+
+        # Two-topic templates need two different topics; single-topic
+        # templates use the pair (i, i) only, so each title appears once
+        same = np.eye(k, dtype=bool)
+        valid = np.where(self.two_topic[:, None, None], ~same[None], same[None])
+        return np.where(valid, scores, -np.inf)
+
+    def generate(self, topics, num_suggestions, year=None):
+        """
+        Generate distinct titles for a post
+
+        Args:
+            topics: Key topics of the post, best first
+            num_suggestions: Number of titles wanted
+            year: Year used by the templates (default: the current year)
+
+        Returns:
+            list: At most ``num_suggestions`` distinct titles; fewer only when
+            the topics don't allow more
+        """
+        topics = list(dict.fromkeys(topic.capitalize() for topic in topics))
+        if not topics or num_suggestions <= 0:
+            return []
+
+        year = year or datetime.now().year
+        rng = self._rng(topics)
+        num = int(rng.choice(LIST_SIZES))
+        scores = self._score(topics, num, year, rng)
+
+        template_used = np.zeros(len(self.templates))
+        topic_used = np.zeros(len(topics))
+        titles, seen = [], set()
+        while len(titles) < num_suggestions:
+            adjusted = (
+                scores
+                - 1.0 * template_used[:, None, None]
+                - 0.3 * topic_used[None, :, None]
+                - 0.3 * topic_used[None, None, :] * self.two_topic[:, None, None]
+            )
+            best = int(np.argmax(adjusted))
+            if not np.isfinite(adjusted.flat[best]):
+                break
+
+            t, i, j = np.unravel_index(best, scores.shape)
+            scores[t, i, j] = -np.inf
+            template_used[t] += 1
+            topic_used[i] += 1
+            if self.two_topic[t]:
+                topic_used[j] += 1
+
+            title = self.templates[t].format(
+                topic1=topics[i], topic2=topics[j], num=num, current_year=year
+            )
+            if title not in seen:
+                seen.add(title)
+                titles.append(title)
+
+        return titles
@@ -0,0 +1,73 @@
+"""
+Keep the corpus IDF index and precomputed titles in step with blog posts.
+
+Handlers are connected in ``AiServicesConfig.ready`` when the blog app is
+installed. Each save or delete applies a single-document delta to the
+index file once the transaction commits (deltas arriving within
+``TITLE_IDF_WRITE_DELAY`` seconds are written together), and a save with
+new content queues title precomputation for the post.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .services.idf_index import document_terms, update_idf_index
+from .titles import schedule_title_precompute
+
+logger = logging.getLogger(__name__)
+
+
+def _apply_delta(added_content=None, removed_content=None):
+    path = getattr(settings, 'TITLE_IDF_INDEX_PATH', None)
+    if not path:
+        return
+
+    try:
+        update_idf_index(
+            path,
+            added=document_terms(added_content) if added_content is not None else None,
+            removed=document_terms(removed_content) if removed_content is not None else None,
+            delay=getattr(settings, 'TITLE_IDF_WRITE_DELAY', 2.0)
+        )
+    except Exception as e:
+        # Indexing must never break saving a post; a rebuild catches up later
+        logger.warning("Could not update the IDF index: %s", e)
+
+
+def remember_previous_content(sender, instance, raw=False, **kwargs):
+    """Record the stored content of a post before it is overwritten"""
+    instance._idf_previous_content = None
+    if instance.pk and not raw:
+        instance._idf_previous_content = (
+            sender.objects.filter(pk=instance.pk).values_list('content', flat=True).first()
+        )
+
+
+def index_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_idf_previous_content', None)
+    if not created and previous == instance.content:
+        return
+
+    content = instance.content
+    transaction.on_commit(lambda: _apply_delta(added_content=content, removed_content=previous))
+
+
+def precompute_saved_post_titles(sender, instance, created, raw=False, **kwargs):
+    if raw or not getattr(settings, 'TITLE_PRECOMPUTE', True):
+        return
+
+    previous = getattr(instance, '_idf_previous_content', None)
+    if not created and previous == instance.content:
+        return
+
+    post_id = instance.pk
+    transaction.on_commit(lambda: schedule_title_precompute(post_id))
+
+
+def unindex_deleted_post(sender, instance, **kwargs):
+    content = instance.content
+    transaction.on_commit(lambda: _apply_delta(removed_content=content))
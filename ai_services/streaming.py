@@ -0,0 +1,309 @@
+"""
+Live transcription over WebSocket.
+
+Clients stream 16-bit little-endian mono PCM as binary messages and receive
+JSON events while the call is still in progress:
+
+    {"type": "partial", "text": ..., "start": ..., "end": ...}
+    {"type": "final", "text": ..., "start": ..., "end": ...}
+
+Sending the text message ``{"type": "stop"}`` flushes the last segment; the
+server answers ``{"type": "done"}`` and closes the connection.
+
+Each stream holds at most one buffered speech segment and a bounded number
+of in-flight recognitions, and all streams of a process share one thread
+pool and the process-wide recognizer backends.
+"""
+import asyncio
+import base64
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.request import split_domain_port, validate_host
+
+from .jobs import recognizer_options
+from .services.audio_decoder import DecodedAudio
+from .services.metrics import stage
+from .services.recognizers import RECOGNIZER_BACKENDS, get_recognizer
+from .services.vad import StreamingVoiceDetector
+
+logger = logging.getLogger(__name__)
+
+# Application-level close codes (4000-4999 are reserved for applications)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_BAD_REQUEST = 4400
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_stream_executor():
+    """Return the thread pool shared by every stream of this process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TRANSCRIPTION_STREAM_WORKERS', 8),
+                thread_name_prefix='transcription-stream'
+            )
+        return _executor
+
+
+class TranscriptionStream:
+    """
+    Turn a live PCM stream into partial and final transcript events
+
+    Final segments are always recognized and sent in order. Partial segments
+    are only a preview: one is skipped when the stream already has a
+    recognition in flight, so a slow recognizer can't build up a backlog.
+    Once ``max_pending`` recognitions are in flight, ``feed`` waits for one
+    to finish, which stops reading from the socket and pushes back on the
+    client instead of buffering its audio.
+    """
+
+    def __init__(self, send_event, recognizer, language, sample_rate=16000, max_pending=2,
+                 detector=None):
+        self.send_event = send_event
+        self.recognizer = recognizer
+        self.language = language
+        self.sample_rate = sample_rate
+        self.detector = detector or StreamingVoiceDetector(sample_rate)
+        self._slots = asyncio.Semaphore(max_pending)
+        self._in_flight = 0
+        self._last_sent = None
+        self._pending = set()
+        self._partial_sample = b''
+
+    async def feed(self, data):
+        """Consume one binary message of PCM"""
+        # A message may end in the middle of a sample; carry the odd byte
+        # over to the next message
+        data = self._partial_sample + data
+        whole = len(data) - len(data) % 2
+        self._partial_sample = data[whole:]
+        samples = np.frombuffer(data[:whole], dtype='<i2')
+        for event in self.detector.feed(samples):
+            await self._dispatch(*event)
+
+    async def finish(self):
+        """Flush the buffered segment and wait until every event has been sent"""
+        for event in self.detector.flush():
+            await self._dispatch(*event)
+        if self._last_sent is not None:
+            await self._last_sent
+
+    async def cancel(self):
+        """Stop every recognition still in flight; none of them sends anything afterwards"""
+        pending = list(self._pending)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _dispatch(self, kind, start, end, samples):
+        if kind == 'partial' and self._in_flight:
+            return
+
+        await self._slots.acquire()
+        self._in_flight += 1
+        previous = self._last_sent
+        self._last_sent = asyncio.ensure_future(
+            self._recognize_and_send(previous, kind, start, end, samples)
+        )
+        self._pending.add(self._last_sent)
+        self._last_sent.add_done_callback(self._pending.discard)
+
+    def _recognize(self, samples):
+        audio_data = DecodedAudio(samples, self.sample_rate).to_audio_data()
+        with stage('live_transcription', 'recognize', backend=self.recognizer.name):
+            return self.recognizer.recognize(audio_data, self.language)
+
+    async def _recognize_and_send(self, previous, kind, start, end, samples):
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                event = {
+                    'type': kind,
+                    'text': await loop.run_in_executor(get_stream_executor(), self._recognize, samples),
+                }
+            except Exception as e:
+                logger.warning("Streaming recognition failed: %s", e)
+                event = {'type': 'error', 'error': str(e)}
+            event.update(start=round(start, 2), end=round(end, 2))
+
+            # Keep events in the order their audio was spoken
+            if previous is not None:
+                await previous
+            if event['type'] != 'partial' or event['text']:
+                await self.send_event(event)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+
+def _get_headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _authenticate(headers):
+    """
+    Resolve the user of a handshake from the session cookie or Basic auth,
+    the same schemes the REST API accepts
+
+    Returns:
+        The authenticated user, or None
+    """
+    from django.contrib.auth import authenticate, get_user
+
+    close_old_connections()
+    try:
+        authorization = headers.get('authorization', '')
+        if authorization.lower().startswith('basic '):
+            try:
+                username, _, password = base64.b64decode(authorization[6:]).decode('utf-8').partition(':')
+            except (ValueError, UnicodeDecodeError):
+                return None
+            return authenticate(username=username, password=password)
+
+        cookies = SimpleCookie(headers.get('cookie', ''))
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        if morsel is None:
+            return None
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+        user = get_user(SimpleNamespace(session=session))
+        return user if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+def _origin_allowed(headers):
+    """
+    Whether a handshake comes from a page of this site
+
+    Browsers attach the session cookie to WebSocket handshakes started by
+    any page, so a handshake from another origin could act as the user
+    (cross-site WebSocket hijacking). Its Origin header has to name one of
+    ``ALLOWED_HOSTS``, as Django checks the Host header of HTTP requests.
+    Clients that send no Origin aren't browsers and carry no ambient
+    credentials.
+    """
+    origin = headers.get('origin')
+    if origin is None:
+        return True
+
+    domain, _ = split_domain_port(urlsplit(origin).netloc)
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+async def _wait_for_connect(receive):
+    message = await receive()
+    return message['type'] == 'websocket.connect'
+
+
+async def transcription_stream(scope, receive, send):
+    """
+    WebSocket endpoint streaming transcripts of live audio
+
+    Query parameters:
+        sample_rate: Sample rate of the PCM the client sends (default 16000)
+        language: Language code of the call (default TRANSCRIPTION_DEFAULT_LANGUAGE)
+        backend: Recognition backend (default TRANSCRIPTION_BACKEND)
+    """
+    if not await _wait_for_connect(receive):
+        return
+
+    user = await sync_to_async(_authenticate)(_get_headers(scope))
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    params = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    backend = params.get('backend', getattr(settings, 'TRANSCRIPTION_BACKEND', 'google'))
+    language = params.get('language', getattr(settings, 'TRANSCRIPTION_DEFAULT_LANGUAGE', 'en-US'))
+    try:
+        sample_rate = int(params.get('sample_rate', 16000))
+    except ValueError:
+        sample_rate = 0
+    if backend not in RECOGNIZER_BACKENDS or not 8000 <= sample_rate <= 48000:
+        await send({'type': 'websocket.close', 'code': CLOSE_BAD_REQUEST})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    async def send_event(event):
+        await send({'type': 'websocket.send', 'text': json.dumps(event)})
+
+    stream = TranscriptionStream(
+        send_event,
+        get_recognizer(backend, **recognizer_options(backend)),
+        language,
+        sample_rate=sample_rate,
+    )
+
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                await stream.cancel()
+                return
+
+            if message.get('bytes'):
+                await stream.feed(message['bytes'])
+            elif message.get('text'):
+                try:
+                    command = json.loads(message['text'])
+                except ValueError:
+                    command = {}
+                if isinstance(command, dict) and command.get('type') == 'stop':
+                    break
+
+        await stream.finish()
+        await send_event({'type': 'done'})
+        await send({'type': 'websocket.close', 'code': 1000})
+    except asyncio.CancelledError:
+        await stream.cancel()
+        raise
+
+
+def get_streaming_application(http_application, routes):
+    """
+    Combine the Django ASGI application with the WebSocket endpoints
+
+    WebSocket handshakes from a page outside ``ALLOWED_HOSTS`` are refused
+    before they reach an endpoint
+
+    Args:
+        http_application: Application handling every non-WebSocket scope
+        routes: Dict mapping WebSocket paths to ASGI applications
+
+    Returns:
+        The combined ASGI application
+    """
+    async def application(scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await http_application(scope, receive, send)
+
+        handler = routes.get(scope['path'])
+        if handler is None or not _origin_allowed(_get_headers(scope)):
+            if await _wait_for_connect(receive):
+                code = CLOSE_NOT_FOUND if handler is None else CLOSE_FORBIDDEN
+                await send({'type': 'websocket.close', 'code': code})
+            return
+        return await handler(scope, receive, send)
+
+    return application
@@ -1,12 +1,80 @@
+import asyncio
+import base64
+import hashlib
+import importlib
+import io
+import json
 import os
+import re
+import sys
 import tempfile
-from django.test import TestCase
+import threading
+import time
+import wave
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.throttling import UserRateThrottle
 
+from . import async_views, jobs, urls as ai_urls, views
+from .cache import ResultCache, get_transcription_cache
+from .models import CachedResult, PostTitleSuggestions, TranscriptionJob, result_cache_key
+from .services.audio_decoder import DecodedAudio, FFmpegNotFoundError
+from .uploads import SpillFileUploadHandler, StagedUpload
 from .services.audio_service import AudioTranscriptionService
-from .services.nlp_service import BlogTitleSuggestionService
+from .services.diarization import MFCCDiarizer, PyannoteDiarizer
+from .services.recognizers import ModelPool, RecognitionError, RecognizerBackend, get_recognizer
+from .services.vad import StreamingVoiceDetector, detect_speech_regions
+from .streaming import TranscriptionStream, get_streaming_application, transcription_stream
+from .services.nlp_service import BlogTitleSuggestionService, TitleListParser, get_title_suggestion_service
+from .services.idf_index import IDFIndex, flush_idf_updates, get_idf_index, update_idf_index
+from .services.metrics import CACHE_REQUESTS, FALLBACKS, STAGE_SECONDS, Registry, stage
+from .services.openai_client import ChatCompletionClient, LatencyBudgetExceeded, TokenBucket
+from .services.title_cache import TitleCache, simhash
+from .services.title_templates import TitleTemplateEngine
+from .services.summarizer import summarize
+from .services.text_analysis import AnalyzedDocument
+from blog.models import BlogPost
+
+
+def write_test_wav(file_obj, seconds, sample_rate=16000, frequency=440.0):
+    """Write a mono 16-bit sine tone to an open file object"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16)
+    with wave.open(file_obj, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    file_obj.flush()
+
+
+def simple_tokenizers():
+    """Replace the NLTK tokenizers with plain splitting so no NLTK data is needed"""
+    return mock.patch.multiple(
+        'blog.tokenizer',
+        sent_tokenize=lambda text: [s.strip() + '.' for s in text.split('.') if s.strip()],
+        word_tokenize=lambda text, preserve_line=False: text.replace('.', ' .').split(),
+        english_stop_words=lambda: frozenset({'the', 'is', 'a', 'of', 'and', 'in', 'we', 'how'}),
+    )
+
 
 class AudioTranscriptionServiceTest(TestCase):
     def setUp(self):
@@ -14,35 +82,188 @@ class AudioTranscriptionServiceTest(TestCase):
             huggingface_token=os.getenv('HUGGINGFACE_API_KEY')
         )
         
-    def test_convert_audio_to_wav(self):
-        # Create a temporary audio file
-        with tempfile.NamedTemporaryFile(suffix='.mp3') as temp_audio:
-            temp_audio.write(b'dummy audio data')
-            temp_audio.flush()
-            
-            # Convert to WAV
-            wav_path = self.service._convert_audio_to_wav(temp_audio.name)
-            
-            # Check if file exists and has .wav extension
-            self.assertTrue(os.path.exists(wav_path))
-            self.assertTrue(wav_path.endswith('.wav'))
-            
-            # Clean up
-            os.remove(wav_path)
-    
+    def test_decode_audio(self):
+        with tempfile.NamedTemporaryFile(suffix='.wav') as temp_audio:
+            write_test_wav(temp_audio, seconds=1.0)
+
+            # Decode once into a shared PCM buffer
+            audio = self.service._decode_audio(temp_audio.name)
+
+            self.assertEqual(audio.sample_rate, 16000)
+            self.assertAlmostEqual(audio.duration, 1.0, places=2)
+            self.assertEqual(audio.samples.dtype, np.int16)
+
+            # Slices are wrapped without decoding the file again
+            audio_data = audio.to_audio_data(0.25, 0.75)
+            self.assertEqual(len(audio_data.frame_data), 8000 * 2)
+
+    def test_decode_audio_from_bytes(self):
+        # Stereo upload held in memory, decoded without touching the disk
+        buffer = io.BytesIO()
+        samples = np.zeros((8000, 2), dtype=np.int16)
+        samples[:, 0] = 1000
+        samples[:, 1] = 3000
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(samples.tobytes())
+
+        audio = self.service._decode_audio(buffer.getvalue())
+
+        self.assertEqual(audio.sample_rate, 8000)
+        self.assertAlmostEqual(audio.duration, 1.0)
+        self.assertTrue(np.all(audio.samples == 2000))
+
+    def test_staged_upload_keeps_small_files_in_memory(self):
+        upload = StagedUpload(SimpleUploadedFile("call.wav", b"RIFF data"))
+
+        self.assertEqual(upload.content_hash, hashlib.sha256(b"RIFF data").hexdigest())
+        self.assertEqual(upload.claim(), b"RIFF data")
+
     def test_detect_language(self):
-        # Create a temporary WAV file
         with tempfile.NamedTemporaryFile(suffix='.wav') as temp_audio:
-            temp_audio.write(b'dummy audio data')
-            temp_audio.flush()
-            
+            write_test_wav(temp_audio, seconds=0.5)
+            audio = self.service._decode_audio(temp_audio.name)
+
             # Detect language
-            language = self.service._detect_language(temp_audio.name)
-            
+            language = self.service._detect_language(audio)
+
             # Should return a string
             self.assertIsInstance(language, str)
             self.assertTrue(len(language) > 0)
 
+    def test_language_sample_takes_first_seconds_of_speech(self):
+        regions = [(1.0, 4.0), (6.0, 12.0), (15.0, 20.0)]
+
+        sample = self.service._language_sample(regions, 5.0)
+
+        self.assertEqual(sample, [(1.0, 4.0), (6.0, 8.0)])
+
+    def test_plan_chunks_cuts_at_silence(self):
+        # 1.5s tone, 0.5s silence, 1.5s tone
+        tone = (np.sin(np.arange(24000) * 0.1) * 8000).astype(np.int16)
+        samples = np.concatenate([tone, np.zeros(8000, dtype=np.int16), tone])
+        audio = DecodedAudio(samples, 16000)
+
+        service = AudioTranscriptionService(max_chunk_seconds=2.0, min_chunk_seconds=0.5)
+        chunks = [spans[0] for spans in service._plan_chunks(audio)]
+
+        # Windows are bounded, contiguous and cover the whole recording
+        self.assertEqual(chunks[0][0], 0.0)
+        self.assertAlmostEqual(chunks[-1][1], audio.duration)
+        self.assertTrue(all(end - start <= 2.0 for start, end in chunks))
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(chunks, chunks[1:])))
+
+        # The first cut lands inside the silent gap
+        self.assertTrue(1.5 <= chunks[0][1] <= 2.0)
+
+    def test_speech_regions_skip_silence(self):
+        # 2s silence, 1s tone, 3s silence, 1s tone, 1s silence
+        tone = (np.sin(np.arange(16000) * 0.1) * 8000).astype(np.int16)
+        silence = np.random.default_rng(0).normal(0, 20, 16000).astype(np.int16)
+        samples = np.concatenate([silence, silence, tone, silence, silence, silence, tone, silence])
+        audio = DecodedAudio(samples, 16000)
+
+        regions = detect_speech_regions(audio)
+
+        # Two regions at the original timestamps, padded by a few frames
+        self.assertEqual(len(regions), 2)
+        self.assertAlmostEqual(regions[0][0], 2.0, delta=0.2)
+        self.assertAlmostEqual(regions[0][1], 3.0, delta=0.2)
+        self.assertAlmostEqual(regions[1][0], 6.0, delta=0.2)
+        self.assertAlmostEqual(regions[1][1], 7.0, delta=0.2)
+
+        # Both regions fit one chunk, and only their audio is sent
+        chunks = self.service._plan_chunks(audio, regions)
+        self.assertEqual(chunks, [regions])
+        payload = audio.spans_to_audio_data(regions)
+        self.assertLess(len(payload.frame_data), len(samples.tobytes()) / 2)
+
+    def test_mfcc_diarizer_separates_two_speakers(self):
+        # Two synthetic "voices" with different pitch and formants, A B A B
+        t = np.arange(3 * 16000) / 16000
+        def voice(pitch, formants):
+            return sum(
+                np.sin(2 * np.pi * pitch * h * t) / h
+                * sum(np.exp(-((pitch * h - f) / 150) ** 2) for f in formants)
+                for h in range(1, 30)
+            )
+        a, b = voice(110, [700, 1200]), voice(220, [400, 2500])
+        noise = np.random.default_rng(0).normal(0, 200, len(t))
+        samples = np.concatenate([p / np.abs(p).max() * 8000 + noise for p in (a, b, a, b)])
+        audio = DecodedAudio(samples.astype(np.int16), 16000)
+
+        result = MFCCDiarizer().diarize(audio)
+
+        self.assertEqual([speaker for _, _, speaker in result.turns],
+                         ['SPEAKER_00', 'SPEAKER_01', 'SPEAKER_00', 'SPEAKER_01'])
+        for (start, _, _), change in zip(result.turns[1:], (3.0, 6.0, 9.0)):
+            self.assertAlmostEqual(start, change, delta=0.75)
+        self.assertGreater(result.real_time_factor, 0.0)
+
+        # Recognition chunks never mix speakers
+        chunks = self.service._plan_speaker_chunks(audio, result.turns)
+        self.assertEqual([speaker for speaker, _ in chunks],
+                         ['SPEAKER_00', 'SPEAKER_01', 'SPEAKER_00', 'SPEAKER_01'])
+
+    def test_pyannote_only_hears_the_speech_regions(self):
+        # Every sample holds the second it belongs to
+        audio = DecodedAudio(np.repeat(np.arange(10, dtype=np.int16), 16000), 16000)
+        regions = [(1.0, 3.0), (6.0, 7.0)]
+
+        samples, offsets = PyannoteDiarizer._crop(audio, regions)
+
+        self.assertEqual(len(samples), 3 * 16000)
+        self.assertEqual(samples[2 * 16000], 6)
+        # A turn across the join is split back onto both regions
+        turns = PyannoteDiarizer._uncrop([(0.5, 2.5, 'SPEAKER_00'), (2.5, 3.0, 'SPEAKER_01')], offsets)
+        self.assertEqual(turns, [(1.5, 3.0, 'SPEAKER_00'), (6.0, 6.5, 'SPEAKER_00'), (6.5, 7.0, 'SPEAKER_01')])
+
+
+class AudioDecoderTest(TestCase):
+    def fake_ffmpeg_path(self):
+        """A PATH whose ffmpeg copies stdin to stdout, i.e. treats the input as raw PCM"""
+        directory = tempfile.mkdtemp()
+        script = os.path.join(directory, 'ffmpeg')
+        with open(script, 'w') as script_file:
+            script_file.write(
+                f'#!{sys.executable}\n'
+                'import shutil, sys\n'
+                'shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)\n'
+            )
+        os.chmod(script, 0o755)
+        return directory
+
+    def test_file_objects_are_streamed_to_ffmpeg(self):
+        class RecordingFile(io.BytesIO):
+            largest_read = 0
+
+            def read(self, size=-1):
+                data = super().read(size)
+                RecordingFile.largest_read = max(RecordingFile.largest_read, len(data))
+                return data
+
+        # Not a WAV header, and larger than a pipe buffer
+        payload = b'OggS' + np.arange(1_000_000, dtype='<i2').tobytes()
+        with mock.patch.dict(os.environ, {'PATH': self.fake_ffmpeg_path()}), \
+                mock.patch.object(DecodedAudio, 'PIPE_CHUNK_SIZE', 64 * 1024):
+            audio = DecodedAudio.from_source(RecordingFile(payload))
+
+        self.assertEqual(audio.samples.tobytes(), payload)
+        self.assertLessEqual(RecordingFile.largest_read, 64 * 1024)
+
+    def test_missing_ffmpeg_is_not_retried_from_a_spill_file(self):
+        with mock.patch.dict(os.environ, {'PATH': tempfile.mkdtemp()}), \
+                mock.patch('ai_services.services.audio_decoder.tempfile.NamedTemporaryFile') as spill:
+            with self.assertRaises(FFmpegNotFoundError):
+                DecodedAudio.from_source(b'OggS not really audio')
+            with self.assertRaises(FFmpegNotFoundError):
+                DecodedAudio.from_source(io.BytesIO(b'OggS not really audio'))
+
+        spill.assert_not_called()
+
+
 class BlogTitleSuggestionServiceTest(TestCase):
     def setUp(self):
         self.service = BlogTitleSuggestionService(
@@ -77,6 +298,57 @@ class BlogTitleSuggestionServiceTest(TestCase):
         self.assertEqual(len(suggestions), 3)
         self.assertTrue(all(isinstance(title, str) for title in suggestions))
 
+    @mock.patch('blog.tokenizer.english_stop_words',
+                return_value=frozenset({'the', 'is', 'a', 'of', 'and', 'in', 'we', 'how'}))
+    @mock.patch('blog.tokenizer.word_tokenize',
+                side_effect=lambda text, preserve_line=False: text.replace('.', ' .').split())
+    @mock.patch('blog.tokenizer.sent_tokenize',
+                side_effect=lambda text: [s.strip() + '.' for s in text.split('.') if s.strip()])
+    def test_document_is_tokenized_once(self, sent_tokenize, word_tokenize, stop_words):
+        content = (
+            "Machine learning is changing data analysis. "
+            "Deep learning models need data. "
+            "We explore how learning systems scale."
+        )
+
+        suggestions = BlogTitleSuggestionService()._generate_title_without_api(content, 3)
+
+        self.assertEqual(len(suggestions), 3)
+        self.assertEqual(sent_tokenize.call_count, 1)
+        self.assertEqual(word_tokenize.call_count, 3)  # once per sentence
+
+        document = AnalyzedDocument(content)
+        self.assertEqual(self.service._extract_key_topics(document, 1), ['learning'])
+        self.assertNotIn('the', document.terms)
+
+    def test_offline_titles_are_reproducible_and_unique(self):
+        engine = TitleTemplateEngine()
+        topics = ['python', 'data', 'pipelines', 'testing']
+
+        titles = engine.generate(topics, 5, year=2026)
+        self.assertEqual(titles, TitleTemplateEngine().generate(topics, 5, year=2026))
+        self.assertEqual(len(set(titles)), 5)
+        self.assertTrue(all(40 <= len(title) <= 60 for title in titles[:3]))
+
+        # One topic is enough for single-topic templates; none falls back to
+        # numbered placeholders
+        single = engine.generate(['python'], 3, year=2026)
+        self.assertEqual(len(set(single)), 3)
+        self.assertTrue(all('Python' in title for title in single))
+        with simple_tokenizers():
+            self.assertEqual(
+                BlogTitleSuggestionService()._generate_title_without_api('The. A.', 2),
+                ['Blog Post Title Suggestion #1', 'Blog Post Title Suggestion #2']
+            )
+
+    def test_service_is_shared_and_never_downloads(self):
+        with mock.patch('nltk.download') as download:
+            service = get_title_suggestion_service('test-key')
+            service.warm()
+            self.assertIs(get_title_suggestion_service('test-key'), service)
+            self.assertIs(service.client, service.client)
+        download.assert_not_called()
+
 class APITest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -113,3 +385,1278 @@ class APITest(TestCase):
         
         # Should return 401 if not authenticated
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TranscriptionJobAPITest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('listener', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_upload_returns_job_immediately(self):
+        audio_file = SimpleUploadedFile("call.mp3", b"dummy audio data", content_type="audio/mpeg")
+
+        response = self.client.post('/api/transcribe/', {'audio_file': audio_file}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = TranscriptionJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.owner, self.user)
+        self.assertEqual(response.data['status_url'], f'/api/transcribe/{job.id}/')
+        # The web process only queues the job, with its audio, for the worker
+        self.assertEqual(job.status, TranscriptionJob.STATUS_PENDING)
+        self.assertEqual(bytes(job.audio), b"dummy audio data")
+
+    def test_large_upload_is_spooled_to_the_spill_dir(self):
+        spill_dir = tempfile.mkdtemp()
+        spooled_to = []
+        new_file = SpillFileUploadHandler.new_file
+
+        def record(handler, *args, **kwargs):
+            new_file(handler, *args, **kwargs)
+            spooled_to.append(os.path.dirname(handler.file.temporary_file_path()))
+
+        audio_file = SimpleUploadedFile("long-call.mp3", b"x" * 4096, content_type="audio/mpeg")
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024, TRANSCRIPTION_SPILL_DIR=spill_dir), \
+                mock.patch.object(SpillFileUploadHandler, 'new_file', autospec=True, side_effect=record):
+            response = self.client.post('/api/transcribe/', {'audio_file': audio_file}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(spooled_to, [spill_dir])
+        job = TranscriptionJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(os.path.dirname(job.audio_path), spill_dir)
+        os.remove(job.audio_path)
+
+    def test_repeated_upload_is_served_from_cache(self):
+        result = {'language': 'en-US', 'segments': [], 'complete_transcript': 'cached'}
+        content_hash = hashlib.sha256(b"dummy audio data").hexdigest()
+        options = {'mode': 'single', 'diarize': True, 'backend': 'google'}
+        get_transcription_cache().set(result_cache_key(content_hash, options), result)
+        audio_file = SimpleUploadedFile("retry.mp3", b"dummy audio data", content_type="audio/mpeg")
+
+        response = self.client.post('/api/transcribe/', {'audio_file': audio_file}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['cached'])
+        self.assertEqual(response.data['result'], result)
+
+    def test_unknown_backend_is_rejected(self):
+        audio_file = SimpleUploadedFile("call.mp3", b"dummy audio data", content_type="audio/mpeg")
+
+        response = self.client.post(
+            '/api/transcribe/',
+            {'audio_file': audio_file, 'backend': 'carrier-pigeon'},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TranscriptionJob.objects.exists())
+
+    def test_poll_job_status(self):
+        job = TranscriptionJob.objects.create(
+            owner=self.user,
+            status=TranscriptionJob.STATUS_COMPLETED,
+            progress=1.0,
+            result={'language': 'en-US', 'segments': [], 'complete_transcript': ''}
+        )
+
+        response = self.client.get(f'/api/transcribe/{job.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['result']['language'], 'en-US')
+
+    def test_jobs_are_private_to_their_owner(self):
+        other = User.objects.create_user('someone-else', password='secret')
+        job = TranscriptionJob.objects.create(owner=other)
+
+        response = self.client.get(f'/api/transcribe/{job.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class InlineExecutor:
+    """Executor running every task immediately in the calling thread"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class TranscriptionWorkerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('listener', password='secret')
+
+    def queue(self, audio=b'audio', **fields):
+        return TranscriptionJob.objects.create(owner=self.user, audio=audio, **fields)
+
+    def test_claims_are_exclusive_and_oldest_first(self):
+        first = self.queue()
+        second = self.queue()
+        TranscriptionJob.objects.filter(id=second.id).update(created_at=first.created_at + timedelta(seconds=1))
+
+        self.assertEqual(jobs.claim_next_job('worker-a', 60), str(first.id))
+        self.assertEqual(jobs.claim_next_job('worker-b', 60), str(second.id))
+        self.assertIsNone(jobs.claim_next_job('worker-c', 60))
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, TranscriptionJob.STATUS_RUNNING)
+        self.assertEqual(first.worker, 'worker-a')
+        self.assertEqual(first.attempts, 1)
+
+    def test_jobs_of_a_dead_worker_are_requeued_then_failed(self):
+        expired = timezone.now() - timedelta(seconds=1)
+        retry = self.queue(status=TranscriptionJob.STATUS_RUNNING, worker='gone', attempts=1,
+                           lease_expires_at=expired)
+        exhausted = self.queue(status=TranscriptionJob.STATUS_RUNNING, worker='gone', attempts=2,
+                               lease_expires_at=expired)
+        alive = self.queue(status=TranscriptionJob.STATUS_RUNNING, worker='alive', attempts=1,
+                           lease_expires_at=timezone.now() + timedelta(seconds=60))
+
+        self.assertEqual(jobs.recover_abandoned_jobs(max_attempts=2), (1, 1))
+
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(retry.status, TranscriptionJob.STATUS_PENDING)
+        self.assertEqual(exhausted.status, TranscriptionJob.STATUS_FAILED)
+        self.assertIsNone(exhausted.audio)
+        self.assertEqual(alive.status, TranscriptionJob.STATUS_RUNNING)
+
+    def test_worker_runs_queued_jobs(self):
+        job = self.queue(options={'backend': 'google'})
+        result = {'language': 'en-US', 'segments': [], 'complete_transcript': 'hello'}
+        service = mock.Mock()
+        service.transcribe_audio.return_value = result
+        worker = jobs.TranscriptionWorker(processes=1)
+
+        with mock.patch.object(worker, '_new_pool', return_value=InlineExecutor()), \
+                mock.patch('ai_services.jobs.get_transcription_service', return_value=service), \
+                mock.patch('ai_services.jobs.close_old_connections') as close_old_connections:
+            worker.run(max_jobs=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscriptionJob.STATUS_COMPLETED)
+        self.assertEqual(job.result, result)
+        self.assertEqual(job.worker, worker.name)
+        # Long-lived pool processes drop stale connections around every job
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertIsNone(job.audio)
+        self.assertEqual(service.transcribe_audio.call_args.args[0], b'audio')
+
+    def test_failed_chunk_leaves_the_rest_of_a_chunked_job(self):
+        class FailsOnce(RecognizerBackend):
+            name = 'flaky'
+            calls = 0
+            lock = threading.Lock()
+
+            def recognize(self, audio_data, language):
+                with self.lock:
+                    FailsOnce.calls += 1
+                    if FailsOnce.calls == 1:
+                        raise RecognitionError('backend unavailable')
+                return 'words'
+
+        audio = io.BytesIO()
+        write_test_wav(audio, seconds=3)
+        job = self.queue(audio=audio.getvalue(), content_hash='flaky-upload',
+                         options={'mode': 'chunked', 'language': 'en-US', 'diarize': False})
+        service = AudioTranscriptionService(max_chunk_seconds=1.0, min_chunk_seconds=0.5, use_vad=False)
+        service.recognizer = FailsOnce()
+        chunk_errors = FALLBACKS.value(pipeline='transcription', reason='chunk_error')
+
+        with mock.patch('ai_services.jobs.get_transcription_service', return_value=service):
+            jobs.run_transcription_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscriptionJob.STATUS_COMPLETED)
+        segments = job.result['segments']
+        self.assertGreater(len(segments), 1)
+        failed = [segment for segment in segments if 'error' in segment]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual((failed[0]['text'], failed[0]['error']), ('', 'backend unavailable'))
+        self.assertEqual(job.result['complete_transcript'], ' '.join(['words'] * (len(segments) - 1)))
+        self.assertEqual(FALLBACKS.value(pipeline='transcription', reason='chunk_error'), chunk_errors + 1)
+        # An incomplete transcript is not served to later uploads of the same audio
+        self.assertIsNone(get_transcription_cache().get(job.cache_key))
+
+    def test_upload_is_claimed_by_the_worker_command(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        audio_file = SimpleUploadedFile("call.mp3", b"dummy audio data", content_type="audio/mpeg")
+        job_id = client.post('/api/transcribe/', {'audio_file': audio_file}, format='multipart').data['job_id']
+        result = {'language': 'en-US', 'segments': [], 'complete_transcript': 'hello'}
+        service = mock.Mock()
+        service.transcribe_audio.return_value = result
+
+        with mock.patch.object(jobs.TranscriptionWorker, '_new_pool', return_value=InlineExecutor()), \
+                mock.patch('ai_services.jobs.get_transcription_service', return_value=service):
+            call_command('run_transcription_worker', processes=1, max_jobs=1, stdout=io.StringIO())
+
+        job = TranscriptionJob.objects.get(id=job_id)
+        self.assertEqual(job.status, TranscriptionJob.STATUS_COMPLETED)
+        self.assertEqual(job.result, result)
+        self.assertEqual(service.transcribe_audio.call_args.args[0], b"dummy audio data")
+
+    def test_container_processes_share_one_database(self):
+        def read(name):
+            with open(os.path.join(settings.BASE_DIR, name)) as deployment_file:
+                return deployment_file.read()
+
+        # The entrypoint's management commands and the worker service use the
+        # image's settings module; gunicorn loads the ASGI app of a project
+        image_settings, = re.findall(r'^ENV DJANGO_SETTINGS_MODULE=(\S+)$', read('Dockerfile'), re.MULTILINE)
+        server_project, = re.findall(r'gunicorn (\w+)\.asgi:application', read('docker-entrypoint.sh'))
+        self.assertEqual(image_settings, f'{server_project}.settings')
+        self.assertEqual(
+            set(re.findall(r'DJANGO_SETTINGS_MODULE=(\S+)', read('docker-compose.yml'))), {image_settings}
+        )
+
+        with mock.patch.dict(os.environ, DB_HOST='db'):
+            deployed = importlib.reload(importlib.import_module(image_settings))
+        self.assertEqual(deployed.DATABASES['default']['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(deployed.DATABASES['default']['HOST'], 'db')
+
+    def test_job_of_a_crashed_process_is_requeued(self):
+        job = self.queue()
+        pool = mock.Mock()
+        crashed = Future()
+        crashed.set_exception(BrokenProcessPool('killed'))
+        pool.submit.return_value = crashed
+        worker = jobs.TranscriptionWorker(processes=1, max_attempts=2)
+
+        with mock.patch.object(worker, '_new_pool', return_value=pool):
+            worker.run(max_jobs=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscriptionJob.STATUS_PENDING)
+        self.assertEqual(job.attempts, 1)
+
+
+class ResultCacheTest(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache('test', max_entries=2)
+        cache.set('a', {'value': 1})
+        cache.set('b', {'value': 2})
+
+        # Reading "a" makes "b" the least recently used entry
+        self.assertEqual(cache.get('a'), {'value': 1})
+        cache.set('c', {'value': 3})
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'value': 1})
+        self.assertEqual(cache.get('c'), {'value': 3})
+
+    def test_expired_entries_are_misses(self):
+        cache = ResultCache('test', ttl=60)
+        cache.set('a', {'value': 1})
+        CachedResult.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertIsNone(cache.get('a'))
+
+
+class RecognizerBackendTest(TestCase):
+    def test_backends_are_process_wide_singletons(self):
+        self.assertIs(get_recognizer('google'), get_recognizer('google'))
+        with self.assertRaises(RecognitionError):
+            get_recognizer('carrier-pigeon')
+
+    def test_model_pool_reuses_instances_up_to_its_size(self):
+        pool = ModelPool(object, size=2)
+
+        with pool.acquire() as first, pool.acquire() as second:
+            self.assertIsNot(first, second)
+        with pool.acquire() as third:
+            self.assertIn(third, (first, second))
+
+        self.assertEqual(pool.created, 2)
+
+    @override_settings(TRANSCRIPTION_JOB_WORKERS=4, TRANSCRIPTION_MODEL_POOL_SIZE=1, TRANSCRIPTION_MODEL_THREADS=None)
+    def test_whisper_shares_the_cores_between_job_processes(self):
+        with mock.patch('ai_services.jobs.os.cpu_count', return_value=8):
+            options = jobs.recognizer_options('whisper')
+
+        self.assertEqual(options['pool_size'], 1)
+        self.assertEqual(options['num_threads'], 2)
+
+
+class EchoDurationRecognizer(RecognizerBackend):
+    """Test backend that "transcribes" a payload as its length in seconds"""
+
+    def recognize(self, audio_data, language):
+        return f"{len(audio_data.frame_data) / 2 / audio_data.sample_rate:.1f}s"
+
+
+class StreamingTranscriptionTest(TransactionTestCase):
+    # Handshakes authenticate from another thread, outside the test transaction
+    def setUp(self):
+        # 1s silence, 1s tone, 1s silence, 5s tone, 2s silence
+        rng = np.random.default_rng(0)
+        tone = lambda seconds: (np.sin(np.arange(int(seconds * 16000)) * 0.1) * 8000).astype(np.int16)
+        silence = lambda seconds: rng.normal(0, 20, int(seconds * 16000)).astype(np.int16)
+        self.samples = np.concatenate([silence(1), tone(1), silence(1), tone(5), silence(2)])
+
+    def _pieces(self, odd_sizes=False):
+        # Network-sized messages of irregular length
+        data = self.samples.tobytes()
+        rng = np.random.default_rng(1)
+        offset = 0
+        while offset < len(data):
+            size = int(rng.integers(50, 3000)) * 2 + (odd_sizes and offset % 4 == 0)
+            yield data[offset:offset + size]
+            offset += size
+
+    def test_detector_emits_partials_and_finals_incrementally(self):
+        detector = StreamingVoiceDetector(16000, partial_interval_seconds=2.0)
+        events = []
+        for piece in self._pieces():
+            events.extend(detector.feed(np.frombuffer(piece, dtype='<i2')))
+        events.extend(detector.flush())
+
+        finals = [(start, end) for kind, start, end, _ in events if kind == 'final']
+        self.assertEqual(len(finals), 2)
+        self.assertAlmostEqual(finals[0][0], 1.0, delta=0.2)
+        self.assertAlmostEqual(finals[0][1], 2.0, delta=0.2)
+        self.assertAlmostEqual(finals[1][0], 3.0, delta=0.2)
+        self.assertAlmostEqual(finals[1][1], 8.0, delta=0.2)
+        self.assertTrue(any(kind == 'partial' for kind, _, _, _ in events))
+
+    def test_segments_are_cut_at_the_maximum_length(self):
+        detector = StreamingVoiceDetector(16000, max_segment_seconds=2.0)
+        events = detector.feed(self.samples) + detector.flush()
+
+        for kind, start, end, samples in events:
+            self.assertLessEqual(end - start, 2.0 + 1e-6)
+            self.assertEqual(len(samples), round((end - start) * 16000))
+
+    def test_stream_sends_final_events_in_order(self):
+        sent = []
+
+        async def send_event(event):
+            sent.append(event)
+
+        async def run():
+            stream = TranscriptionStream(send_event, EchoDurationRecognizer(), 'en-US')
+            # Some messages end in the middle of a sample
+            for piece in self._pieces(odd_sizes=True):
+                await stream.feed(piece)
+            await stream.finish()
+
+        asyncio.run(run())
+
+        finals = [event for event in sent if event['type'] == 'final']
+        self.assertEqual([event['start'] for event in finals], sorted(event['start'] for event in finals))
+        self.assertEqual(len(finals), 2)
+        self.assertEqual(finals[1]['text'], f"{finals[1]['end'] - finals[1]['start']:.1f}s")
+
+    def test_closing_the_stream_cancels_every_recognition_in_flight(self):
+        release = threading.Event()
+        sent = []
+
+        class Blocking(RecognizerBackend):
+            def recognize(self, audio_data, language):
+                release.wait(5)
+                return 'late'
+
+        async def send_event(event):
+            sent.append(event)
+
+        async def run():
+            detector = StreamingVoiceDetector(16000, partial_interval_seconds=60.0)
+            stream = TranscriptionStream(send_event, Blocking(), 'en-US', detector=detector)
+            await stream.feed(self.samples.tobytes())
+            for event in detector.flush():
+                await stream._dispatch(*event)
+            in_flight = list(stream._pending)
+
+            await stream.cancel()
+            # asyncio.run() would cancel leftover tasks itself, so look now
+            return len(in_flight), [task.cancelled() for task in in_flight]
+
+        try:
+            in_flight, cancelled = asyncio.run(run())
+        finally:
+            release.set()
+
+        # Both final segments were waiting on the recognizer, not just the last
+        self.assertEqual(in_flight, 2)
+        self.assertEqual(cancelled, [True, True])
+        self.assertEqual(sent, [])
+
+    def _connect(self, application, path, headers=()):
+        """Run one WebSocket handshake and return the messages sent back"""
+        async def run():
+            incoming = asyncio.Queue()
+            await incoming.put({'type': 'websocket.connect'})
+            await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+            outgoing = []
+
+            async def send(message):
+                outgoing.append(message)
+
+            scope = {'type': 'websocket', 'path': path, 'query_string': b'', 'headers': list(headers)}
+            await application(scope, incoming.get, send)
+            return outgoing
+
+        return asyncio.run(run())
+
+    def test_websocket_requires_authentication(self):
+        application = get_streaming_application(None, {'/stream/': transcription_stream})
+
+        self.assertEqual(self._connect(application, '/stream/'),
+                         [{'type': 'websocket.close', 'code': 4401}])
+        self.assertEqual(self._connect(application, '/elsewhere/'),
+                         [{'type': 'websocket.close', 'code': 4404}])
+
+    def test_websocket_accepts_basic_auth(self):
+        User.objects.create_user(username='streamer', password='testpass123')
+        application = get_streaming_application(None, {'/stream/': transcription_stream})
+        credentials = base64.b64encode(b'streamer:testpass123')
+
+        messages = self._connect(application, '/stream/', [(b'authorization', b'Basic ' + credentials)])
+        self.assertEqual(messages, [{'type': 'websocket.accept'}])
+
+    def test_websocket_refuses_other_origins(self):
+        User.objects.create_user(username='streamer', password='testpass123')
+        application = get_streaming_application(None, {'/stream/': transcription_stream})
+        authorization = (b'authorization', b'Basic ' + base64.b64encode(b'streamer:testpass123'))
+
+        for origin in (b'https://attacker.example', b'null'):
+            self.assertEqual(self._connect(application, '/stream/', [authorization, (b'origin', origin)]),
+                             [{'type': 'websocket.close', 'code': 4403}])
+        self.assertEqual(self._connect(application, '/stream/', [authorization, (b'origin', b'http://localhost:8000')]),
+                         [{'type': 'websocket.accept'}])
+
+
+class IDFIndexTest(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'idf_index.npz')
+
+    def test_rare_terms_outrank_common_ones(self):
+        index = IDFIndex.build([{'data', 'learning'}, {'data', 'cooking'}, {'data', 'travel'}])
+
+        # Same term frequency: the term fewer posts use ranks higher, and a
+        # term no post uses ranks highest
+        ranking = index.rank_terms(['data', 'learning', 'data', 'learning', 'quantum', 'quantum'])
+        self.assertEqual(ranking, ['quantum', 'learning', 'data'])
+
+        index.save(self.path)
+        loaded = get_idf_index(self.path)
+        self.assertEqual(loaded.idf.dtype, np.float32)
+        np.testing.assert_allclose(loaded.weights(['data', 'learning']), index.weights(['data', 'learning']))
+
+    def test_index_follows_blog_post_changes(self):
+        author = User.objects.create_user(username='writer', password='testpass123')
+
+        with override_settings(TITLE_IDF_INDEX_PATH=self.path, TITLE_IDF_WRITE_DELAY=0,
+                               TITLE_PRECOMPUTE=False), simple_tokenizers():
+            with self.captureOnCommitCallbacks(execute=True):
+                post = BlogPost.objects.create(title='One', content='Python data tips.', author=author)
+                BlogPost.objects.create(title='Two', content='Cooking with data.', author=author)
+
+            def frequencies():
+                index = get_idf_index(self.path)
+                return index.num_documents, dict(zip(index.vocabulary, index.document_frequencies.tolist()))
+
+            self.assertEqual(frequencies(), (2, {'cooking': 1, 'data': 2, 'python': 1, 'tips': 1, 'with': 1}))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                post.content = 'Python testing tips.'
+                post.save()
+            self.assertEqual(frequencies(), (2, {'cooking': 1, 'data': 1, 'python': 1, 'testing': 1, 'tips': 1, 'with': 1}))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                post.delete()
+            self.assertEqual(frequencies(), (1, {'cooking': 1, 'data': 1, 'with': 1}))
+
+            # Topics of a new post are ranked against the corpus
+            service = BlogTitleSuggestionService(idf_index_path=self.path)
+            self.assertEqual(service._extract_key_topics('Data and jazz. Data and jazz.', 1), ['jazz'])
+
+    def test_changes_within_the_delay_are_written_together(self):
+        with mock.patch.object(IDFIndex, 'save', autospec=True, side_effect=IDFIndex.save) as save:
+            update_idf_index(self.path, added={'python', 'data'}, delay=60)
+            update_idf_index(self.path, added={'data', 'jazz'}, delay=60)
+            update_idf_index(self.path, added={'jazz'}, removed={'python', 'data'}, delay=60)
+            self.assertFalse(os.path.exists(self.path))
+
+            flush_idf_updates()
+
+        self.assertEqual(save.call_count, 1)
+        index = get_idf_index(self.path)
+        self.assertEqual(index.num_documents, 2)
+        self.assertEqual(dict(zip(index.vocabulary, index.document_frequencies.tolist())), {'data': 1, 'jazz': 2})
+
+    def test_unseen_terms_get_the_highest_weight(self):
+        index = IDFIndex.build([{'data'}, {'data', 'python'}])
+
+        weights = index.weights(['python', 'quantum', 'data'])
+
+        self.assertEqual(weights[1], index.unseen_idf)
+        self.assertGreater(weights[1], weights[0])
+        self.assertGreater(weights[0], weights[2])
+        self.assertEqual(IDFIndex().weights(['anything']).tolist(), [IDFIndex().unseen_idf])
+
+
+class SummarizerTest(TestCase):
+    def test_central_sentences_are_picked_within_the_budget(self):
+        content = ' '.join(
+            ['Python data pipelines need testing.']
+            + [f'Testing python pipelines step {i} keeps data correct.' for i in range(300)]
+            + ['My cat enjoys sunny afternoons.', 'Reliable python data pipelines ship faster.']
+        )
+        with simple_tokenizers():
+            document = AnalyzedDocument(content)
+            summary = summarize(document, IDFIndex(), max_sentences=3, token_budget=20)
+
+        self.assertLessEqual(sum(len(sentence.split()) for sentence in summary), 20)
+        self.assertNotIn('My cat enjoys sunny afternoons.', summary)
+        # Document order is kept
+        positions = [document.sentences.index(sentence) for sentence in summary]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_sentence_longer_than_the_budget_is_cut(self):
+        with simple_tokenizers():
+            document = AnalyzedDocument('One very long opening sentence about python data pipelines.')
+            self.assertEqual(
+                summarize(document, IDFIndex(), token_budget=4), ['One very long opening']
+            )
+
+    def test_budget_counts_words_like_the_cut(self):
+        # Nine words, ten tokens with the final period: fits a nine-word budget whole
+        with simple_tokenizers():
+            document = AnalyzedDocument('One very long opening sentence about python data pipelines.')
+            self.assertEqual(
+                summarize(document, IDFIndex(), token_budget=9),
+                ['One very long opening sentence about python data pipelines.']
+            )
+
+
+class BatchTitleSuggestionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.contents = [
+            'Python data tips. Data pipelines in Python.',
+            'Cooking with data. Recipes of the week.',
+            'Jazz history. Jazz and blues records.',
+        ]
+
+    def test_batch_matches_single_document_results(self):
+        index = IDFIndex.build([{'data', 'python'}, {'data', 'cooking'}])
+        service = BlogTitleSuggestionService()
+
+        with simple_tokenizers(), mock.patch.object(BlogTitleSuggestionService, 'idf_index', index):
+            batch = list(service.generate_title_suggestions_batch(self.contents, 2, batch_size=2))
+            single = [service.generate_title_suggestions(content, 2) for content in self.contents]
+
+        self.assertEqual(batch, single)
+        self.assertEqual(
+            index.rank_terms_batch([['jazz', 'data', 'jazz'], [], ['python']]),
+            [index.rank_terms(['jazz', 'data', 'jazz']), [], ['python']]
+        )
+
+    def test_batch_endpoint_streams_json_lines_in_order(self):
+        documents = [{'id': 'a', 'content': self.contents[0]}, self.contents[1], {'id': 7, 'content': self.contents[2]}]
+
+        with simple_tokenizers():
+            response = self.client.post(
+                '/api/suggest-titles/batch/', {'documents': documents, 'num_suggestions': 2}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual([line['index'] for line in lines], [0, 1, 2])
+        self.assertEqual([line.get('id') for line in lines], ['a', None, 7])
+        self.assertTrue(all(len(line['suggestions']) == 2 for line in lines))
+
+    def test_batch_endpoint_validates_documents(self):
+        for payload in ({}, {'documents': []}, {'documents': [{'id': 1}]}):
+            response = self.client.post('/api/suggest-titles/batch/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the chat completions API
+
+    ``plan`` lists what to do for successive requests: ``'ok'``, an HTTP
+    status code to fail with, a number of seconds to stall for, or a
+    ``threading.Event`` or ``threading.Barrier`` to wait on before answering
+    (a broken barrier answers 503). Streamed completions send one line per
+    chunk, ``line_delay`` seconds apart; with a ``line_gate`` semaphore, each
+    line after the first also waits for the client to release the gate, and
+    lines sent without it are counted in ``stalled_lines``.
+    """
+
+    def __init__(self, plan=(), titles=('First Title', 'Second Title', 'Third Title'), line_delay=0.0,
+                 line_gate=None):
+        self.plan = list(plan)
+        self.requests = 0
+        self.connections = set()
+        self.stalled_lines = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def stream(self, lines):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for position, line in enumerate(lines):
+                    if position:
+                        time.sleep(line_delay)
+                        if line_gate is not None and not line_gate.acquire(timeout=5):
+                            server.stalled_lines += 1
+                    chunk = {
+                        'id': 'chatcmpl-test', 'object': 'chat.completion.chunk', 'created': 0,
+                        'model': 'gpt-3.5-turbo',
+                        'choices': [{'index': 0, 'finish_reason': None, 'delta': {'content': line}}],
+                    }
+                    self.write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+                self.write_chunk(b'data: [DONE]\n\n')
+                self.write_chunk(b'')
+
+            def write_chunk(self, data):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                server.requests += 1
+                server.connections.add(self.client_address)
+                action = server.plan.pop(0) if server.plan else 'ok'
+
+                if isinstance(action, float):
+                    time.sleep(action)
+                    action = 'ok'
+                elif isinstance(action, (threading.Event, threading.Barrier)):
+                    try:
+                        action.wait(5)
+                        action = 'ok'
+                    except threading.BrokenBarrierError:
+                        action = 503
+                if action == 'ok' and request.get('stream'):
+                    try:
+                        self.stream([f'{i}. {title}\n' for i, title in enumerate(titles, 1)])
+                    except OSError:
+                        pass
+                    return
+                if action == 'ok':
+                    content = '\n'.join(f'{i}. {title}' for i, title in enumerate(titles, 1))
+                    code, body = 200, {
+                        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0,
+                        'model': 'gpt-3.5-turbo',
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': content}}],
+                    }
+                else:
+                    code, body = action, {'error': {'message': 'unavailable', 'type': 'server_error'}}
+
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except OSError:
+                    pass  # The client gave up waiting
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class OpenAIClientTest(TestCase):
+    content = 'Python data tips. Data pipelines in Python. Testing data code.'
+
+    def _service(self, server, **options):
+        return BlogTitleSuggestionService(
+            openai_api_key='test-key', openai_options=dict(base_url=server.base_url, **options)
+        )
+
+    def test_requests_reuse_pooled_connections(self):
+        with FakeOpenAIServer() as server, simple_tokenizers():
+            service = self._service(server)
+            # Different drafts, so the title cache doesn't answer
+            for topic in ('python', 'cooking', 'jazz'):
+                titles = service.generate_title_suggestions(f'{topic} basics. More {topic}. Why {topic} matters.', 2)
+                self.assertEqual(titles, ['First Title', 'Second Title'])
+
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(len(server.connections), 1)
+
+    def test_transient_errors_are_retried(self):
+        with FakeOpenAIServer(plan=[500, 503]) as server:
+            client = ChatCompletionClient('test-key', base_url=server.base_url, max_retries=2)
+            self.assertTrue(client.complete([{'role': 'user', 'content': 'hi'}]).startswith('1. First Title'))
+        self.assertEqual(server.requests, 3)
+
+    def test_slow_api_falls_back_within_the_latency_budget(self):
+        # The server only answers once the fallback has been returned
+        answered = threading.Event()
+        with FakeOpenAIServer(plan=[answered, answered]) as server, simple_tokenizers():
+            service = self._service(server, latency_budget=0.3, max_retries=1)
+            with mock.patch.object(service, '_generate_title_without_api', return_value=['Local Title']):
+                titles = service.generate_title_suggestions(self.content, 1)
+            answered.set()
+
+        self.assertEqual(titles, ['Local Title'])
+
+    def test_async_path_retries_and_respects_the_budget(self):
+        with FakeOpenAIServer(plan=[500]) as server, simple_tokenizers():
+            service = self._service(server)
+            titles = asyncio.run(service.agenerate_title_suggestions(self.content, 3))
+        self.assertEqual(titles, ['First Title', 'Second Title', 'Third Title'])
+
+        with FakeOpenAIServer(plan=[1.0]) as server:
+            client = ChatCompletionClient('test-key', base_url=server.base_url, latency_budget=0.2, max_retries=0)
+            with self.assertRaises(LatencyBudgetExceeded):
+                asyncio.run(client.acomplete([{'role': 'user', 'content': 'hi'}]))
+
+    def test_completion_stops_waiting_at_the_deadline(self):
+        release = threading.Event()
+        client = ChatCompletionClient('test-key', latency_budget=0.2, max_retries=0)
+
+        # A response trickling in never trips the SDK's per-read timeout
+        def trickling_create(**kwargs):
+            release.wait(5)
+            raise AssertionError("waited for the whole response")
+
+        with mock.patch.object(client._sync_client.chat.completions, 'create', side_effect=trickling_create):
+            with self.assertRaises(LatencyBudgetExceeded):
+                client.complete([{'role': 'user', 'content': 'hi'}])
+        self.assertFalse(release.is_set())
+        release.set()
+
+    def test_stream_stops_at_the_deadline(self):
+        # Every line arrives well within the per-read timeout, but not all of them within the budget
+        with FakeOpenAIServer(titles=[f'Title {i}' for i in range(1, 11)], line_delay=0.1) as server:
+            client = ChatCompletionClient('test-key', base_url=server.base_url, latency_budget=0.35, max_retries=0)
+            received = []
+            with self.assertRaises(LatencyBudgetExceeded):
+                for piece in client.stream([{'role': 'user', 'content': 'hi'}]):
+                    received.append(piece)
+
+        self.assertTrue(received)
+        self.assertLess(len(received), 10)
+
+    def test_titles_are_parsed_from_arbitrary_pieces(self):
+        parser = TitleListParser(3)
+        self.assertEqual(parser.feed('Sure:\n1. Fir'), [])
+        self.assertEqual(parser.feed('st Title\n2'), ['First Title'])
+        self.assertEqual(parser.feed('. Second Title'), [])
+        self.assertEqual(parser.close(), ['Second Title', 'Suggested Title #3'])
+
+    def test_streamed_titles_arrive_one_line_at_a_time(self):
+        # The server sends each line only after the previous title came out of the stream
+        titles_read = threading.Semaphore(0)
+        with FakeOpenAIServer(line_gate=titles_read) as server, simple_tokenizers():
+            service = self._service(server)
+            titles = []
+            for title in service.stream_title_suggestions(self.content, 3):
+                titles.append(title)
+                titles_read.release()
+            # The complete list is cached for the non-streaming endpoint
+            self.assertEqual(service.generate_title_suggestions(self.content, 3)[0], 'First Title')
+
+        self.assertEqual(titles, ['First Title', 'Second Title', 'Third Title'])
+        self.assertEqual(server.stalled_lines, 0)
+        self.assertEqual(server.requests, 1)
+
+    def test_stream_endpoint_sends_server_sent_events(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('writer', password='secret'))
+
+        with FakeOpenAIServer(plan=[500, 500, 500]) as server, simple_tokenizers(), \
+                mock.patch('ai_services.views.get_title_service', return_value=self._service(server)):
+            with mock.patch.object(BlogTitleSuggestionService, '_generate_title_without_api',
+                                   return_value=['Local One', 'Local Two']):
+                response = client.post('/api/suggest-titles/stream/', {
+                    'content': self.content, 'num_suggestions': 2,
+                }, format='json', HTTP_ACCEPT='text/event-stream')
+                body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+        self.assertEqual([event for event, _ in events], ['event: title', 'event: title', 'event: done'])
+        self.assertEqual(json.loads(events[1][1][len('data: '):]), {'index': 1, 'title': 'Local Two'})
+
+        response = client.post('/api/suggest-titles/stream/', {}, format='json', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.content.startswith(b'event: error'))
+
+    def test_token_bucket_limits_the_request_rate(self):
+        bucket = TokenBucket(rate=20, capacity=2)
+
+        self.assertTrue(bucket.acquire(0))
+        self.assertTrue(bucket.acquire(0))
+        self.assertFalse(bucket.acquire(0))  # Burst used up; no waiting allowed
+
+        started = time.monotonic()
+        self.assertTrue(bucket.acquire(1.0))
+        self.assertAlmostEqual(time.monotonic() - started, 0.05, delta=0.04)
+
+
+class TitleCacheTest(TestCase):
+    draft = ' '.join(
+        f'Section {i} covers python data pipelines, testing strategies and deployment topic{i}.'
+        for i in range(40)
+    )
+
+    def test_repeated_and_near_identical_drafts_skip_the_api(self):
+        service = BlogTitleSuggestionService(openai_api_key='test-key')
+        edited = self.draft.replace('topic7.', 'topic7 today.')
+
+        with simple_tokenizers(), mock.patch.object(
+            service, '_generate_title_with_openai', return_value=['Cached Title']
+        ) as generate:
+            self.assertEqual(service.generate_title_suggestions(self.draft, 1), ['Cached Title'])
+            self.assertEqual(service.generate_title_suggestions(self.draft, 1), ['Cached Title'])
+            self.assertEqual(service.generate_title_suggestions(edited, 1), ['Cached Title'])
+            service.generate_title_suggestions('Something else entirely. About cooking.', 1)
+
+        self.assertEqual(generate.call_count, 2)
+        stats = service.cache.stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['exact_hits'] + stats['near_hits'], 2)
+
+    def test_lru_eviction_ttl_and_distance(self):
+        cache = TitleCache(max_entries=2, ttl=60, max_distance=3)
+        cache.set('a', 0b1111, 3, ['A'])
+        cache.set('b', 0xFFFF << 48, 3, ['B'])
+        self.assertEqual(cache.get('a', 0b1111, 3), ['A'])
+        cache.set('c', 0xFFFF << 32, 3, ['C'])  # Evicts 'b', the least recently used
+
+        self.assertIsNone(cache.get('b', 0xFFFF << 48, 3))
+        self.assertEqual(cache.get('other', 0b0111, 3), ['A'])  # One bit away
+        self.assertIsNone(cache.get('other', 0b0111, 5))  # Different num_suggestions
+        self.assertIsNone(cache.get('other', 0b1111 ^ (0b1111 << 30), 3))  # Four bits away
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a', 0b1111, 3))
+        self.assertEqual(simhash(['data', 'python']), simhash(['python', 'data']))
+
+    def test_stats_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('writer', password='secret'))
+        self.assertEqual(client.get('/api/suggest-titles/cache/').status_code, status.HTTP_403_FORBIDDEN)
+
+        client.force_authenticate(User.objects.create_superuser('admin', password='secret'))
+        response = client.get('/api/suggest-titles/cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', response.json())
+
+
+@override_settings(TITLE_PRECOMPUTE_EAGER=True, TITLE_PRECOMPUTE_SUGGESTIONS=3)
+class TitlePrecomputeTest(TestCase):
+    content = 'Python data pipelines. Testing data pipelines in Python. Deploying pipelines.'
+
+    def setUp(self):
+        self.author = User.objects.create_user('writer', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+
+    def test_saving_a_post_stores_its_titles(self):
+        with simple_tokenizers(), self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='Draft', content=self.content, author=self.author)
+
+        stored = PostTitleSuggestions.objects.get(post=post)
+        self.assertEqual(stored.num_suggestions, 3)
+        self.assertEqual(len(stored.titles), 3)
+        self.assertIn('pipelines', stored.topics)
+
+        # Saving without a content change doesn't recompute
+        with mock.patch('ai_services.signals.schedule_title_precompute') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.title = 'Renamed'
+                post.save()
+        schedule.assert_not_called()
+
+    def test_endpoint_serves_stored_titles_until_the_content_changes(self):
+        with simple_tokenizers(), self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='Draft', content=self.content, author=self.author)
+        stored = PostTitleSuggestions.objects.get(post=post).titles
+
+        with mock.patch('ai_services.views.get_title_service') as get_service:
+            response = self.client.post('/api/suggest-titles/', {
+                'content': self.content + '\r\n', 'num_suggestions': 2, 'post_id': post.pk,
+            }, format='json')
+        self.assertEqual(response.json()['suggestions'], stored[:2])
+        get_service.assert_not_called()
+
+        with simple_tokenizers(), mock.patch('ai_services.views.get_title_service') as get_service:
+            get_service.return_value.generate_title_suggestions.return_value = ['Fresh Title']
+            response = self.client.post('/api/suggest-titles/', {
+                'content': self.content + ' Monitoring.', 'num_suggestions': 1,
+            }, format='json')
+        self.assertEqual(response.json()['suggestions'], ['Fresh Title'])
+
+    def test_invalid_counts_are_rejected_on_both_paths(self):
+        with simple_tokenizers(), self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Draft', content=self.content, author=self.author)
+
+        with mock.patch('ai_services.views.get_title_service') as get_service:
+            # Stored titles match the first content; nothing matches the second
+            for content in (self.content, 'Unrelated draft about cooking.'):
+                for data in ({'num_suggestions': 'three'}, {'num_suggestions': 0},
+                             {'num_suggestions': 11}, {'num_suggestions': True}, {'post_id': 'first'}):
+                    response = self.client.post('/api/suggest-titles/', {'content': content, **data}, format='json')
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+                    self.assertIn('error', response.json())
+            get_service.assert_not_called()
+
+            # Form data sends numbers as strings
+            response = self.client.post('/api/suggest-titles/', {'content': self.content, 'num_suggestions': '2'})
+        self.assertEqual(len(response.json()['suggestions']), 2)
+
+    @override_settings(TITLE_PRECOMPUTE_EAGER=False)
+    def test_saving_only_queues_the_work(self):
+        with mock.patch('ai_services.titles.get_precompute_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = BlogPost.objects.create(title='Draft', content=self.content, author=self.author)
+
+        get_executor.return_value.submit.assert_called_once_with(mock.ANY, post.pk)
+        self.assertFalse(PostTitleSuggestions.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncViewTest(TransactionTestCase):
+    content = 'Python data tips. Data pipelines in Python. Testing data code.'
+
+    def setUp(self):
+        User.objects.create_user('writer', password='secret')
+        credentials = base64.b64encode(b'writer:secret').decode()
+        self.headers = {'Authorization': f'Basic {credentials}'}
+        self.factory = AsyncRequestFactory()
+
+    async def test_title_requests_wait_on_openai_concurrently(self):
+        # No completion is answered until all twenty requests are waiting on the server
+        all_waiting = threading.Barrier(20)
+        with FakeOpenAIServer(plan=[all_waiting] * 20) as server, simple_tokenizers():
+            service = BlogTitleSuggestionService(
+                openai_api_key='test-key', openai_options={'base_url': server.base_url}
+            )
+            with mock.patch('ai_services.async_views.get_title_service', return_value=service):
+                responses = await asyncio.gather(*(
+                    async_views.suggest_blog_titles(self.factory.post(
+                        '/api/suggest-titles/',
+                        {'content': f'{self.content} Draft {i}.', 'num_suggestions': 2},
+                        content_type='application/json', headers=self.headers
+                    ))
+                    for i in range(20)
+                ))
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        # Requests sent one after another would break the barrier and fall back
+        self.assertEqual(
+            [json.loads(response.content)['suggestions'] for response in responses],
+            [['First Title', 'Second Title']] * 20
+        )
+        self.assertFalse(all_waiting.broken)
+
+    async def test_authentication_and_validation_match_the_sync_views(self):
+        anonymous = AsyncRequestFactory().post('/api/suggest-titles/', {}, content_type='application/json')
+        self.assertEqual((await async_views.suggest_blog_titles(anonymous)).status_code, 403)
+
+        response = await async_views.transcribe_audio(
+            self.factory.post('/api/transcribe/', {}, headers=self.headers)
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_permissions_and_throttles_are_enforced(self):
+        class DenyAll(BasePermission):
+            def has_permission(self, request, view):
+                return False
+
+        class OncePerMinute(UserRateThrottle):
+            rate = '1/min'
+
+        @async_views.async_api_view(permission_classes=[DenyAll])
+        async def forbidden(request):
+            return Response({})
+
+        @async_views.async_api_view(throttle_classes=[OncePerMinute])
+        async def throttled(request):
+            return Response({})
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        request = lambda: self.factory.post('/', {}, content_type='application/json', headers=self.headers)
+
+        self.assertEqual((await forbidden(request())).status_code, 403)
+        self.assertEqual((await throttled(request())).status_code, 200)
+        response = await throttled(request())
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    async def test_requests_are_checked_and_parsed_in_parallel(self):
+        both_checked = threading.Barrier(2, timeout=5)
+
+        class WaitsForTheOther(BasePermission):
+            def has_permission(self, request, view):
+                request.data
+                # Checks queued on one shared thread would break the barrier
+                both_checked.wait()
+                return True
+
+        @async_views.async_api_view(permission_classes=[WaitsForTheOther])
+        async def echo(request):
+            return Response(request.data)
+
+        responses = await asyncio.gather(*(
+            echo(self.factory.post('/', {'draft': i}, content_type='application/json', headers=self.headers))
+            for i in range(2)
+        ))
+
+        self.assertEqual([json.loads(response.content) for response in responses], [{'draft': 0}, {'draft': 1}])
+        self.assertFalse(both_checked.broken)
+
+    async def test_responses_match_the_sync_views(self):
+        request = lambda: self.factory.post(
+            '/api/suggest-titles/', {'num_suggestions': 2}, content_type='application/json', headers=self.headers
+        )
+        sync_response = (await sync_to_async(views.suggest_blog_titles)(request())).render()
+        async_response = await async_views.suggest_blog_titles(request())
+
+        self.assertIsInstance(async_response, Response)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response['Content-Type'], sync_response['Content-Type'])
+        self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_upload_is_queued(self):
+        audio = io.BytesIO()
+        write_test_wav(audio, 0.5)
+        upload = SimpleUploadedFile('tone.wav', audio.getvalue(), content_type='audio/wav')
+
+        response = await async_views.transcribe_audio(
+            self.factory.post(
+                '/api/transcribe/', {'audio_file': upload, 'diarize': 'false'}, headers=self.headers
+            )
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.content)['job_id']
+        self.assertEqual(json.loads(response.content)['status'], 'pending')
+        # Queued for the worker with its audio
+        job = await TranscriptionJob.objects.aget(id=job_id)
+        self.assertEqual(bytes(job.audio), audio.getvalue())
+
+
+def reload_ai_urls():
+    """Route the AI endpoints according to the current AI_ASYNC_VIEWS"""
+    importlib.reload(ai_urls)
+    # The project URLconf keeps the resolver of the included patterns
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(AI_ASYNC_VIEWS=True, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncURLTest(TransactionTestCase):
+    content = 'Python data tips. Data pipelines in Python. Testing data code.'
+
+    @classmethod
+    def setUpClass(cls):
+        # Class cleanups run last, once the settings override is undone
+        cls.addClassCleanup(reload_ai_urls)
+        super().setUpClass()
+        reload_ai_urls()
+
+    def setUp(self):
+        User.objects.create_user('writer', password='secret')
+        credentials = base64.b64encode(b'writer:secret').decode()
+        self.headers = {'Authorization': f'Basic {credentials}'}
+
+    def test_ai_endpoints_route_to_the_async_views(self):
+        self.assertIs(resolve('/api/transcribe/').func, async_views.transcribe_audio)
+        self.assertIs(resolve('/api/suggest-titles/').func, async_views.suggest_blog_titles)
+
+    async def test_title_suggestions(self):
+        with simple_tokenizers():
+            response = await self.async_client.post(
+                '/api/suggest-titles/', {'content': self.content, 'num_suggestions': 2},
+                content_type='application/json', headers=self.headers
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['suggestions']), 2)
+
+    async def test_requests_are_checked_like_the_sync_views(self):
+        anonymous = await self.async_client.post(
+            '/api/suggest-titles/', {'content': self.content}, content_type='application/json'
+        )
+        self.assertEqual(anonymous.status_code, 403)
+
+        wrong_method = await self.async_client.get('/api/transcribe/', headers=self.headers)
+        self.assertEqual(wrong_method.status_code, 405)
+
+        missing_file = await self.async_client.post('/api/transcribe/', {}, headers=self.headers)
+        self.assertEqual(missing_file.status_code, 400)
+
+    async def test_upload_is_queued(self):
+        audio = io.BytesIO()
+        write_test_wav(audio, 0.5)
+        upload = SimpleUploadedFile('tone.wav', audio.getvalue(), content_type='audio/wav')
+
+        response = await self.async_client.post(
+            '/api/transcribe/', {'audio_file': upload, 'diarize': 'false'}, headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job = await TranscriptionJob.objects.aget(id=response.json()['job_id'])
+        self.assertEqual(job.status, TranscriptionJob.STATUS_PENDING)
+
+
+class MetricsTest(TestCase):
+    def test_render_text_exposition_format(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Requests', ('path',))
+        latency = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+
+        requests.inc(path='/a "b"')
+        requests.inc(2, path='/a "b"')
+        latency.observe(0.05, stage='decode')
+        latency.observe(0.5, stage='decode')
+        latency.observe(5.0, stage='decode')
+
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{path="/a \\"b\\""} 3', lines)
+        self.assertIn('# TYPE latency_seconds histogram', lines)
+        # Buckets are cumulative and end with +Inf
+        self.assertIn('latency_seconds_bucket{stage="decode",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{stage="decode",le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{stage="decode",le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_sum{stage="decode"} 5.55', lines)
+        self.assertIn('latency_seconds_count{stage="decode"} 3', lines)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = Registry(enabled=False)
+        latency = registry.histogram('latency_seconds', 'Latency')
+
+        with latency.time():
+            pass
+
+        self.assertEqual(latency.count(), 0)
+
+    def test_processes_sharing_a_directory_report_together(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registries = [Registry(), Registry()]
+            for registry in registries:
+                registry.configure(directory=directory, flush_interval=3600)
+                self.addCleanup(registry.configure, directory=None)
+                registry.counter('jobs_total', 'Jobs').inc()
+
+            # The second process hasn't written its totals yet
+            registries[0].flush()
+            self.assertIn('jobs_total 2', registries[1].render().splitlines())
+            self.assertIn('jobs_total 1', registries[0].render().splitlines())
+
+    def test_exited_processes_drop_out_of_the_totals(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registries = [Registry(), Registry(), Registry()]
+            for registry in registries:
+                registry.configure(directory=directory, flush_interval=60)
+                self.addCleanup(registry.configure, directory=None)
+                registry.counter('jobs_total', 'Jobs').inc()
+                registry.flush()
+            self.assertIn('jobs_total 3', registries[0].render().splitlines())
+
+            # One process exits cleanly, another is killed and stops writing
+            registries[1]._remove_own_file()
+            killed_file = registries[2]._own_file()
+            os.utime(killed_file, (time.time() - 600, time.time() - 600))
+
+            self.assertIn('jobs_total 1', registries[0].render().splitlines())
+            self.assertFalse(os.path.exists(killed_file))
+
+    def test_stage_records_one_observation_even_when_it_raises(self):
+        before = STAGE_SECONDS.count(pipeline='test', stage='noop', backend='x')
+
+        with stage('test', 'noop', backend='x'):
+            pass
+        with self.assertRaises(ValueError), stage('test', 'noop', backend='x'):
+            raise ValueError
+
+        self.assertEqual(STAGE_SECONDS.count(pipeline='test', stage='noop', backend='x'), before + 2)
+        self.assertEqual(STAGE_SECONDS.count(pipeline='test', stage='noop'), 0)
+
+    def test_title_pipeline_records_stages_and_fallbacks(self):
+        service = BlogTitleSuggestionService(openai_api_key='test-key')
+        tokenized = STAGE_SECONDS.count(pipeline='title', stage='tokenize')
+        local = STAGE_SECONDS.count(pipeline='title', stage='generate', backend='local')
+        fallbacks = FALLBACKS.value(pipeline='title', reason='openai_error')
+
+        with simple_tokenizers(), mock.patch.object(
+            service, '_generate_title_with_openai', side_effect=RuntimeError('down')
+        ):
+            service.generate_title_suggestions('Python data tips. Data pipelines in Python.', 2)
+
+        self.assertEqual(STAGE_SECONDS.count(pipeline='title', stage='tokenize'), tokenized + 1)
+        self.assertEqual(
+            STAGE_SECONDS.count(pipeline='title', stage='generate', backend='local'), local + 1
+        )
+        self.assertEqual(FALLBACKS.value(pipeline='title', reason='openai_error'), fallbacks + 1)
+
+    def test_result_cache_counts_hits_and_misses(self):
+        cache = ResultCache('metrics-test')
+
+        cache.get('key')
+        cache.set('key', {'text': 'hello'})
+        cache.get('key')
+
+        self.assertEqual(CACHE_REQUESTS.value(cache='metrics-test', result='miss'), 1)
+        self.assertEqual(CACHE_REQUESTS.value(cache='metrics-test', result='hit'), 1)
+
+    def test_metrics_endpoint(self):
+        with tempfile.NamedTemporaryFile(suffix='.wav') as temp_audio:
+            write_test_wav(temp_audio, seconds=0.5)
+            AudioTranscriptionService()._decode_audio(temp_audio.name)
+
+        self.client.force_login(User.objects.create_user('ops', password='pw', is_staff=True))
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(
+            'darwix_stage_duration_seconds_count{pipeline="transcription",stage="decode"}',
+            response.content.decode()
+        )
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint_requires_the_configured_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(
+            self.client.get('/metrics', headers={'Authorization': 'Bearer wrong-token'}).status_code, 401
+        )
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user('reader', password='pw'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
@@ -0,0 +1,133 @@
+"""
+Title suggestion service configured from the Django settings, and the
+background pipeline that precomputes titles when a blog post is saved.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import PostTitleSuggestions, content_digest
+from .services.metrics import CACHE_REQUESTS
+from .services.nlp_service import get_title_suggestion_service
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def openai_options():
+    """ChatCompletionClient options, taken from the settings"""
+    return {
+        'base_url': getattr(settings, 'OPENAI_BASE_URL', None),
+        'model': getattr(settings, 'TITLE_OPENAI_MODEL', 'gpt-3.5-turbo'),
+        'latency_budget': getattr(settings, 'TITLE_OPENAI_LATENCY_BUDGET', 4.0),
+        'max_retries': getattr(settings, 'TITLE_OPENAI_MAX_RETRIES', 2),
+        'requests_per_second': getattr(settings, 'TITLE_OPENAI_REQUESTS_PER_SECOND', 0),
+        'burst': getattr(settings, 'TITLE_OPENAI_BURST', 10),
+    }
+
+
+def cache_options():
+    """TitleCache options, taken from the settings"""
+    return {
+        'max_entries': getattr(settings, 'TITLE_CACHE_MAX_ENTRIES', 1024),
+        'ttl': getattr(settings, 'TITLE_CACHE_TTL', 3600),
+        'max_distance': getattr(settings, 'TITLE_CACHE_MAX_DISTANCE', 3),
+    }
+
+
+def get_title_service():
+    """Return the process-wide title suggestion service for the current settings"""
+    return get_title_suggestion_service(
+        openai_api_key=getattr(settings, 'OPENAI_API_KEY', ''),
+        idf_index_path=getattr(settings, 'TITLE_IDF_INDEX_PATH', None),
+        openai_options=openai_options(),
+        cache_options=cache_options(),
+        summary_token_budget=getattr(settings, 'TITLE_SUMMARY_TOKEN_BUDGET', 120)
+    )
+
+
+def get_precompute_executor():
+    """Return the thread pool precomputing titles in this process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TITLE_PRECOMPUTE_WORKERS', 2),
+                thread_name_prefix='title-precompute'
+            )
+        return _executor
+
+
+def precomputed_titles(content, num_suggestions, post_id=None):
+    """
+    Look up titles precomputed for this exact content
+
+    Args:
+        content: Blog post content sent by the client
+        num_suggestions: Number of titles wanted
+        post_id: Optional post the content belongs to
+
+    Returns:
+        list: The stored titles, or None when none match
+    """
+    records = PostTitleSuggestions.objects.filter(
+        content_hash=content_digest(content), num_suggestions__gte=num_suggestions
+    )
+    if post_id is not None:
+        records = records.filter(post_id=post_id)
+
+    titles = records.values_list('titles', flat=True).first()
+    CACHE_REQUESTS.inc(cache='title_precomputed', result='miss' if titles is None else 'hit')
+    return titles[:num_suggestions] if titles is not None else None
+
+
+def precompute_post_titles(post_id):
+    """Compute and store title suggestions for the current content of a post"""
+    from blog.models import BlogPost
+
+    close_old_connections()
+    try:
+        content = BlogPost.objects.filter(pk=post_id).values_list('content', flat=True).first()
+        if content is None:
+            return
+
+        content_hash = content_digest(content)
+        num_suggestions = getattr(settings, 'TITLE_PRECOMPUTE_SUGGESTIONS', 5)
+        if PostTitleSuggestions.objects.filter(post_id=post_id, content_hash=content_hash).exists():
+            return
+
+        service = get_title_service()
+        result = service.analyze_and_suggest(content, num_suggestions)
+
+        # Don't pin fallback titles when the API was meant to answer; the
+        # request path will try again
+        if result['source'] == 'placeholder' or (service.openai_api_key and result['source'] == 'local'):
+            return
+
+        PostTitleSuggestions.objects.update_or_create(
+            post_id=post_id,
+            defaults={
+                'content_hash': content_hash,
+                'num_suggestions': num_suggestions,
+                'titles': result['titles'],
+                'topics': result['topics'],
+                'key_sentences': result['key_sentences'],
+            }
+        )
+    except Exception as e:
+        logger.warning("Precomputing titles for post %s failed: %s", post_id, e)
+    finally:
+        close_old_connections()
+
+
+def schedule_title_precompute(post_id):
+    """Queue title precomputation for a post; the caller never waits for NLP"""
+    if getattr(settings, 'TITLE_PRECOMPUTE_EAGER', False):
+        precompute_post_titles(post_id)
+    else:
+        get_precompute_executor().submit(precompute_post_titles, post_id)
@@ -0,0 +1,123 @@
+"""
+Hand-off of uploaded audio to the transcription workers.
+
+Small uploads stay in memory and are passed to the worker as bytes. Large
+uploads are spooled by Django to a private temporary file, which the views
+decorated with ``spill_uploads`` place in ``TRANSCRIPTION_SPILL_DIR`` (tmpfs)
+while other uploads keep the default location; that file is hard-linked
+rather than copied so it outlives the request. Nothing is written to
+MEDIA_ROOT.
+"""
+import asyncio
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+
+from .services.metrics import record_payload, stage
+
+
+class SpilledUploadedFile(TemporaryUploadedFile):
+    """A ``TemporaryUploadedFile`` created in a given directory"""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None, spill_dir=None):
+        _, extension = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + extension, dir=spill_dir)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+
+
+class SpillFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream large uploads to a file in ``spill_dir`` instead of FILE_UPLOAD_TEMP_DIR"""
+
+    def __init__(self, request=None, spill_dir=None):
+        super().__init__(request)
+        self.spill_dir = spill_dir
+
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = SpilledUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            spill_dir=self.spill_dir
+        )
+
+
+def _use_spill_dir(request):
+    spill_dir = getattr(settings, 'TRANSCRIPTION_SPILL_DIR', None)
+    if spill_dir:
+        request.upload_handlers = [
+            SpillFileUploadHandler(request, spill_dir) if isinstance(handler, TemporaryFileUploadHandler)
+            else handler
+            for handler in request.upload_handlers
+        ]
+
+
+def spill_uploads(view):
+    """
+    Spool the large uploads of a view to ``TRANSCRIPTION_SPILL_DIR``
+
+    Applied outside the REST framework decorators, so the handlers are in
+    place before anything (such as the CSRF check) parses the body
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            _use_spill_dir(request)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _use_spill_dir(request)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class StagedUpload:
+    """An uploaded audio file, hashed once while its chunks are read"""
+
+    def __init__(self, audio_file, spill_dir=None):
+        self.audio_file = audio_file
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+        self.data = None
+
+        content_hash = hashlib.sha256()
+        with stage('transcription', 'upload'):
+            if hasattr(audio_file, 'temporary_file_path'):
+                # Already on disk: hash it in place
+                for chunk in audio_file.chunks():
+                    content_hash.update(chunk)
+            else:
+                chunks = []
+                for chunk in audio_file.chunks():
+                    content_hash.update(chunk)
+                    chunks.append(chunk)
+                self.data = b''.join(chunks)
+
+        self.content_hash = content_hash.hexdigest()
+        record_payload('audio_upload', audio_file.size)
+
+    def claim(self):
+        """
+        Take ownership of the audio for a background job
+
+        Returns:
+            bytes or str: The audio bytes, or the path of a private spill file
+            that the job must delete when it is done
+        """
+        if self.data is not None:
+            return self.data
+
+        extension = os.path.splitext(self.audio_file.name)[1]
+        spill_path = os.path.join(self.spill_dir, f'upload-{uuid.uuid4().hex}{extension}')
+        try:
+            os.link(self.audio_file.temporary_file_path(), spill_path)
+        except OSError:
+            # Different filesystem or no hard-link support
+            shutil.copyfile(self.audio_file.temporary_file_path(), spill_path)
+        return spill_path
@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under an ASGI worker the AI endpoints run as async views
+ai_views = async_views if getattr(settings, 'AI_ASYNC_VIEWS', False) else views
 
 app_name = 'ai_services'
 
 urlpatterns = [
-    path('transcribe/', views.transcribe_audio, name='transcribe_audio'),
-    path('suggest-titles/', views.suggest_blog_titles, name='suggest_blog_titles'),
+    path('transcribe/', ai_views.transcribe_audio, name='transcribe_audio'),
+    path('transcribe/<uuid:job_id>/', views.transcription_job, name='transcription_job'),
+    path('suggest-titles/', ai_views.suggest_blog_titles, name='suggest_blog_titles'),
+    path('suggest-titles/stream/', views.suggest_blog_titles_stream, name='suggest_blog_titles_stream'),
+    path('suggest-titles/batch/', views.suggest_blog_titles_batch, name='suggest_blog_titles_batch'),
+    path('suggest-titles/cache/', views.title_cache_stats, name='title_cache_stats'),
 ]
\ No newline at end of file
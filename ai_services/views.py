@@ -1,62 +1,191 @@
+import hmac
 import os
 import json
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 
-from .services.audio_service import AudioTranscriptionService
-from .services.nlp_service import BlogTitleSuggestionService
+from .cache import get_transcription_cache
+from .jobs import submit_transcription_job
+from .models import TranscriptionJob, result_cache_key
+from .uploads import StagedUpload, spill_uploads
+from .services.metrics import REGISTRY
+from .services.recognizers import RECOGNIZER_BACKENDS
+from .titles import get_title_service, precomputed_titles
 
 
+def _server_sent_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients that only accept ``text/event-stream`` receive errors as an event"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return _server_sent_event('error', data).encode('utf-8')
+
+
+def _parse_bool(value, default):
+    """Read a boolean flag sent as form data or JSON"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def transcription_options(data):
+    """
+    Validate the options of a transcription request
+
+    Returns:
+        tuple: (options dict, None) or (None, error message)
+    """
+    backend = data.get('backend', getattr(settings, 'TRANSCRIPTION_BACKEND', 'google'))
+    if backend not in RECOGNIZER_BACKENDS:
+        return None, f"Unknown backend '{backend}'. Choose one of: {', '.join(RECOGNIZER_BACKENDS)}"
+    
+    options = {
+        'mode': data.get('mode', 'single'),
+        'diarize': _parse_bool(
+            data.get('diarize'),
+            getattr(settings, 'TRANSCRIPTION_DIARIZE', True)
+        ),
+        'backend': backend,
+    }
+    
+    # Clients that know the language skip identification altogether
+    if data.get('language'):
+        options['language'] = data['language']
+    return options, None
+
+
+def _parse_positive_int(value):
+    """Read a positive integer sent as form data or JSON, or None if it isn't one"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    return value if isinstance(value, int) and value > 0 else None
+
+
+def title_options(data):
+    """
+    Validate the options of a title suggestion request
+
+    Checked before the precomputed titles are looked up, so a request is
+    accepted or rejected the same way whichever path answers it
+
+    Returns:
+        tuple: (options dict with num_suggestions and post_id, None) or
+        (None, error message)
+    """
+    max_suggestions = getattr(settings, 'TITLE_MAX_SUGGESTIONS', 10)
+    num_suggestions = _parse_positive_int(data.get('num_suggestions', 3))
+    if num_suggestions is None or num_suggestions > max_suggestions:
+        return None, f'num_suggestions must be an integer between 1 and {max_suggestions}'
+
+    post_id = data.get('post_id')
+    if post_id is not None:
+        post_id = _parse_positive_int(post_id)
+        if post_id is None:
+            return None, 'post_id must be a positive integer'
+
+    return {'num_suggestions': num_suggestions, 'post_id': post_id}, None
+
+
+def queue_transcription(user, options, upload):
+    """
+    Answer a staged upload from the cache, or queue a job for it
+
+    Returns:
+        tuple: (response data, HTTP status code)
+    """
+    try:
+        cached_result = get_transcription_cache().get(result_cache_key(upload.content_hash, options))
+        
+        if cached_result is not None:
+            # Same recording and options seen before: skip decoding entirely
+            job = TranscriptionJob.objects.create(
+                owner=user,
+                options=options,
+                content_hash=upload.content_hash,
+                status=TranscriptionJob.STATUS_COMPLETED,
+                progress=1.0,
+                result=cached_result
+            )
+            
+            data = job.to_dict()
+            data['cached'] = True
+            return data, status.HTTP_200_OK
+        
+        # Insert the job with its audio; the transcription worker claims it
+        job = submit_transcription_job(user, options, upload.content_hash, upload.claim())
+    
+    except Exception as e:
+        return {'error': f'Transcription failed: {str(e)}'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+    
+    job.refresh_from_db(fields=['status', 'progress', 'result', 'error'])
+    data = job.to_dict()
+    data['status_url'] = reverse('ai_services:transcription_job', args=[job.id])
+    return data, status.HTTP_202_ACCEPTED
+
+
+@spill_uploads
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def transcribe_audio(request):
     """
     API endpoint for audio transcription with speaker diarization
     
-    Accepts audio file uploads and returns transcription with speaker identification
+    Accepts audio file uploads and queues them for transcription. The response
+    carries a job id that can be polled for progress and the final result.
     """
     if 'audio_file' not in request.FILES:
         return Response({'error': 'No audio file provided'}, status=status.HTTP_400_BAD_REQUEST)
     
-    audio_file = request.FILES['audio_file']
-    
-    # Save the uploaded file temporarily
-    temp_path = os.path.join(settings.MEDIA_ROOT, 'temp_audio', audio_file.name)
-    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-    
-    with open(temp_path, 'wb+') as destination:
-        for chunk in audio_file.chunks():
-            destination.write(chunk)
+    options, error = transcription_options(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Create transcription service
-        transcription_service = AudioTranscriptionService(
-            huggingface_token=settings.HUGGINGFACE_API_KEY
+        # Hash the upload as it is read so identical recordings can be
+        # answered from the cache; nothing is written to MEDIA_ROOT
+        upload = StagedUpload(
+            request.FILES['audio_file'],
+            spill_dir=getattr(settings, 'TRANSCRIPTION_SPILL_DIR', None)
         )
-        
-        # Process the audio file
-        result = transcription_service.transcribe_audio(temp_path)
-        
-        # Clean up the temporary file
-        os.remove(temp_path)
-        
-        return Response(result, status=status.HTTP_200_OK)
-    
     except Exception as e:
-        # Clean up in case of error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
         return Response(
             {'error': f'Transcription failed: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    data, status_code = queue_transcription(request.user, options, upload)
+    return Response(data, status=status_code)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transcription_job(request, job_id):
+    """
+    API endpoint for polling a transcription job
+    
+    Returns the job status and progress, plus the result once it has completed
+    """
+    job = get_object_or_404(TranscriptionJob.objects.defer('audio'), id=job_id, owner=request.user)
+    return Response(job.to_dict(), status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -78,12 +207,20 @@ def suggest_blog_titles(request):
             )
         
         content = data['content']
-        num_suggestions = data.get('num_suggestions', 3)
+        options, error = title_options(data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        num_suggestions = options['num_suggestions']
         
-        # Create title suggestion service
-        suggestion_service = BlogTitleSuggestionService(
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+        # Titles stored when the post was saved answer without any NLP
+        stored = precomputed_titles(content, num_suggestions, post_id=options['post_id'])
+        if stored is not None:
+            return Response({
+                'suggestions': stored
+            }, status=status.HTTP_200_OK)
+        
+        # Title suggestion service shared by all requests of this process
+        suggestion_service = get_title_service()
         
         # Generate title suggestions
         suggestions = suggestion_service.generate_title_suggestions(
@@ -100,4 +237,145 @@ def suggest_blog_titles(request):
         return Response(
             {'error': f'Failed to generate title suggestions: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, EventStreamRenderer])
+def suggest_blog_titles_stream(request):
+    """
+    API endpoint streaming blog post title suggestions as server-sent events
+
+    Accepts the same data as ``suggest_blog_titles``. Each title is sent as a
+    ``title`` event as soon as it has been generated, followed by ``done``
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    content = data.get('content')
+
+    if not isinstance(content, str):
+        return Response(
+            {'error': 'Blog content is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    options, error = title_options(data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    num_suggestions = options['num_suggestions']
+
+    stored = precomputed_titles(content, num_suggestions, post_id=options['post_id'])
+    if stored is not None:
+        titles = iter(stored)
+    else:
+        titles = get_title_service().stream_title_suggestions(content, num_suggestions)
+
+    def events():
+        for index, title in enumerate(titles):
+            yield _server_sent_event('title', {'index': index, 'title': title})
+        yield _server_sent_event('done', {})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def suggest_blog_titles_batch(request):
+    """
+    API endpoint for generating title suggestions for many blog posts
+
+    Accepts a list of documents and streams back one JSON line per document,
+    in input order, as soon as its titles are ready
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    documents = data.get('documents')
+
+    if not isinstance(documents, list) or not documents:
+        return Response(
+            {'error': 'A non-empty list of documents is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    options, error = title_options(data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_documents = getattr(settings, 'TITLE_BATCH_MAX_DOCUMENTS', 10000)
+    if len(documents) > max_documents:
+        return Response(
+            {'error': f'At most {max_documents} documents can be sent in one batch'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Documents are either plain strings or objects with a content and an
+    # optional id that is echoed back
+    ids, contents = [], []
+    for document in documents:
+        if isinstance(document, dict):
+            document_id, content = document.get('id'), document.get('content')
+        else:
+            document_id, content = None, document
+        if not isinstance(content, str):
+            return Response(
+                {'error': 'Every document needs its content as a string'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids.append(document_id)
+        contents.append(content)
+
+    suggestion_service = get_title_service()
+    results = suggestion_service.generate_title_suggestions_batch(
+        contents,
+        num_suggestions=options['num_suggestions'],
+        max_concurrency=getattr(settings, 'TITLE_BATCH_CONCURRENCY', 8)
+    )
+
+    def json_lines():
+        for index, (document_id, suggestions) in enumerate(zip(ids, results)):
+            line = {'index': index, 'suggestions': suggestions}
+            if document_id is not None:
+                line['id'] = document_id
+            yield json.dumps(line) + '\n'
+
+    return StreamingHttpResponse(json_lines(), content_type='application/x-ndjson')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def title_cache_stats(request):
+    """
+    API endpoint reporting the title cache of this worker process
+
+    Returns hit and miss counters, evictions, size and hit rate
+    """
+    return Response(get_title_service().cache.stats(), status=status.HTTP_200_OK)
+
+
+@require_http_methods(['GET'])
+def metrics(request):
+    """
+    Prometheus scrape endpoint with the pipeline stage timings, cache and
+    fallback counters and payload sizes, in the text exposition format
+
+    Scrapers send ``METRICS_TOKEN`` as a bearer token; staff users signed in
+    to the admin may read it too. Without a token only staff have access
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return HttpResponse(status=404)
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode('utf-8'), f'Bearer {token}'.encode('utf-8')
+    )
+    if not (authorized or request.user.is_staff):
+        if not token:
+            return HttpResponse(status=403)
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+
+class BlogConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'blog'
+
+    def ready(self):
+        # Drop cached post list pages and update the search index whenever
+        # a post changes
+        from . import signals
+        from .models import BlogPost
+
+        post_save.connect(signals.invalidate_post_list, sender=BlogPost)
+        post_delete.connect(signals.invalidate_post_list, sender=BlogPost)
+        post_save.connect(signals.index_saved_post, sender=BlogPost)
+        post_delete.connect(signals.unindex_deleted_post, sender=BlogPost)
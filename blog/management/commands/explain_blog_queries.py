@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.models import BlogPost
+from blog.pagination import keyset_queryset
+from blog.views import post_list_queryset
+
+
+def reads_without_index(plan):
+    """Whether a plan sorts rows or reads the whole post table (SQLite and PostgreSQL wording)"""
+    for line in plan.splitlines():
+        if 'USE TEMP B-TREE' in line or 'Seq Scan on blog_blogpost' in line or 'Sort' in line:
+            return True
+        # "SCAN ... USING INDEX" walks an index in order, which is fine
+        if 'SCAN blog_blogpost' in line and 'USING' not in line:
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = "Print the database query plans of the blog views' queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="Run the queries and report actual timings (PostgreSQL only)"
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Fail if any plan sorts rows or scans the whole table"
+        )
+
+    def queries(self):
+        """The queries each blog view runs, with parameters taken from real posts"""
+        post = BlogPost.objects.filter(published=True).order_by('-created_at', '-id').only(
+            'id', 'created_at', 'author_id'
+        ).first()
+        if post is None:
+            post = BlogPost(id=0, created_at=timezone.now(), author_id=0)
+
+        page_size = getattr(settings, 'BLOG_PAGE_SIZE', 20)
+        return {
+            'post list, first page': keyset_queryset(post_list_queryset(), None, page_size + 1),
+            'post list, next page': keyset_queryset(
+                post_list_queryset(), (post.created_at, post.pk), page_size + 1
+            ),
+            'post detail': BlogPost.objects.filter(id=post.pk, published=True),
+            'post edit': BlogPost.objects.filter(id=post.pk, author_id=post.author_id),
+        }
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError("--analyze is only supported on PostgreSQL")
+            explain_options['analyze'] = True
+
+        slow = []
+        with transaction.atomic():
+            if options['check'] and connection.vendor == 'postgresql':
+                # PostgreSQL prefers a sequential scan over any index while the
+                # table is small; make it pick an index whenever one is usable
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                    cursor.execute("SET LOCAL enable_sort = off")
+
+            for label, queryset in self.queries().items():
+                plan = queryset.explain(**explain_options)
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(plan)
+                if reads_without_index(plan):
+                    slow.append(label)
+                    self.stdout.write(self.style.WARNING("  sorts rows or scans the whole table"))
+                self.stdout.write('')
+
+        if options['check'] and slow:
+            raise CommandError(f"Queries without a usable index: {', '.join(slow)}")
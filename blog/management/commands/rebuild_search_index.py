@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import BlogPost
+from blog.search import clear_search_index, index_post
+
+
+class Command(BaseCommand):
+    help = "Reindex every blog post for full-text search"
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.values_list('id', 'title', 'content').iterator(chunk_size=500)
+        count = 0
+        with transaction.atomic():
+            clear_search_index()
+            for post_id, title, content in posts:
+                index_post(post_id, title, content)
+                count += 1
+        self.stdout.write(f"Indexed {count} posts for search")
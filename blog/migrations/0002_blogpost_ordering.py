@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='blogpost',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+    ]
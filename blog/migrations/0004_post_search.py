@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Kept in the migration rather than imported from blog.search, so the
+# schema it creates stays fixed as the app code changes
+SEARCH_TABLE = 'blog_post_search'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "post_id bigint PRIMARY KEY REFERENCES blog_blogpost (id) ON DELETE CASCADE, "
+            "vector tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX blog_post_search_vector_idx ON {SEARCH_TABLE} USING GIN (vector)"
+        )
+    else:
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(terms)")
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_indexes'),
+    ]
+
+    operations = [
+        # The table is filled with the existing posts by the next migration
+        # and kept up to date as posts are saved
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'blog_post_search'
+
+
+def index_existing_posts(apps, schema_editor):
+    """Index the posts written before the search table existed"""
+    from blog.tokenizer import terms
+
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    posts = BlogPost.objects.using(schema_editor.connection.alias).values_list('id', 'title', 'content')
+    with schema_editor.connection.cursor() as cursor:
+        for post_id, title, content in posts.iterator(chunk_size=500):
+            post_terms = ' '.join(terms(f'{title}.\n{content}'))
+            if schema_editor.connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE} (post_id, vector) VALUES (%s, to_tsvector('simple', %s)) "
+                    "ON CONFLICT (post_id) DO UPDATE SET vector = EXCLUDED.vector",
+                    [post_id, post_terms]
+                )
+            else:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [post_id])
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, terms) VALUES (%s, %s)", [post_id, post_terms])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_search'),
+    ]
+
+    operations = [
+        # Saves keep the index current from here on
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,8 @@ from django.contrib.auth.models import User
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
+    # Covered by blog_post_author_idx, whose first column is the author
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=False)
@@ -13,4 +14,16 @@ class BlogPost(models.Model):
         return self.title
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        # The id breaks ties, so keyset pagination sees every post once
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Public pages only read published posts in list order; the
+            # partial index leaves drafts out and needs no sort step
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(published=True),
+                name='blog_post_published_idx',
+            ),
+            # An author's own posts, newest first
+            models.Index(fields=['author', '-created_at'], name='blog_post_author_idx'),
+        ]
\ No newline at end of file
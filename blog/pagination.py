@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination of blog posts.
+
+Pages follow ``BlogPost.Meta.ordering``, ``(-created_at, -id)``. Instead of
+an OFFSET, the next page starts strictly after the last post of the previous
+one, so every page costs one index range scan however deep it is.
+"""
+import base64
+from datetime import datetime, timezone
+
+from django.db.models import Q
+
+
+def encode_cursor(post):
+    """Opaque cursor pointing just after ``post``"""
+    raw = f'{post.created_at.isoformat()}|{post.pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by ``encode_cursor``
+
+    Returns:
+        tuple: (created_at in UTC, id) of the last post of the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, post_id = raw.split('|')
+        created_at, post_id = datetime.fromisoformat(created_at), int(post_id)
+        # Cursors carry aware timestamps; anything else wasn't made by encode_cursor
+        if created_at.tzinfo is None or post_id < 1:
+            raise ValueError
+        return created_at.astimezone(timezone.utc), post_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def position_key(position):
+    """Canonical text of a decoded cursor, the same for every spelling of it"""
+    if position is None:
+        return 'first'
+    created_at, post_id = position
+    return f'{created_at.isoformat()}|{post_id}'
+
+
+def keyset_queryset(queryset, position=None, limit=20):
+    """
+    Slice of ``queryset`` in ``(-created_at, -id)`` order starting after ``position``
+
+    Args:
+        queryset: Posts to paginate
+        position: Decoded cursor of the previous page, or None for the first page
+        limit: Maximum number of posts
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if position is not None:
+        created_at, post_id = position
+        # The plain range condition lets the database seek the index; the
+        # OR breaks ties between posts created at the same instant
+        queryset = queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+        )
+    return queryset[:limit]
+
+
+def keyset_page(queryset, position=None, page_size=20):
+    """
+    Fetch one page of posts in ``(-created_at, -id)`` order
+
+    Args:
+        queryset: Posts to paginate
+        position: Decoded cursor of the previous page, or None for the first page
+        page_size: Number of posts per page
+
+    Returns:
+        tuple: (list of posts, cursor of the next page or None)
+    """
+    # One extra row tells whether another page follows
+    posts = list(keyset_queryset(queryset, position, page_size + 1))
+    next_cursor = encode_cursor(posts[page_size - 1]) if len(posts) > page_size else None
+    return posts[:page_size], next_cursor
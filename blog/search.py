@@ -0,0 +1,123 @@
+"""
+Full-text search over blog posts.
+
+Posts and queries are tokenized by ``blog.tokenizer``, which normalizes
+words and stop words the way topic extraction does. The resulting terms are
+stored in a database-native inverted index:
+
+- PostgreSQL: a ``tsvector`` column (``simple`` configuration, since the
+  terms are already normalized) with a GIN index, ranked by ``ts_rank_cd``
+- SQLite: an FTS5 virtual table keyed by post id, ranked by ``bm25``
+
+Each save or delete updates a single row, and a query only touches the
+posts that contain its terms.
+"""
+import html
+import re
+
+from django.db import connection
+
+from . import tokenizer
+
+SEARCH_TABLE = 'blog_post_search'
+
+
+def search_terms(text):
+    """Distinct search terms of a text, in order of first appearance"""
+    return list(dict.fromkeys(term for term in tokenizer.terms(text) if len(term) > 1))
+
+
+def index_post(post_id, title, content):
+    """Add or replace the search entry of one post"""
+    terms = ' '.join(tokenizer.terms(f'{title}.\n{content}'))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (post_id, vector) VALUES (%s, to_tsvector('simple', %s)) "
+                "ON CONFLICT (post_id) DO UPDATE SET vector = EXCLUDED.vector",
+                [post_id, terms]
+            )
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [post_id])
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, terms) VALUES (%s, %s)", [post_id, terms])
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE post_id = %s", [post_id])
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [post_id])
+
+
+def clear_search_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+def search_post_ids(terms, limit, offset=0):
+    """
+    Find published posts containing every term, best match first
+
+    Args:
+        terms: Normalized query terms, as returned by ``search_terms``
+        limit: Maximum number of results
+        offset: Number of results to skip
+
+    Returns:
+        list: (post id, rank) pairs; a higher rank is a better match
+    """
+    if not terms:
+        return []
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"SELECT s.post_id, ts_rank_cd(s.vector, q.query) AS rank "
+                f"FROM {SEARCH_TABLE} s "
+                "CROSS JOIN plainto_tsquery('simple', %s) q(query) "
+                "JOIN blog_blogpost p ON p.id = s.post_id "
+                "WHERE s.vector @@ q.query AND p.published "
+                "ORDER BY rank DESC, s.post_id DESC LIMIT %s OFFSET %s",
+                [' '.join(terms), limit, offset]
+            )
+        else:
+            # Terms are alphanumeric, so quoting each one makes a safe phrase
+            # list that FTS5 combines with AND
+            cursor.execute(
+                f"SELECT {SEARCH_TABLE}.rowid, -bm25({SEARCH_TABLE}) AS rank FROM {SEARCH_TABLE} "
+                f"JOIN blog_blogpost p ON p.id = {SEARCH_TABLE}.rowid "
+                f"WHERE {SEARCH_TABLE} MATCH %s AND p.published "
+                f"ORDER BY rank DESC, {SEARCH_TABLE}.rowid DESC LIMIT %s OFFSET %s",
+                [' '.join(f'"{term}"' for term in terms), limit, offset]
+            )
+        return [(post_id, float(rank)) for post_id, rank in cursor.fetchall()]
+
+
+def highlight(content, terms, width=160):
+    """
+    HTML snippet of ``content`` around the first query term, with every term in ``<mark>``
+
+    Args:
+        content: Post text
+        terms: Normalized query terms
+        width: Approximate snippet length in characters
+    """
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE)
+    match = pattern.search(content) if terms else None
+    start = max(0, match.start() - width // 3) if match else 0
+    # Start and end on word boundaries
+    if start:
+        start = content.find(' ', start) + 1 or start
+    end = content.rfind(' ', start, start + width) if len(content) > start + width else len(content)
+    if end <= start:
+        end = start + width
+
+    excerpt = content[start:end]
+    parts = pattern.split(excerpt) if terms else [excerpt]
+    # Odd positions of the split are the matched terms
+    snippet = ''.join(
+        f'<mark>{html.escape(part)}</mark>' if position % 2 else html.escape(part)
+        for position, part in enumerate(parts)
+    )
+    return ('…' if start else '') + snippet + ('…' if end < len(content) else '')
@@ -0,0 +1,52 @@
+"""
+Keep the cached post list pages and the search index in step with posts.
+
+Cached pages are keyed by a list version; bumping the version on every save
+or delete makes all of them unreachable at once, and they expire on their
+own afterwards. The search entry of a post is replaced once the transaction
+that saved it commits.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .search import index_post, unindex_post
+
+logger = logging.getLogger(__name__)
+
+LIST_VERSION_KEY = 'blog:post_list:version'
+
+
+def post_list_version():
+    """Current version of the cached post list"""
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        cache.add(LIST_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(LIST_VERSION_KEY)
+    return version
+
+
+def invalidate_post_list(sender, **kwargs):
+    cache.set(LIST_VERSION_KEY, time.time_ns(), None)
+
+
+def _update_search_entry(post_id, title, content):
+    try:
+        index_post(post_id, title, content)
+    except Exception as e:
+        # Searching must never break saving a post; a rebuild catches up later
+        logger.warning("Could not index post %s for search: %s", post_id, e)
+
+
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    post_id, title, content = instance.pk, instance.title, instance.content
+    transaction.on_commit(lambda: _update_search_entry(post_id, title, content))
+
+
+def unindex_deleted_post(sender, instance, **kwargs):
+    post_id = instance.pk
+    transaction.on_commit(lambda: unindex_post(post_id))
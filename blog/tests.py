@@ -0,0 +1,167 @@
+import base64
+import re
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import BlogPost
+from .pagination import decode_cursor, keyset_page
+from .search import highlight, search_post_ids, search_terms
+
+
+def simple_tokenizers():
+    """Replace the NLTK tokenizers with plain splitting so no NLTK data is needed"""
+    return mock.patch.multiple(
+        'blog.tokenizer',
+        sent_tokenize=lambda text: [s.strip() + '.' for s in text.split('.') if s.strip()],
+        word_tokenize=lambda text, preserve_line=False: text.replace('.', ' .').replace(',', ' ,').split(),
+        english_stop_words=lambda: frozenset({'the', 'is', 'a', 'of', 'and', 'in', 'to', 'how'}),
+    )
+
+
+@override_settings(BLOG_PAGE_SIZE=2, TITLE_PRECOMPUTE=False)
+class BlogPostListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        authors = [User.objects.create_user(f'author{i}', password='secret') for i in range(3)]
+        created_at = timezone.now()
+        for i in range(5):
+            post = BlogPost.objects.create(
+                title=f'Post {i}', content='Body text ' * 100, author=authors[i % 3], published=True
+            )
+            # Two posts share a timestamp; the id keeps their order stable
+            BlogPost.objects.filter(pk=post.pk).update(created_at=created_at - timedelta(minutes=i // 2 * 2))
+        BlogPost.objects.create(title='Draft', content='Unpublished', author=authors[0])
+
+    def test_keyset_pages_cover_every_post_once(self):
+        posts = BlogPost.objects.filter(published=True)
+        seen, position = [], None
+        while True:
+            page, cursor = keyset_page(posts, position, page_size=2)
+            seen.extend(post.title for post in page)
+            if cursor is None:
+                break
+            position = decode_cursor(cursor)
+
+        self.assertEqual(seen, [post.title for post in posts])
+        self.assertEqual(len(seen), 5)
+
+    def test_page_is_one_query_without_the_body(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/blog/posts/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'author')
+        self.assertContains(response, 'Older posts')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"content"', queries[0]['sql'])
+
+    def test_rendered_pages_are_cached_until_a_post_changes(self):
+        self.client.get('/blog/posts/')
+        with self.assertNumQueries(0):
+            self.client.get('/blog/posts/')
+
+        post = BlogPost.objects.filter(published=True).first()
+        post.title = 'Renamed post'
+        post.save()
+        self.assertContains(self.client.get('/blog/posts/'), 'Renamed post')
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/blog/posts/', {'cursor': '!!'}).status_code, 400)
+        naive = base64.urlsafe_b64encode(b'2024-01-01T00:00:00|1').decode()
+        self.assertEqual(self.client.get('/blog/posts/', {'cursor': naive}).status_code, 400)
+
+    def test_spellings_of_a_cursor_share_one_cached_page(self):
+        cursor = re.search(r'cursor=([^"]+)"', self.client.get('/blog/posts/').content.decode()).group(1)
+        second_page = self.client.get('/blog/posts/', {'cursor': cursor})
+
+        # The same position with base64 padding, or in another time zone
+        created_at, post_id = decode_cursor(cursor)
+        padded = cursor + '=' * (-len(cursor) % 4)
+        shifted = base64.urlsafe_b64encode(
+            f'{created_at.astimezone(timezone.get_fixed_timezone(120)).isoformat()}|{post_id}'.encode()
+        ).decode()
+        for spelling in (padded, shifted):
+            with self.assertNumQueries(0):
+                response = self.client.get('/blog/posts/', {'cursor': spelling})
+            self.assertEqual(response.content, second_page.content)
+
+    def test_view_queries_use_indexes(self):
+        output = StringIO()
+        call_command('explain_blog_queries', '--check', stdout=output)
+        self.assertIn('blog_post_published_idx', output.getvalue())
+
+
+@override_settings(BLOG_PAGE_SIZE=2, TITLE_PRECOMPUTE=False)
+class BlogPostSearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='secret')
+        posts = [
+            ('Python pipelines', 'Building data pipelines in Python. Python makes pipelines simple.', True),
+            ('Cooking', 'A recipe for bread, with a note on Python scripts for timers.', True),
+            ('Python drafts', 'Unfinished notes on Python pipelines.', False),
+            ('Testing', 'How to test data pipelines written in Python.', True),
+        ]
+        with simple_tokenizers(), self.captureOnCommitCallbacks(execute=True):
+            self.posts = [
+                BlogPost.objects.create(title=title, content=content, author=self.author, published=published)
+                for title, content, published in posts
+            ]
+
+    def search(self, query, page=1):
+        with simple_tokenizers():
+            return self.client.get('/blog/posts/search/', {'q': query, 'page': page}).json()
+
+    def test_results_are_ranked_paginated_and_highlighted(self):
+        first = self.search('the Python pipelines')
+        self.assertEqual([result['title'] for result in first['results']], ['Python pipelines', 'Testing'])
+        self.assertIsNone(first['next_page'])
+        self.assertIn('<mark>Python</mark>', first['results'][0]['snippet'])
+        self.assertGreater(first['results'][0]['rank'], first['results'][1]['rank'])
+
+        self.assertEqual(self.search('python')['next_page'], 2)
+        self.assertEqual(len(self.search('python', page=2)['results']), 1)
+        self.assertEqual(self.search('the')['results'], [])
+
+    def test_index_follows_saves_and_deletes(self):
+        with simple_tokenizers(), self.captureOnCommitCallbacks(execute=True):
+            self.posts[1].content = 'A recipe for sourdough bread.'
+            self.posts[1].save()
+            self.posts[3].delete()
+
+        self.assertEqual([result['title'] for result in self.search('python')['results']], ['Python pipelines'])
+        self.assertEqual([result['title'] for result in self.search('sourdough')['results']], ['Cooking'])
+
+    def test_snippets_are_escaped_and_trimmed(self):
+        snippet = highlight('<b>intro</b> ' + 'filler ' * 50 + 'python <script> tips', ['python'], width=40)
+        self.assertTrue(snippet.startswith('…'))
+        self.assertIn('<mark>python</mark> &lt;script&gt;', snippet)
+
+
+class SearchBackfillMigrationTest(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('blog', target)])
+        return executor.loader.project_state(('blog', target)).apps
+
+    def test_posts_written_before_the_search_table_are_indexed(self):
+        self.addCleanup(self.migrate, '0005_backfill_post_search')
+        apps = self.migrate('0004_post_search')
+        # The historical model has no signal handlers, as before search existed
+        post = apps.get_model('blog', 'BlogPost').objects.create(
+            title='Python pipelines', content='Data pipelines in Python.', published=True,
+            author_id=User.objects.create_user('author', password='secret').id
+        )
+
+        with simple_tokenizers():
+            self.migrate('0005_backfill_post_search')
+            self.assertEqual([post_id for post_id, _ in search_post_ids(search_terms('python'), 10)], [post.id])
@@ -0,0 +1,41 @@
+"""
+Tokenization shared by blog search and title suggestions.
+
+Text is split into sentences and words with NLTK, lowercased, and stripped
+of punctuation and English stop words. ``blog.search`` indexes and queries
+the resulting terms, and ``AnalyzedDocument`` in ``ai_services`` builds on
+the same functions, so search terms and title topics agree. The module only
+depends on NLTK, so the blog app and its migrations don't need
+``ai_services``.
+"""
+import functools
+
+from nltk.corpus import stopwords
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+
+@functools.lru_cache(maxsize=None)
+def english_stop_words():
+    """English stop words, loaded once per process"""
+    return frozenset(stopwords.words('english'))
+
+
+def split_sentences(text):
+    return sent_tokenize(text)
+
+
+def tokenize_sentence(sentence):
+    """Lowercased word tokens of one sentence"""
+    # Sentences are already split, so tokenize each one as a single line
+    return word_tokenize(sentence.lower(), preserve_line=True)
+
+
+def filter_terms(tokens):
+    """The alphanumeric, non-stop-word tokens, in order"""
+    stop_words = english_stop_words()
+    return [token for token in tokens if token.isalnum() and token not in stop_words]
+
+
+def terms(text):
+    """Terms of a text, lowercased and in order"""
+    return [term for sentence in split_sentences(text) for term in filter_terms(tokenize_sentence(sentence))]
@@ -1,13 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.contrib.auth.decorators import login_required
+from django.template.loader import render_to_string
 from .models import BlogPost
+from .pagination import decode_cursor, keyset_page, position_key
+from .search import highlight, search_post_ids, search_terms
+from .signals import post_list_version
+
+
+def post_list_queryset():
+    """Published posts as the list page reads them"""
+    # The list never shows the body, and authors come in the same query
+    return BlogPost.objects.filter(published=True).select_related('author').defer('content')
 
 
 def blog_post_list(request):
-    """View for listing all blog posts"""
-    posts = BlogPost.objects.filter(published=True)
-    return render(request, 'blog/post_list.html', {'posts': posts})
+    """
+    View for listing published blog posts, one page at a time
+
+    Pages are addressed by an opaque ``cursor`` query parameter and the
+    rendered HTML of each page is cached until a post changes
+    """
+    cursor = request.GET.get('cursor')
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            return HttpResponseBadRequest('Invalid cursor')
+
+    # Keyed on the decoded position, so other spellings of a cursor share the entry
+    cache_key = f'blog:post_list:{post_list_version()}:{position_key(position)}'
+    html = cache.get(cache_key)
+    if html is None:
+        page, next_cursor = keyset_page(
+            post_list_queryset(), position, page_size=getattr(settings, 'BLOG_PAGE_SIZE', 20)
+        )
+        # Cached for every visitor: the template must not show anything user-specific
+        html = render_to_string(
+            'blog/post_list.html', {'posts': page, 'next_cursor': next_cursor}, request=request
+        )
+        cache.set(cache_key, html, getattr(settings, 'BLOG_LIST_CACHE_TIMEOUT', 60))
+
+    return HttpResponse(html)
+
+
+def blog_post_search(request):
+    """
+    View for searching published blog posts
+
+    Takes the query as ``q`` and a 1-based ``page``, and returns the ranked
+    matches of that page as JSON with highlighted snippets
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid page')
+
+    page_size = getattr(settings, 'BLOG_PAGE_SIZE', 20)
+    terms = search_terms(query) if query else []
+    # One extra match tells whether another page follows
+    matches = search_post_ids(terms, page_size + 1, (page - 1) * page_size)
+    has_next = len(matches) > page_size
+    matches = matches[:page_size]
+
+    posts = BlogPost.objects.select_related('author').in_bulk([post_id for post_id, _ in matches])
+    results = [
+        {
+            'id': post_id,
+            'title': posts[post_id].title,
+            'author': posts[post_id].author.username,
+            'created_at': posts[post_id].created_at.isoformat(),
+            'snippet': highlight(posts[post_id].content, terms),
+            'rank': rank,
+        }
+        for post_id, rank in matches if post_id in posts
+    ]
+
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'results': results,
+        'next_page': page + 1 if has_next else None,
+    })
 
 
 def blog_post_detail(request, post_id):
@@ -2,6 +2,8 @@
 ASGI config for darwix_ai project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections are routed to the live
+transcription endpoint.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'darwix_ai.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from ai_services.streaming import get_streaming_application, transcription_stream  # noqa: E402
+
+application = get_streaming_application(django_application, {
+    '/api/transcribe/stream/': transcription_stream,
+})
+
+# Load stop words, tokenizer models and the OpenAI client once per server
+# process instead of on the first request; management commands skip this
+from ai_services.titles import get_title_service  # noqa: E402
+
+get_title_service().warm()
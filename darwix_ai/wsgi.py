@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'darwix_ai.settings')
 
 application = get_wsgi_application()
+
+# Load stop words, tokenizer models and the OpenAI client once per server
+# process instead of on the first request; management commands skip this
+from ai_services.titles import get_title_service  # noqa: E402
+
+get_title_service().warm()
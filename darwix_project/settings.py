@@ -59,11 +59,34 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'darwix_project.wsgi.application'
 
-# Database
-DATABASES = {
+# Database: PostgreSQL when DB_HOST is set (see docker-compose.yml), otherwise
+# a local SQLite file
+if os.getenv('DB_HOST'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'darwix_db'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', 'postgres'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Cache for rendered pages; use a shared backend (e.g. Redis or the database)
+# when several worker processes must see each other's invalidations
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -102,8 +125,109 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # API Keys
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+# Alternative OpenAI-compatible endpoint, e.g. a proxy or a local fake server
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
 HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY', '')
 
+# Audio transcription
+TRANSCRIPTION_MAX_WORKERS = int(os.getenv('TRANSCRIPTION_MAX_WORKERS', '4'))
+TRANSCRIPTION_CHUNK_SECONDS = float(os.getenv('TRANSCRIPTION_CHUNK_SECONDS', '30'))
+# Recognition backend: 'google' (network) or 'whisper' (local CPU model kept
+# warm in every process that recognizes audio). Each of the
+# TRANSCRIPTION_JOB_WORKERS job processes loads TRANSCRIPTION_MODEL_POOL_SIZE
+# instances, so Whisper memory is their product; scale with job processes and
+# keep the pool at 1. Torch threads per instance default to the cores divided
+# between all instances
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'google')
+TRANSCRIPTION_WHISPER_MODEL = os.getenv('TRANSCRIPTION_WHISPER_MODEL', 'openai/whisper-base')
+TRANSCRIPTION_MODEL_POOL_SIZE = int(os.getenv('TRANSCRIPTION_MODEL_POOL_SIZE', '1'))
+TRANSCRIPTION_MODEL_THREADS = int(os.getenv('TRANSCRIPTION_MODEL_THREADS', '0')) or None
+# Language identification runs once on the first seconds of speech; with a
+# single candidate language no recognition request is spent on it
+TRANSCRIPTION_DEFAULT_LANGUAGE = os.getenv('TRANSCRIPTION_DEFAULT_LANGUAGE', 'en-US')
+TRANSCRIPTION_CANDIDATE_LANGUAGES = os.getenv(
+    'TRANSCRIPTION_CANDIDATE_LANGUAGES', TRANSCRIPTION_DEFAULT_LANGUAGE
+).split(',')
+TRANSCRIPTION_LANGUAGE_SAMPLE_SECONDS = float(os.getenv('TRANSCRIPTION_LANGUAGE_SAMPLE_SECONDS', '10'))
+# Voice activity detection: only speech regions are sent to the recognizer
+TRANSCRIPTION_VAD = os.getenv('TRANSCRIPTION_VAD', 'True') == 'True'
+# Speaker diarization: 'pyannote', 'mfcc' or 'auto' (pyannote when available)
+TRANSCRIPTION_DIARIZE = os.getenv('TRANSCRIPTION_DIARIZE', 'True') == 'True'
+TRANSCRIPTION_DIARIZATION_ENGINE = os.getenv('TRANSCRIPTION_DIARIZATION_ENGINE', 'auto')
+
+# Transcription jobs are queued in the database and run by the dedicated
+# worker (manage.py run_transcription_worker) on this many processes; eager
+# mode runs them inside the request instead (development/tests)
+TRANSCRIPTION_JOB_WORKERS = int(os.getenv('TRANSCRIPTION_JOB_WORKERS', '2'))
+TRANSCRIPTION_JOBS_EAGER = os.getenv('TRANSCRIPTION_JOBS_EAGER', 'False') == 'True'
+# A claimed job is requeued when its worker stops renewing the lease, and
+# failed after this many attempts
+TRANSCRIPTION_JOB_LEASE_SECONDS = int(os.getenv('TRANSCRIPTION_JOB_LEASE_SECONDS', '60'))
+TRANSCRIPTION_JOB_MAX_ATTEMPTS = int(os.getenv('TRANSCRIPTION_JOB_MAX_ATTEMPTS', '2'))
+TRANSCRIPTION_JOB_POLL_INTERVAL = float(os.getenv('TRANSCRIPTION_JOB_POLL_INTERVAL', '1'))
+# Serve transcribe and suggest-titles as async views (ASGI workers, see
+# docker-entrypoint.sh); their CPU-bound steps share a bounded thread pool
+AI_ASYNC_VIEWS = os.getenv('AI_ASYNC_VIEWS', 'True') == 'True'
+ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', str(os.cpu_count() or 4)))
+# Live WebSocket streams share one thread pool per ASGI process
+TRANSCRIPTION_STREAM_WORKERS = int(os.getenv('TRANSCRIPTION_STREAM_WORKERS', '8'))
+
+# Large audio uploads are spooled to tmpfs and handed to jobs without extra
+# copies; other uploads use the default temporary directory
+TRANSCRIPTION_SPILL_DIR = os.getenv(
+    'TRANSCRIPTION_SPILL_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None
+)
+
+# Finished results are cached by a hash of the uploaded bytes (LRU + TTL)
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_ENTRIES', '1000'))
+TRANSCRIPTION_CACHE_TTL = int(os.getenv('TRANSCRIPTION_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Title suggestions rank topics against document frequencies over all blog
+# posts, stored in this file and updated whenever a post is saved
+TITLE_IDF_INDEX_PATH = os.getenv('TITLE_IDF_INDEX_PATH', os.path.join(BASE_DIR, 'var', 'idf_index.npz'))
+# Post changes arriving within this many seconds are written to the index together
+TITLE_IDF_WRITE_DELAY = float(os.getenv('TITLE_IDF_WRITE_DELAY', '2'))
+
+# OpenAI title generation: every request gets a hard latency budget (retries
+# included) and falls back to local generation when it runs out
+TITLE_OPENAI_MODEL = os.getenv('TITLE_OPENAI_MODEL', 'gpt-3.5-turbo')
+TITLE_OPENAI_LATENCY_BUDGET = float(os.getenv('TITLE_OPENAI_LATENCY_BUDGET', '4'))
+TITLE_OPENAI_MAX_RETRIES = int(os.getenv('TITLE_OPENAI_MAX_RETRIES', '2'))
+# Client-side rate limit per process (0 disables it) and allowed burst
+TITLE_OPENAI_REQUESTS_PER_SECOND = float(os.getenv('TITLE_OPENAI_REQUESTS_PER_SECOND', '0'))
+TITLE_OPENAI_BURST = int(os.getenv('TITLE_OPENAI_BURST', '10'))
+# Words of the extractive summary sent to the model as the prompt
+TITLE_SUMMARY_TOKEN_BUDGET = int(os.getenv('TITLE_SUMMARY_TOKEN_BUDGET', '120'))
+# Generated titles are cached per process: by the exact summary sent to the
+# model, and by SimHash for near-identical drafts (bits that may differ)
+TITLE_CACHE_MAX_ENTRIES = int(os.getenv('TITLE_CACHE_MAX_ENTRIES', '1024'))
+TITLE_CACHE_TTL = int(os.getenv('TITLE_CACHE_TTL', '3600'))
+TITLE_CACHE_MAX_DISTANCE = int(os.getenv('TITLE_CACHE_MAX_DISTANCE', '3'))
+# Largest num_suggestions a title request may ask for
+TITLE_MAX_SUGGESTIONS = int(os.getenv('TITLE_MAX_SUGGESTIONS', '10'))
+# Batch title suggestions: documents per request and concurrent OpenAI calls
+TITLE_BATCH_MAX_DOCUMENTS = int(os.getenv('TITLE_BATCH_MAX_DOCUMENTS', '10000'))
+TITLE_BATCH_CONCURRENCY = int(os.getenv('TITLE_BATCH_CONCURRENCY', '8'))
+# Titles precomputed in the background whenever a post's content changes
+TITLE_PRECOMPUTE = os.getenv('TITLE_PRECOMPUTE', 'True') == 'True'
+TITLE_PRECOMPUTE_EAGER = os.getenv('TITLE_PRECOMPUTE_EAGER', 'False') == 'True'
+TITLE_PRECOMPUTE_WORKERS = int(os.getenv('TITLE_PRECOMPUTE_WORKERS', '2'))
+TITLE_PRECOMPUTE_SUGGESTIONS = int(os.getenv('TITLE_PRECOMPUTE_SUGGESTIONS', '5'))
+
+# Blog post list: posts per keyset page and how long rendered pages are cached
+BLOG_PAGE_SIZE = int(os.getenv('BLOG_PAGE_SIZE', '20'))
+BLOG_LIST_CACHE_TIMEOUT = int(os.getenv('BLOG_LIST_CACHE_TIMEOUT', '60'))
+
+# Stage timings, cache and fallback counters and payload sizes, served on
+# /metrics. Processes sharing METRICS_DIR (web and transcription workers, see
+# docker-compose.yml) report together; without it each reports only itself
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Bearer token the scraper must send; when empty only staff users can read
+# /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -3,10 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from ai_services.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/ai/', include('ai_services.urls')),
     path('blog/', include('blog.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 # Add media URLs in development
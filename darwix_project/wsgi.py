@@ -0,0 +1,19 @@
+"""
+WSGI config for darwix_project project.
+
+It exposes the WSGI callable as a module-level variable named ``application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'darwix_project.settings')
+
+application = get_wsgi_application()
+
+# Load stop words, tokenizer models and the OpenAI client once per server
+# process instead of on the first request; management commands skip this
+from ai_services.titles import get_title_service  # noqa: E402
+
+get_title_service().warm()
@@ -1,9 +1,23 @@
 #!/bin/bash
 
+# Migrations and index builds must reach the database gunicorn serves from,
+# so every command below uses the server's settings module (PostgreSQL when
+# DB_HOST is set), not manage.py's darwix_ai.settings default
+export DJANGO_SETTINGS_MODULE=${DJANGO_SETTINGS_MODULE:-darwix_project.settings}
+
 # Apply database migrations
 echo "Applying database migrations..."
 python manage.py migrate
 
+# Recount the title-suggestion IDF index; saves keep it current afterwards
+echo "Building IDF index..."
+python manage.py build_idf_index
+
+# Confirm the blog views' queries can use their indexes on this database
+echo "Checking blog query plans..."
+python manage.py explain_blog_queries --check > /dev/null \
+    || echo "WARNING: blog queries without a usable index (run explain_blog_queries)"
+
 # Create superuser if it doesn't exist
 echo "Creating superuser..."
 python manage.py shell -c "
@@ -16,6 +30,18 @@ if not User.objects.filter(username='admin').exists():
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Web workers and transcription workers add up their metrics in this
+# directory (shared with the worker service in docker-compose.yml); files of
+# processes that are gone are dropped when read
+export METRICS_DIR=${METRICS_DIR:-/dev/shm/darwix-metrics}
+mkdir -p "$METRICS_DIR"
+
 # Start server
 echo "Starting server..."
-exec gunicorn darwix_project.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
+# Transcriptions run in the worker service (run_transcription_worker), so
+# request workers only queue uploads and handle polling and short calls like
+# suggest-titles. ASGI workers
+# keep many OpenAI requests and live streams in flight per process
+exec gunicorn darwix_project.asgi:application --bind 0.0.0.0:8000 \
+    --worker-class uvicorn_worker.UvicornWorker \
+    --workers ${GUNICORN_WORKERS:-3}
\ No newline at end of file